@@ -0,0 +1,12 @@
+"""
+htmlxify benchmarks
+    
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.compare baseline.json results.json
+
+generator.py writes seeded synthetic documents, run.py times each
+pipeline stage on them from 1 KB up to 50 MB, and compare.py flags
+regressions between two result files. scaling.py fits how fast each
+stage grows with input size, and lsp_latency.py times the language
+server reacting to edits. Not part of the installed package.
+"""
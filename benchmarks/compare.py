@@ -0,0 +1,130 @@
+"""
+Compare - Flags regressions between two benchmark result files
+    
+    python -m benchmarks.compare baseline.json results.json --threshold 10
+
+Every stage, and the total, of every size present in both files is
+compared. A stage regresses when it got slower by more than --threshold
+percent and by at least --min-ms (so sub-millisecond stages don't flap on
+noise). Exits with status 1 when anything regressed.
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, Any, List
+
+
+def load_results(path: str) -> Dict[str, Any]:
+    with open(path, encoding='utf-8') as f:
+        document = json.load(f)
+    if not isinstance(document, dict) or 'results' not in document:
+        raise ValueError(f"{path} is not a benchmark results file")
+    return document
+
+
+def compare_results(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    threshold: float = 10.0,
+    min_ms: float = 1.0,
+    metric: str = 'wall_ms'
+) -> List[Dict[str, Any]]:
+    """
+    One row per size and stage measured in both files, with 'baseline',
+    'current', 'change' (percent) and 'status': 'regression',
+    'improvement' or 'ok'.
+    """
+    current_sizes = {
+        result['size']: result for result in current['results'] if 'stages' in result
+    }
+    
+    rows = []
+    for base in baseline['results']:
+        new = current_sizes.get(base['size'])
+        if 'stages' not in base or new is None:
+            continue
+        
+        values = [
+            (stage, base['stages'][stage].get(metric), new['stages'][stage].get(metric))
+            for stage in base['stages'] if stage in new['stages']
+        ]
+        if metric == 'wall_ms':
+            values.append(('total', base.get('total_ms'), new.get('total_ms')))
+        
+        for stage, before, after in values:
+            if before is None or after is None:
+                continue
+            change = (after - before) / before * 100 if before else 0.0
+            if change > threshold and after - before >= min_ms:
+                status = 'regression'
+            elif change < -threshold and before - after >= min_ms:
+                status = 'improvement'
+            else:
+                status = 'ok'
+            rows.append({
+                'size': base['size'], 'stage': stage,
+                'baseline': before, 'current': after,
+                'change': round(change, 1), 'status': status,
+            })
+    return rows
+
+
+def input_mismatches(baseline: Dict[str, Any], current: Dict[str, Any]) -> List[str]:
+    """Settings that differ between the runs, making their inputs differ"""
+    base, new = baseline.get('meta', {}), current.get('meta', {})
+    return [key for key in ('seed', 'params', 'memory') if base.get(key) != new.get(key)]
+
+
+def format_rows(rows: List[Dict[str, Any]]) -> str:
+    """Rows as an aligned text table"""
+    header = f"{'Size':>8} {'Stage':<10} {'Baseline':>12} {'Current':>12} {'Change':>9}"
+    lines = [header, '-' * len(header)]
+    marks = {'regression': '  REGRESSION', 'improvement': '  improved', 'ok': ''}
+    for row in rows:
+        lines.append(
+            f"{row['size']:>8} {row['stage']:<10} {row['baseline']:>12,.2f} "
+            f"{row['current']:>12,.2f} {row['change']:>+8.1f}%{marks[row['status']]}"
+        )
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.compare',
+        description='Compare two benchmark result files and flag regressions'
+    )
+    parser.add_argument('baseline', help='Results file to compare against')
+    parser.add_argument('current', help='Results file to check')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Percent slowdown that counts as a regression (default: 10)')
+    parser.add_argument('--min-ms', type=float, default=1.0, help='Ignore changes smaller than this many ms (default: 1)')
+    parser.add_argument('--metric', choices=('wall_ms', 'cpu_ms'), default='wall_ms', help='Time to compare (default: wall_ms)')
+    args = parser.parse_args(argv)
+    
+    try:
+        baseline = load_results(args.baseline)
+        current = load_results(args.current)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: {e}")
+        return 2
+    
+    mismatched = input_mismatches(baseline, current)
+    if mismatched:
+        print(f"⚠️  Warning: runs used different {', '.join(mismatched)}; their documents differ\n")
+    
+    rows = compare_results(baseline, current, args.threshold, args.min_ms, args.metric)
+    if not rows:
+        print("No sizes were measured in both files")
+        return 2
+    
+    print(format_rows(rows))
+    regressions = [row for row in rows if row['status'] == 'regression']
+    print(
+        f"\n{len(regressions)} regression(s) over {args.threshold:g}% "
+        f"across {len(rows)} comparisons"
+    )
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""
+Generator - Seeded synthetic .htmlxify documents
+    
+    source = generate_document(elements=500, depth=6, seed=1)
+    source = generate_sized(1024 * 1024, seed=1, call_frequency=0.1)
+
+The same seed and parameters always give the same document, so results
+from different runs and machines measure the same input.
+"""
+
+import random
+from typing import Dict, Any, List
+
+
+TAGS = ('div', 'section', 'article', 'p', 'span', 'ul', 'li', 'a', 'h2', 'h3', 'button', 'nav')
+
+WORDS = (
+    'lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit',
+    'sed', 'do', 'eiusmod', 'tempor', 'incididunt', 'ut', 'labore', 'et', 'dolore',
+    'magna', 'aliqua', 'enim', 'ad', 'minim', 'veniam', 'quis', 'nostrud', 'ullamco',
+)
+
+CLASSES = ('card', 'item', 'title', 'content', 'box', 'row', 'col', 'hero', 'menu', 'link')
+
+# Plain attributes, with value templates ({n} is a per-document counter)
+ATTRIBUTES = (
+    ('href', '"/page/{n}"'),
+    ('title', '"Item {n}"'),
+    ('role', '"region"'),
+    ('aria-label', '"Label {n}"'),
+    ('tabindex', '{n}'),
+    ('lang', 'en'),
+)
+
+DEFAULTS: Dict[str, Any] = {
+    'elements': 100,            # Element count
+    'depth': 6,                 # Maximum nesting depth (top level is 1)
+    'text_ratio': 0.5,          # Chance an element holds text
+    'attribute_density': 0.5,   # Mean plain attributes per element
+    'call_frequency': 0.05,     # Chance an element has ⚡-call
+    'data_frequency': 0.05,     # Chance an element has ⚡-data
+}
+
+
+def generate_document(seed: int = 0, **params) -> str:
+    """
+    A document with the given parameters (see DEFAULTS). Elements are laid
+    out depth-first: each one is a child of the previous element, or a
+    sibling of it or of one of its ancestors, within the depth limit.
+    """
+    unknown = set(params) - set(DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown generator parameter(s): {', '.join(sorted(unknown))}")
+    params = dict(DEFAULTS, **params)
+    if params['elements'] < 1 or params['depth'] < 1:
+        raise ValueError("elements and depth must be at least 1")
+    
+    rng = random.Random(seed)
+    lines: List[str] = []
+    # Text of each open element. It is written just before the closing
+    # brace: text followed by a sibling's "tag.class" would lex as one chunk
+    open_texts: List[str] = []
+    
+    def close_to(depth):
+        while len(open_texts) > depth:
+            text = open_texts.pop()
+            indent = '  ' * len(open_texts)
+            if text:
+                lines.append(indent + '  ' + text)
+            lines.append(indent + '}')
+    
+    for n in range(params['elements']):
+        depth = len(open_texts)
+        if n and not (depth < params['depth'] and rng.random() < 0.5):
+            # Stay at this level or climb back up some levels
+            close_to(rng.randint(0, depth - 1))
+        
+        lines.append('  ' * len(open_texts) + _element_head(rng, n, params) + ' {')
+        open_texts.append(_text(rng) if rng.random() < params['text_ratio'] else '')
+    
+    close_to(0)
+    return '\n'.join(lines) + '\n'
+
+
+def generate_sized(target_bytes: int, seed: int = 0, **params) -> str:
+    """
+    A document of about target_bytes UTF-8 bytes. The element count is
+    estimated from a sample with the same parameters, then corrected once
+    against the first attempt.
+    """
+    params.pop('elements', None)
+    elements = 200
+    for _ in range(2):
+        source = generate_document(seed, elements=elements, **params)
+        per_element = len(source.encode('utf-8')) / elements
+        elements = max(1, round(target_bytes / per_element))
+    return generate_document(seed, elements=elements, **params)
+
+
+def _element_head(rng: random.Random, n: int, params: Dict[str, Any]) -> str:
+    """tag.class#id(attributes) for element number n"""
+    head = rng.choice(TAGS)
+    if rng.random() < 0.6:
+        head += '.' + rng.choice(CLASSES)
+    if rng.random() < 0.1:
+        head += f'#el-{n}'
+    
+    attributes = []
+    density = params['attribute_density']
+    # Mean `density` plain attributes: one per full unit, plus a chance of one more
+    for _ in range(int(density) + (rng.random() < density % 1)):
+        key, value = rng.choice(ATTRIBUTES)
+        if all(not existing.startswith(key + ':') for existing in attributes):
+            attributes.append(f'{key}: {value.format(n=n)}')
+    if rng.random() < params['call_frequency']:
+        attributes.append(f'⚡-call: "endpoint{n % 50}"')
+    if rng.random() < params['data_frequency']:
+        attributes.append(f'⚡-data: "field{n % 50}"')
+    
+    if attributes:
+        head += '(' + ', '.join(attributes) + ')'
+    return head
+
+
+def _text(rng: random.Random) -> str:
+    """A short run of words, sometimes ending in punctuation"""
+    words = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 12)))
+    return words.capitalize() + rng.choice(('', '.', '!', '?'))
@@ -0,0 +1,152 @@
+"""
+LSP latency - How fast the language server reacts to typing
+    
+    python -m benchmarks.lsp_latency --lines 10000 --edits 60 --check
+
+Opens a generated document of about --lines lines in an AnalysisWorker, as
+the server does on didOpen, then applies random edits one at a time, as
+didChange would: typing into text, into an attribute value, and adding a
+line with a new element. For each edit it times the change handler
+(AnalysisWorker.schedule) and the time from the end of the debounce to
+the published diagnostics. Both are compared with TARGETS; --check exits
+with status 1 when a percentile is over its target.
+
+Opening is a full parse, and takes as long as compiling the document; it
+is reported but has no target.
+"""
+
+import argparse
+import random
+import re
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+
+from benchmarks.generator import generate_document
+from language_server.worker import AnalysisWorker
+
+
+# Milliseconds, at the 95th percentile of the edits
+TARGETS: Dict[str, float] = {
+    'change_handler': 1.0,         # didChange returns: the editor never waits on analysis
+    'edit_to_diagnostics': 250.0,  # Debounce end to published diagnostics
+}
+
+DEBOUNCE = 0.05  # Seconds; kept short so the benchmark runs quickly (it isn't timed)
+
+URI = 'file:///benchmark.htmlxify'
+
+
+def generate_lines(target_lines: int, seed: int = 0) -> str:
+    """A generated document of about target_lines lines"""
+    elements = 200
+    for _ in range(2):
+        source = generate_document(seed, elements=elements)
+        elements = max(1, round(target_lines * elements / source.count('\n')))
+    return generate_document(seed, elements=elements)
+
+
+def random_edit(source: str, rng: random.Random) -> str:
+    """source with one edit a user might make"""
+    kind = rng.choice(('text', 'text', 'attribute', 'element'))
+    if kind == 'attribute':
+        quotes = [match.end() for match in re.finditer(r'title: "', source)]
+        if quotes:
+            offset = rng.choice(quotes)
+            return source[:offset] + rng.choice('abcdefgh') + source[offset:]
+    if kind == 'element':
+        opens = [match.end() for match in re.finditer(r'\{\n', source)]
+        offset = rng.choice(opens)
+        return source[:offset] + '  span.item { New item }\n' + source[offset:]
+    # Typing a letter into a line of text
+    texts = [match for match in re.finditer(r'(?m)^ *([A-Z][a-z]+ [^{}()\n]*)$', source)]
+    match = rng.choice(texts)
+    offset = rng.randint(match.start(1) + 1, match.end(1))
+    return source[:offset] + rng.choice('abcdefgh') + source[offset:]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def measure(lines: int, edits: int, seed: int = 0) -> Dict[str, Any]:
+    """Open and edit one document; times in milliseconds"""
+    source = generate_lines(lines, seed)
+    rng = random.Random(seed)
+    published = threading.Event()
+    result: Dict[str, Any] = {}
+    
+    def publish(uri, version, published_source, issues):
+        result['at'] = time.perf_counter()
+        result['issues'] = issues
+        published.set()
+    
+    worker = AnalysisWorker(publish, debounce=DEBOUNCE)
+    try:
+        def analyze(version: int, text: str):
+            """Schedule one version; returns (handler ms, debounce end to diagnostics ms)"""
+            published.clear()
+            started = time.perf_counter()
+            worker.schedule(URI, version, text)
+            handler = time.perf_counter() - started
+            if not published.wait(600):
+                raise RuntimeError("No diagnostics were published")
+            return handler * 1000, (result['at'] - started - DEBOUNCE) * 1000
+        
+        _, open_ms = analyze(0, source)
+        handler_times, edit_times, parsed = [], [], []
+        for version in range(1, edits + 1):
+            source = random_edit(source, rng)
+            handler, latency = analyze(version, source)
+            handler_times.append(handler)
+            edit_times.append(latency)
+            parsed.append(worker.documents[URI].parsed_chars)
+            if any(issue.rule == 'parse-error' for issue in result['issues']):
+                raise RuntimeError("An edit broke the benchmark document")
+    finally:
+        worker.stop()
+    
+    return {
+        'lines': source.count('\n'),
+        'bytes': len(source.encode('utf-8')),
+        'open': open_ms,
+        'change_handler': handler_times,
+        'edit_to_diagnostics': edit_times,
+        'parsed_chars': parsed,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.lsp_latency',
+        description='Time the language server reacting to edits of a large document'
+    )
+    parser.add_argument('--lines', type=int, default=10000, help='Document size in lines (default: 10000)')
+    parser.add_argument('--edits', type=int, default=60, help='Edits to time (default: 60)')
+    parser.add_argument('--seed', type=int, default=0, help='Document and edit seed (default: 0)')
+    parser.add_argument('--check', action='store_true', help='Exit with status 1 if a p95 is over its target')
+    args = parser.parse_args(argv)
+    
+    results = measure(args.lines, args.edits, args.seed)
+    print(f"Document: {results['lines']:,} lines, {results['bytes']:,} bytes")
+    print(f"Open (full parse and validation): {results['open']:,.0f} ms")
+    print(f"Source reparsed per edit: median {percentile(results['parsed_chars'], 0.5):,.0f} chars")
+    print()
+    print(f"{'Latency (ms)':<22} {'p50':>9} {'p95':>9} {'max':>9} {'target':>9}")
+    failed = False
+    for name, target in TARGETS.items():
+        times = results[name]
+        p95 = percentile(times, 0.95)
+        over = p95 > target
+        failed = failed or over
+        print(
+            f"{name:<22} {percentile(times, 0.5):>9.2f} {p95:>9.2f} {max(times):>9.2f} "
+            f"{target:>9.1f}{'  OVER TARGET' if over else ''}"
+        )
+    return 1 if failed and args.check else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Run - Times each pipeline stage on generated documents
+    
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --sizes 1KB,10KB --repeat 5 --call-frequency 0.2
+
+For each size, a seeded document (see generator.py) is compiled --repeat
+times with a Profiler; the JSON results hold the median wall and CPU time
+of every stage, and with --memory the peak traced memory. Sizes are
+skipped when the throughput of the previous size projects them past
+--max-seconds, so the default 1KB..50MB sweep finishes on any machine.
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Dict, Any, List, Optional
+
+import htmlxify
+from htmlxify.build import compiler_version
+from htmlxify.profiler import Profiler
+
+from benchmarks.generator import DEFAULTS, generate_sized
+
+
+DEFAULT_SIZES = '1KB,10KB,100KB,1MB,10MB,50MB'
+UNITS = {'B': 1, 'KB': 1024, 'MB': 1024 ** 2}
+RESULTS_VERSION = 1
+
+
+def parse_size(text: str) -> int:
+    """'100KB' -> 102400"""
+    text = text.strip().upper()
+    for unit in ('KB', 'MB', 'B'):
+        if text.endswith(unit):
+            return int(float(text[:-len(unit)]) * UNITS[unit])
+    return int(text)
+
+
+def measure(source: str, repeat: int, memory: bool) -> Dict[str, Any]:
+    """
+    Compile source repeat times. Per stage: median wall and CPU time, peak
+    memory, and the nodes or bytes it processed.
+    """
+    runs: List[Dict[str, Any]] = []
+    for _ in range(repeat):
+        with Profiler(memory=memory) as profiler:
+            result = htmlxify.compile(source, 'benchmark.htmlxify', profiler=profiler)
+        if not result.ok:
+            raise RuntimeError(f"Generated document failed to compile:\n{result.format_diagnostics()}")
+        runs.append({stage.name: stage for stage in profiler.stages})
+    
+    stages = {}
+    for name in runs[0]:
+        if name == 'load':  # The parser is warm; nothing to measure
+            continue
+        stages[name] = {
+            'wall_ms': round(statistics.median(run[name].wall for run in runs) * 1000, 3),
+            'cpu_ms': round(statistics.median(run[name].cpu for run in runs) * 1000, 3),
+        }
+        if memory:
+            stages[name]['peak_memory_bytes'] = max(run[name].peak_memory for run in runs)
+        for count in ('nodes', 'bytes'):
+            if getattr(runs[0][name], count) is not None:
+                stages[name][count] = getattr(runs[0][name], count)
+    return stages
+
+
+def run(
+    sizes: List[str],
+    params: Dict[str, Any],
+    seed: int = 0,
+    repeat: int = 3,
+    max_seconds: float = 120.0,
+    memory: bool = False,
+    log=print
+) -> Dict[str, Any]:
+    """Benchmark every size; returns the results document"""
+    htmlxify.compile('div { warm }')  # Load the grammar outside the timings
+    
+    results = []
+    throughput: Optional[float] = None  # Bytes per second at the last size
+    for label in sizes:
+        target = parse_size(label)
+        if throughput and max_seconds:
+            projected = target / throughput * repeat
+            if projected > max_seconds:
+                results.append({
+                    'size': label, 'target_bytes': target,
+                    'skipped': f"projected {projected:,.0f}s exceeds --max-seconds {max_seconds:g}",
+                })
+                log(f"{label:>8}  skipped ({results[-1]['skipped']})")
+                continue
+        
+        source = generate_sized(target, seed, **params)
+        started = time.perf_counter()
+        stages = measure(source, repeat, memory)
+        elapsed = time.perf_counter() - started
+        
+        size = len(source.encode('utf-8'))
+        total_ms = round(sum(stage['wall_ms'] for stage in stages.values()), 3)
+        throughput = size / (total_ms / 1000) if total_ms else None
+        results.append({
+            'size': label,
+            'target_bytes': target,
+            'bytes': size,
+            'nodes': stages['parse'].get('nodes'),
+            'runs': repeat,
+            'stages': stages,
+            'total_ms': total_ms,
+            'throughput_kb_s': round(size / 1024 / (total_ms / 1000), 1) if total_ms else None,
+        })
+        log(f"{label:>8}  {size:>11,} bytes  {total_ms:>11,.1f} ms  ({elapsed:.1f}s for {repeat} runs)")
+    
+    return {
+        'version': RESULTS_VERSION,
+        'meta': {
+            'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'compiler': compiler_version(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': seed,
+            'params': params,
+            'repeat': repeat,
+            'memory': memory,
+        },
+        'results': results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.run',
+        description='Time each htmlxify pipeline stage on generated documents'
+    )
+    parser.add_argument('--output', '-o', default='benchmark-results.json', help='Results file (default: benchmark-results.json)')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'Comma-separated document sizes (default: {DEFAULT_SIZES})')
+    parser.add_argument('--seed', type=int, default=0, help='Generator seed (default: 0)')
+    parser.add_argument('--repeat', type=int, default=3, help='Compiles per size; stage times are medians (default: 3)')
+    parser.add_argument('--max-seconds', type=float, default=120.0, help='Skip sizes projected to take longer; 0 for no limit (default: 120)')
+    parser.add_argument('--memory', action='store_true', help='Also record peak memory per stage (slows every stage down)')
+    parser.add_argument('--depth', type=int, default=DEFAULTS['depth'], help='Maximum nesting depth')
+    parser.add_argument('--text-ratio', type=float, default=DEFAULTS['text_ratio'], help='Chance an element holds text')
+    parser.add_argument('--attribute-density', type=float, default=DEFAULTS['attribute_density'], help='Mean attributes per element')
+    parser.add_argument('--call-frequency', type=float, default=DEFAULTS['call_frequency'], help='Chance an element has ⚡-call')
+    parser.add_argument('--data-frequency', type=float, default=DEFAULTS['data_frequency'], help='Chance an element has ⚡-data')
+    args = parser.parse_args(argv)
+    
+    if args.repeat < 1:
+        parser.error('--repeat must be at least 1')
+    
+    params = {
+        'depth': args.depth,
+        'text_ratio': args.text_ratio,
+        'attribute_density': args.attribute_density,
+        'call_frequency': args.call_frequency,
+        'data_frequency': args.data_frequency,
+    }
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    try:
+        for size in sizes:
+            parse_size(size)
+    except ValueError:
+        parser.error(f'--sizes: cannot read {size!r}; use e.g. 512B, 10KB, 1.5MB')
+    
+    document = run(sizes, params, args.seed, args.repeat, args.max_seconds, args.memory)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
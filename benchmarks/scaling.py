@@ -0,0 +1,117 @@
+"""
+Scaling - Growth exponents of each pipeline stage
+    
+    python -m benchmarks.scaling --max-exponent 1.3
+
+Times every stage on documents of one shape at doubling sizes and fits
+time = c * size^k on a log-log scale; k is the stage's growth exponent
+(1 is linear, 2 quadratic). Shapes stress the cases that have gone
+superlinear before: a long run of text, many siblings, deep nesting.
+TestScaling in tests/integration/test_e2e.py fails when any exponent exceeds a bound.
+"""
+
+import argparse
+import math
+import sys
+from typing import Callable, Dict, List
+
+import htmlxify
+from htmlxify.profiler import Profiler
+
+
+def long_text(n: int) -> str:
+    """One element holding n words of text"""
+    words = ('lorem', 'ipsum', 'dolor,', 'sit', 'amet.', 'Consectetur', 'adipiscing!')
+    return 'p { ' + ' '.join(words[i % len(words)] for i in range(n)) + ' }\n'
+
+
+def wide_siblings(n: int) -> str:
+    """n sibling elements in one parent"""
+    items = ''.join(f'  span.item(title: "Item {i}") {{ Item {i} }}\n' for i in range(n))
+    return 'div.list {\n' + items + '}\n'
+
+
+def deep_nesting(n: int) -> str:
+    """n elements nested in each other (unindented, so size grows linearly)"""
+    return ''.join(f'div.level{i % 5} {{\n' for i in range(n)) + 'Bottom\n' + '}\n' * n
+
+
+# Shape -> (document builder, element/word counts to time)
+SHAPES: Dict[str, tuple] = {
+    'long_text': (long_text, [400, 800, 1600, 3200]),
+    'wide_siblings': (wide_siblings, [25, 50, 100, 200]),
+    'deep_nesting': (deep_nesting, [10, 20, 40, 80]),
+}
+
+# Stages faster than this at the largest size are too noisy to fit
+MIN_MS = 1.0
+
+
+def fit_exponent(sizes: List[float], times: List[float]) -> float:
+    """Least-squares slope of log(time) against log(size)"""
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(time, 1e-9)) for time in times]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    spread = sum((x - mean_x) ** 2 for x in xs)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / spread
+
+
+def measure_curve(build: Callable[[int], str], counts: List[int], repeat: int = 3) -> Dict[str, object]:
+    """
+    Source sizes in bytes, and each stage's fastest wall time (ms) over
+    repeat compiles at every count
+    """
+    htmlxify.compile('div { warm }')  # Keep the grammar load out of the curve
+    
+    sizes = []
+    stages: Dict[str, List[float]] = {}
+    for count in counts:
+        source = build(count)
+        sizes.append(len(source.encode('utf-8')))
+        best: Dict[str, float] = {}
+        for _ in range(repeat):
+            with Profiler(memory=False) as profiler:
+                result = htmlxify.compile(source, 'scaling.htmlxify', profiler=profiler)
+            if not result.ok:
+                raise RuntimeError(f"Scaling document failed to compile:\n{result.format_diagnostics()}")
+            for stage in profiler.stages:
+                best[stage.name] = min(best.get(stage.name, math.inf), stage.wall * 1000)
+        for name, ms in best.items():
+            if name != 'load':
+                stages.setdefault(name, []).append(ms)
+    return {'sizes': sizes, 'stages': stages}
+
+
+def growth_exponents(shape: str, repeat: int = 3, min_ms: float = MIN_MS) -> Dict[str, float]:
+    """Growth exponent of every stage slow enough to measure, for one shape"""
+    build, counts = SHAPES[shape]
+    curve = measure_curve(build, counts, repeat)
+    return {
+        stage: round(fit_exponent(curve['sizes'], times), 2)
+        for stage, times in curve['stages'].items()
+        if times[-1] >= min_ms
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.scaling',
+        description='Fit the growth exponent of each compile stage per document shape'
+    )
+    parser.add_argument('--shape', choices=sorted(SHAPES), action='append', help='Shape to measure (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='Compiles per size; the fastest is kept (default: 3)')
+    parser.add_argument('--max-exponent', type=float, help='Exit with status 1 if any exponent is above this')
+    args = parser.parse_args(argv)
+    
+    failed = False
+    for shape in args.shape or SHAPES:
+        exponents = growth_exponents(shape, args.repeat)
+        for stage, exponent in exponents.items():
+            over = args.max_exponent is not None and exponent > args.max_exponent
+            failed = failed or over
+            print(f"{shape:<14} {stage:<10} {exponent:>6.2f}{'  OVER BOUND' if over else ''}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
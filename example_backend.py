@@ -5,6 +5,7 @@ Demonstrates backend integration with the markup language
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
+from werkzeug.exceptions import MethodNotAllowed, NotFound
 from datetime import datetime, timedelta
 import json
 
@@ -47,6 +48,7 @@ def index():
             'GET /api/getStats': 'Get platform statistics',
             'GET /api/users': 'Get all users',
             'GET /api/health': 'Health check',
+            'POST /api/_batch': 'Run several API calls in one request',
         }
     })
 
@@ -197,6 +199,80 @@ def get_forms():
         'timestamp': datetime.now().isoformat()
     })
 
+@app.route('/api/_batch', methods=['POST'])
+def batch_calls():
+    """
+    Handle batched calls from the generated JavaScript (batch mode).
+    Body: {"calls": [{"path": "getData"}, {"path": "health", "method": "GET"}]}
+    Returns one {"status", "headers", "body"} result per call, in request
+    order; headers holds the call's Cache-Control and ETag. A call's
+    "etag" is sent as If-None-Match. A call without a method uses POST,
+    or the route's own method if it doesn't accept POST.
+    """
+    payload = request.get_json(silent=True)
+    calls = payload.get('calls') if isinstance(payload, dict) else None
+    if not isinstance(calls, list):
+        return jsonify({
+            'status': 'error',
+            'message': 'Expected a JSON object with a "calls" list'
+        }), 400
+    
+    results = []
+    responses = {}
+    for call in calls:
+        if not isinstance(call, dict):
+            results.append({'status': 400, 'body': {
+                'status': 'error',
+                'message': 'Invalid batch call: expected an object'
+            }})
+            continue
+        
+        path = str(call.get('path', '')).strip('/')
+        method = str(call.get('method') or batch_method(path)).upper()
+        
+        # Repeated calls to the same endpoint are answered once
+        key = (method, path)
+        if key not in responses:
+            if not path or path.split('/')[0] == '_batch':
+                responses[key] = {'status': 400, 'body': {
+                    'status': 'error',
+                    'message': f'Invalid batch call "{path}"'
+                }}
+            else:
+                body = call.get('body', {'timestamp': payload.get('timestamp')})
+                headers = {'If-None-Match': str(call['etag'])} if call.get('etag') else {}
+                with app.test_request_context(f'/api/{path}', method=method, json=body, headers=headers):
+                    response = app.full_dispatch_request()
+                responses[key] = {
+                    'status': response.status_code,
+                    'headers': {
+                        name: response.headers[name]
+                        for name in ('Cache-Control', 'ETag') if name in response.headers
+                    },
+                    'body': response.get_json(silent=True)
+                }
+        
+        results.append(responses[key])
+    
+    return jsonify({
+        'status': 'success',
+        'results': results,
+        'total': len(results),
+        'timestamp': datetime.now().isoformat()
+    })
+
+def batch_method(path):
+    """POST, unless the route at /api/<path> only takes other methods"""
+    try:
+        app.url_map.bind('localhost').match(f'/api/{path}', method='POST')
+    except MethodNotAllowed as e:
+        methods = [m for m in e.valid_methods or [] if m not in ('HEAD', 'OPTIONS')]
+        if methods:
+            return methods[0]
+    except NotFound:
+        pass
+    return 'POST'
+
 # ============ ERROR HANDLERS ============
 
 @app.errorhandler(404)
@@ -227,7 +303,8 @@ def add_headers(response):
     """Add security and CORS headers"""
     response.headers['Access-Control-Allow-Origin'] = '*'
     response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-    response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type, If-None-Match'
+    response.headers['Access-Control-Expose-Headers'] = 'Cache-Control, ETag'
     response.headers['X-Content-Type-Options'] = 'nosniff'
     return response
 
@@ -249,6 +326,7 @@ if __name__ == '__main__':
     • GET/POST /api/getStats           - Get statistics
     • GET      /api/users              - Get all users
     • GET      /api/health             - Health check
+    • POST     /api/_batch             - Batched calls
     
     Press Ctrl+C to stop the server.
     """)
@@ -0,0 +1,28 @@
+"""
+htmlxify - A simplified web markup language compiler
+    
+    import htmlxify
+    result = htmlxify.compile(source, 'index.htmlxify')
+    result = await htmlxify.compile_async(source, 'index.htmlxify')
+"""
+
+_EXPORTS = {
+    'compile': 'compiler',
+    'CompileResult': 'compiler',
+    'CompileCancelled': 'compiler',
+    'compile_async': 'aio',
+    'compile_file_async': 'aio',
+    'stream_html': 'aio',
+    'CompileError': 'aio',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    # Loaded on first use, so light modules (htmlxify.client) can be
+    # imported without pulling in Lark and tinycss2
+    if name in _EXPORTS:
+        import importlib
+        return getattr(importlib.import_module(f'htmlxify.{_EXPORTS[name]}'), name)
+    raise AttributeError(f"module 'htmlxify' has no attribute {name!r}")
@@ -0,0 +1,122 @@
+"""
+Aio - asyncio API for async web services
+    
+    import htmlxify
+    
+    result = await htmlxify.compile_async(source, 'page.htmlxify')
+    
+    async for chunk in htmlxify.stream_html(source, 'page.htmlxify'):
+        await response.write(chunk)
+
+Compiling a large page takes long enough to stall an event loop, so the
+pipeline (see compiler.py) runs on an executor: the loop's default thread
+pool, or any concurrent.futures executor passed in. A ProcessPoolExecutor
+compiles in parallel across cores; create it with
+initializer=htmlxify.build.warm_parser so workers load the grammar once.
+File reads and writes run on threads, never on the loop.
+
+Cancelling the awaiting task cancels the compile: a queued compile never
+starts, and one already running on a thread stops at its next stage. On
+a process pool a running compile finishes in its worker and the result is
+dropped.
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, AsyncIterator, Optional
+
+from htmlxify.build import write_outputs, write_runtime
+from htmlxify.compiler import CompileResult, compile
+
+
+class CompileError(Exception):
+    """Raised by stream_html when the page does not compile; see .result"""
+    
+    def __init__(self, result: CompileResult):
+        super().__init__(result.errors[0].message if result.errors else 'Compilation failed')
+        self.result = result
+
+
+async def compile_async(
+    source: str,
+    filename: str = '<string>',
+    options: Optional[Dict[str, Any]] = None,
+    executor: Optional[Executor] = None
+) -> CompileResult:
+    """
+    htmlxify.compile() without blocking the event loop.
+    
+    executor runs the compile; None uses the loop's default thread pool.
+    """
+    loop = asyncio.get_running_loop()
+    
+    # Threads share memory, so a running compile can be told to stop
+    cancelled = None if isinstance(executor, ProcessPoolExecutor) else threading.Event()
+    job = functools.partial(compile, source, filename, options, cancelled=cancelled)
+    
+    try:
+        return await loop.run_in_executor(executor, job)
+    except asyncio.CancelledError:
+        if cancelled is not None:
+            cancelled.set()
+        raise
+
+
+async def compile_file_async(
+    input_path: str,
+    output_dir: Optional[str] = None,
+    options: Optional[Dict[str, Any]] = None,
+    executor: Optional[Executor] = None
+) -> CompileResult:
+    """
+    Read and compile a source file. When output_dir is given and the page
+    compiles, its artifacts (and the shared runtime, if enabled) are
+    written there as the CLI would.
+    """
+    loop = asyncio.get_running_loop()
+    path = Path(input_path)
+    # run_in_executor rather than asyncio.to_thread, which needs Python 3.9
+    source = await loop.run_in_executor(None, functools.partial(path.read_text, encoding='utf-8'))
+    result = await compile_async(source, path.name, options, executor)
+    
+    if output_dir is not None and result.ok:
+        out = Path(output_dir)
+        await loop.run_in_executor(None, _write_page, result, path, out, options or {})
+    return result
+
+
+def _write_page(result: CompileResult, path: Path, out: Path, options: Dict[str, Any]):
+    """Write one page's artifacts (run on a thread)"""
+    out.mkdir(parents=True, exist_ok=True)
+    write_outputs(result, Path(path.name), out)
+    if options.get('shared_runtime'):
+        write_runtime(out, options)
+
+
+async def stream_html(
+    source: str,
+    filename: str = '<string>',
+    options: Optional[Dict[str, Any]] = None,
+    executor: Optional[Executor] = None,
+    chunk_size: int = 16384
+) -> AsyncIterator[str]:
+    """
+    Compile a page and yield its HTML in chunks of at most chunk_size
+    characters, giving the loop a turn between chunks so a large page can
+    be written to a client as it goes. Raises CompileError (before any
+    chunk) if the page does not compile.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+    
+    result = await compile_async(source, filename, options, executor)
+    if not result.ok:
+        raise CompileError(result)
+    
+    html = result.html
+    for start in range(0, len(html), chunk_size):
+        yield html[start:start + chunk_size]
+        await asyncio.sleep(0)
@@ -0,0 +1,331 @@
+"""
+Build - Compiles a whole source tree of .htmlxify files
+
+Used by `htmlxify build src/ dist/`. Inputs are found recursively and the
+relative directory layout is kept in the output directory. Pages compile in
+parallel across a process pool; each worker loads the grammar once when it
+starts, so the parser stays warm for every page it compiles.
+
+Builds are incremental. A state file in the output directory records each
+page's content hash and output artifacts, along with the compiler version
+and the build options. Pages whose hash, compiler and options are unchanged
+(and whose outputs still exist) are skipped.
+"""
+
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+
+from htmlxify.compiler import CompileResult, compile
+from htmlxify.parser.ast_builder import ASTBuilder
+from htmlxify.generators.css_gen import CSSGenerator
+from htmlxify.generators.js_gen import JSGenerator
+
+
+SOURCE_SUFFIX = '.htmlxify'
+STATE_FILE = '.htmlxify-build.json'
+
+
+def find_sources(src_dir: Path) -> List[Path]:
+    """All source files under src_dir, relative to it, in a stable order"""
+    return sorted(
+        path.relative_to(src_dir)
+        for path in src_dir.rglob('*' + SOURCE_SUFFIX)
+        if path.is_file()
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def compiler_version() -> str:
+    """Digest of the compiler's own sources and grammar, as loaded by this process"""
+    package = Path(__file__).parent
+    digest = hashlib.sha256()
+    for path in sorted(package.rglob('*.py')) + sorted(package.rglob('*.lark')):
+        digest.update(path.relative_to(package).as_posix().encode('utf-8'))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def options_fingerprint(options: Dict[str, Any]) -> str:
+    """Stable digest of the build options"""
+    encoded = json.dumps(options, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def load_state(out_dir: Path, compiler: str, fingerprint: str) -> Tuple[Dict[str, Any], bool]:
+    """
+    Page entries from the previous build, keyed by source path, and whether
+    they are current: written by this compiler version with these options.
+    Entries that are not current still list each page's outputs, so the
+    outputs of deleted sources can be removed. Empty when there is no
+    state file.
+    """
+    try:
+        state = json.loads((out_dir / STATE_FILE).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}, False
+    
+    pages = state.get('pages') if isinstance(state, dict) else None
+    if not isinstance(pages, dict):
+        return {}, False
+    return pages, state.get('compiler') == compiler and state.get('options') == fingerprint
+
+
+def save_state(out_dir: Path, compiler: str, fingerprint: str, pages: Dict[str, Any]):
+    """Write the state file atomically"""
+    state = {'compiler': compiler, 'options': fingerprint, 'pages': pages}
+    temp = out_dir / (STATE_FILE + '.tmp')
+    temp.write_text(json.dumps(state, indent=1, sort_keys=True), encoding='utf-8')
+    os.replace(temp, out_dir / STATE_FILE)
+
+
+def is_up_to_date(src_dir: Path, out_dir: Path, rel_path: str, entry: Optional[Dict[str, Any]]) -> bool:
+    """
+    True when a page's recorded build still matches its source. The file's
+    size and mtime are checked first; the content is only hashed when they
+    differ, so a no-op rebuild does no reads beyond the state file. An
+    entry without diagnostics (from an older build) is never up to date.
+    """
+    if not entry or 'diagnostics' not in entry or not all((out_dir / output).exists() for output in entry.get('outputs', [])):
+        return False
+    
+    stat = (src_dir / rel_path).stat()
+    if entry.get('mtime_ns') == stat.st_mtime_ns and entry.get('size') == stat.st_size:
+        return True
+    
+    content = (src_dir / rel_path).read_bytes()
+    if hashlib.sha256(content).hexdigest() != entry.get('hash'):
+        return False
+    
+    # Touched but not changed: refresh the stamp so the next check is cheap
+    entry['mtime_ns'] = stat.st_mtime_ns
+    entry['size'] = stat.st_size
+    return True
+
+
+def runtime_filename(options: Dict[str, Any]) -> str:
+    """Name of the shared runtime file for these build options"""
+    empty = {'type': 'Document', 'children': []}
+    return JSGenerator(empty, minify=options.get('minify', False)).runtime_filename()
+
+
+def write_runtime(out_dir: Path, options: Dict[str, Any]) -> Path:
+    """Write the shared runtime for these options into out_dir, if missing"""
+    runtime_gen = JSGenerator(
+        {'type': 'Document', 'children': []},
+        minify=options.get('minify', False)
+    )
+    runtime_path = out_dir / runtime_gen.runtime_filename()
+    if not runtime_path.exists():
+        # Atomic, as concurrent compiles (see daemon.py) may race to write it
+        with tempfile.NamedTemporaryFile(
+            'w', encoding='utf-8', dir=out_dir, suffix='.tmp', delete=False
+        ) as temp:
+            temp.write(runtime_gen.generate_runtime())
+        os.replace(temp.name, runtime_path)
+    return runtime_path
+
+
+def warm_parser():
+    """Worker initializer: load the grammar before the first page arrives"""
+    ASTBuilder('', '<warmup>')
+
+
+def output_paths(rel_path: Path) -> Dict[str, Path]:
+    """Artifact paths for a source, relative to the output directory"""
+    name = rel_path.name
+    stem = name[:-len(SOURCE_SUFFIX)] if name.endswith(SOURCE_SUFFIX) else rel_path.stem
+    return {
+        'html': rel_path.parent / (stem + '.html'),
+        'source_map': rel_path.parent / (stem + '.html.map'),
+        'css': rel_path.parent / (stem + '.css'),
+        'js': rel_path.parent / (stem + '.js'),
+    }
+
+
+def compile_file(
+    src_dir: str,
+    rel_path: str,
+    out_dir: str,
+    options: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Compile one page and write its artifacts.
+    
+    Returns a result dict with 'source', 'ok', 'seconds', 'outputs', the
+    'stamp' recorded in the build state, the page's 'diagnostics' as
+    records (see diagnostics.py; 'file' is rel_path) and, on failure,
+    'error'. 'js_bytes' is the size of the page's script, and
+    'runtime_saved_bytes' what the shared runtime kept out of it (0
+    without shared_runtime, or when the page failed).
+    """
+    started = time.perf_counter()
+    result = {
+        'source': rel_path, 'ok': False, 'outputs': [], 'error': None, 'diagnostics': [],
+        'js_bytes': 0, 'runtime_saved_bytes': 0,
+    }
+    
+    try:
+        path = Path(src_dir) / rel_path
+        stat = path.stat()
+        content = path.read_bytes()
+        result['stamp'] = {
+            'hash': hashlib.sha256(content).hexdigest(),
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+        }
+        
+        page_options = dict(options)
+        if options.get('shared_runtime'):
+            # The shared runtime lives once at the output root
+            depth = len(Path(rel_path).parts) - 1
+            page_options['runtime_src'] = '../' * depth + runtime_filename(options)
+        
+        compiled = compile(content.decode('utf-8'), path.name, page_options)
+        # Records, not text: formatting is left to whoever shows them
+        result['diagnostics'] = [
+            dict(record, file=rel_path) for record in compiled.diagnostic_records()
+        ]
+        
+        if compiled.ok:
+            result['outputs'] = write_outputs(compiled, Path(rel_path), Path(out_dir))
+            result['ok'] = True
+            result['js_bytes'] = len(compiled.js.encode('utf-8'))
+            if options.get('shared_runtime'):
+                inline_bytes = len((compiled.runtime + '\n\n' + compiled.js).encode('utf-8'))
+                result['runtime_saved_bytes'] = inline_bytes - result['js_bytes']
+        else:
+            result['error'] = compiled.errors[0].message
+    except Exception as e:
+        result['error'] = str(e) or type(e).__name__
+    
+    result['error'] = result['error'] and result['error'].strip().splitlines()[0]
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def write_outputs(compiled: CompileResult, rel_path: Path, out_dir: Path) -> List[str]:
+    """Write a compiled page's artifacts; returns their paths, relative to out_dir"""
+    paths = output_paths(rel_path)
+    (out_dir / rel_path).parent.mkdir(parents=True, exist_ok=True)
+    for artifact, path in paths.items():
+        (out_dir / path).write_text(getattr(compiled, artifact), encoding='utf-8')
+    return [path.as_posix() for path in paths.values()]
+
+
+def build(
+    src_dir: str,
+    out_dir: str,
+    options: Optional[Dict[str, Any]] = None,
+    jobs: Optional[int] = None,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+    force: bool = False,
+    paths: Optional[Iterable[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Compile every changed page under src_dir into out_dir.
+    
+    jobs is the number of worker processes (default: CPU count); with one
+    job, or one page, pages compile in this process. on_result is called
+    with each compiled page's result as it completes. Unchanged pages are
+    skipped (their results have 'skipped': True) unless force is set.
+    Outputs of sources that no longer exist are removed. Returns the
+    results in source order. Invalid custom keyframes raise ValueError.
+    
+    paths limits the build to the given sources (relative to src_dir, as
+    reported by a file watcher); the rest of the build state is kept.
+    """
+    options = options or {}
+    src = Path(src_dir)
+    out = Path(out_dir)
+    if not src.is_dir():
+        raise FileNotFoundError(f"Source directory '{src_dir}' not found")
+    if options.get('keyframes') is not None:
+        # Once here, rather than failing every page
+        CSSGenerator.check_keyframes(options['keyframes'])
+    
+    if paths is None:
+        sources = [path.as_posix() for path in find_sources(src)]
+    else:
+        paths = set(paths)
+        sources = sorted(path for path in paths if (src / path).is_file())
+    out.mkdir(parents=True, exist_ok=True)
+    
+    compiler = compiler_version()
+    fingerprint = options_fingerprint(options)
+    previous, current = load_state(out, compiler, fingerprint)
+    if force or not current:
+        # Every page is out of date; only the outputs are kept, for cleanup
+        previous = {
+            path: {'outputs': entry.get('outputs', [])}
+            for path, entry in previous.items() if isinstance(entry, dict)
+        }
+    
+    if options.get('shared_runtime') and sources:
+        # Written once here rather than racing between workers
+        write_runtime(out, options)
+    
+    pages = {}
+    if paths is not None:
+        pages = {path: entry for path, entry in previous.items() if path not in paths}
+    results = []
+    stale = []
+    for rel_path in sources:
+        entry = previous.get(rel_path)
+        if is_up_to_date(src, out, rel_path, entry):
+            pages[rel_path] = entry
+            results.append({
+                'source': rel_path, 'ok': True, 'skipped': True,
+                'outputs': entry['outputs'], 'error': None,
+                'diagnostics': entry.get('diagnostics', []), 'seconds': 0.0
+            })
+        else:
+            stale.append(rel_path)
+    
+    # Sources deleted since the last build take their outputs with them
+    existing = set(sources)
+    for rel_path, entry in previous.items():
+        if rel_path not in existing and (paths is None or rel_path in paths):
+            for output in entry.get('outputs', []):
+                with contextlib.suppress(OSError):
+                    (out / output).unlink()
+    
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(stale) or 1))
+    
+    def finished(result):
+        results.append(result)
+        if result['ok']:
+            # Diagnostics are kept so an up-to-date page still reports them
+            pages[result['source']] = dict(
+                result['stamp'], outputs=result['outputs'], diagnostics=result['diagnostics']
+            )
+        elif result['source'] in previous:
+            # Keep the old outputs on record so they are removed with the source
+            pages[result['source']] = dict(previous[result['source']], hash=None, mtime_ns=None)
+        if on_result:
+            on_result(result)
+    
+    try:
+        if jobs == 1:
+            for rel_path in stale:
+                finished(compile_file(str(src), rel_path, str(out), options))
+        else:
+            with ProcessPoolExecutor(max_workers=jobs, initializer=warm_parser) as pool:
+                futures = [
+                    pool.submit(compile_file, str(src), rel_path, str(out), options)
+                    for rel_path in stale
+                ]
+                for future in as_completed(futures):
+                    finished(future.result())
+    finally:
+        # Pages finished before an interrupt are not rebuilt next time
+        save_state(out, compiler, fingerprint, pages)
+    
+    return sorted(results, key=lambda result: result['source'])
@@ -2,25 +2,103 @@
 """
 htmlxify Compiler - Command Line Interface
 Usage: htmlxify input.htmlxify [output-dir]
+       htmlxify build src/ [output-dir] [--jobs N]
+       htmlxify watch src/ [output-dir]
+       htmlxify daemon [--socket PATH]
 """
 
+import os
 import sys
+import json
+import time
 import argparse
+import contextlib
 from pathlib import Path
 
-from htmlxify.parser.ast_builder import ASTBuilder
-from htmlxify.parser.indent_processor import IndentationProcessor
-from htmlxify.validator.semantic import SemanticValidator
-from htmlxify.generators.html_gen import HTMLGenerator
-from htmlxify.generators.css_gen import CSSGenerator
-from htmlxify.generators.js_gen import JSGenerator
+# The compiler itself is imported inside the commands that use it, so
+# `--daemon` clients don't pay for loading Lark and tinycss2
+from htmlxify import client, diagnostics
+
+
+def add_compile_options(parser: argparse.ArgumentParser):
+    """Output options shared by single-file compiles and builds"""
+    parser.add_argument(
+        '--shared-runtime',
+        action='store_true',
+        help='Write the JS runtime once as htmlxify-runtime.<hash>.js instead of inlining it'
+    )
+    
+    parser.add_argument(
+        '--batch-calls',
+        action='store_true',
+        help='Send page-load API calls as one request to the backend /_batch endpoint'
+    )
+    
+    parser.add_argument(
+        '--minify',
+        action='store_true',
+        help='Production JS: strip comments and logging, inline only the runtime parts the page uses'
+    )
+    
+    parser.add_argument(
+        '--keyframes',
+        metavar='FILE',
+        help='JSON file of custom @keyframes for animate: {name: {offset: {property: value}}}'
+    )
+
+
+def compile_options(args) -> dict:
+    """compile() options from the flags of add_compile_options"""
+    options = {
+        'shared_runtime': args.shared_runtime,
+        'batch_calls': args.batch_calls,
+        'minify': args.minify,
+    }
+    if args.keyframes:
+        try:
+            options['keyframes'] = json.loads(Path(args.keyframes).read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            print(f"ERROR: reading keyframes from '{args.keyframes}': {e}")
+            sys.exit(1)
+    return options
+
+
+def add_diagnostics_options(parser: argparse.ArgumentParser):
+    """Machine-readable errors and warnings, for single-file compiles and builds"""
+    parser.add_argument(
+        '--diagnostics',
+        metavar='FILE',
+        help='Write every error and warning (file, line, column, rule, severity, message) to FILE'
+    )
+    
+    parser.add_argument(
+        '--diagnostics-format',
+        choices=('json', 'sarif'),
+        default='json',
+        help='Format of --diagnostics: a JSON array of records, or a SARIF 2.1.0 log (default: json)'
+    )
+
+
+def write_diagnostics(args, records):
+    """Write diagnostic records to --diagnostics, if it was given"""
+    if not args.diagnostics:
+        return
+    if args.diagnostics_format == 'sarif':
+        text = diagnostics.to_sarif_json(records)
+    else:
+        text = diagnostics.to_json(records, indent=2)
+    Path(args.diagnostics).write_text(text + '\n', encoding='utf-8')
 
 
 def main():
     """Main entry point"""
+    commands = {'build': build_main, 'watch': watch_main, 'daemon': daemon_main}
+    if len(sys.argv) > 1 and sys.argv[1] in commands:
+        return commands[sys.argv[1]](sys.argv[2:])
+    
     parser = argparse.ArgumentParser(
         description='htmlxify Compiler',
-        epilog='Example: htmlxify index.htmlxify dist/'
+        epilog='Example: htmlxify index.htmlxify dist/  (or: htmlxify build src/ dist/)'
     )
     
     parser.add_argument(
@@ -47,7 +125,48 @@ def main():
         help='Verbose output'
     )
     
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help='Forward the compile to a running `htmlxify daemon` (compiles locally if none is running)'
+    )
+    
+    parser.add_argument(
+        '--socket',
+        help='Daemon socket path (default: $HTMLXIFY_SOCKET or a per-user socket)'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        help='Print the time, CPU and peak memory of each compile stage'
+    )
+    
+    parser.add_argument(
+        '--profile-json',
+        metavar='FILE',
+        help='Write the stage profile to FILE as JSON (implies --profile)'
+    )
+    
+    parser.add_argument(
+        '--trace',
+        metavar='FILE',
+        help='Append a JSON line per compile stage span (filename, nodes, bytes, duration) to FILE'
+    )
+    
+    parser.add_argument(
+        '--validate-jobs',
+        type=int,
+        default=1,
+        metavar='N',
+        help='Validate large documents in N processes (default: 1)'
+    )
+    
+    add_compile_options(parser)
+    add_diagnostics_options(parser)
+    
     args = parser.parse_args()
+    profiling = args.profile or args.profile_json
     
     # Validate input file
     input_path = Path(args.input)
@@ -58,6 +177,15 @@ def main():
     if input_path.suffix not in ['.htmlxify']:
         print(f"⚠️  Warning: File extension should be .htmlxify")
     
+    if args.daemon and (profiling or args.trace):
+        print("Note: --profile and --trace compile in this process, not in the daemon")
+    elif args.daemon and compile_with_daemon(args, input_path):
+        return
+    
+    from htmlxify.compiler import compile
+    from htmlxify.profiler import Profiler
+    from htmlxify import tracing
+    
     # Read source
     try:
         source = input_path.read_text(encoding='utf-8')
@@ -65,78 +193,83 @@ def main():
         print(f"ERROR: reading file: {e}")
         sys.exit(1)
     
+    options = dict(compile_options(args), validate_jobs=args.validate_jobs)
+    
     print(f"\nCompiling {input_path.name}...\n")
     
+    profiler = Profiler() if profiling else None
+    tracer = tracing.JSONLinesTracer(args.trace) if args.trace else None
+    if tracer:
+        tracing.set_tracer(tracer)
+    
     try:
-        # Step 1: Parse
         if args.verbose:
-            print("Step 1/6: Parsing...")
+            print("Compiling (parse, indentation, validation, generation)...")
         
-        ast_builder = ASTBuilder(source, input_path.name)
-        ast = ast_builder.parse()
-        print("OK - Parsing complete")
-        
-        # Step 2: Process indentation
-        if args.verbose:
-            print("Step 2/6: Processing indentation...")
+        result = compile(source, input_path.name, options, profiler=profiler)
         
-        indent_processor = IndentationProcessor()
-        ast = indent_processor.process(ast)
-        print("OK - Indentation processed")
-        
-        # Step 3: Validate
-        if args.verbose:
-            print("Step 3/6: Validating...")
-        
-        validator = SemanticValidator(ast, input_path.name)
-        if not validator.validate():
+        write_diagnostics(args, [
+            dict(record, file=input_path.as_posix()) for record in result.diagnostic_records()
+        ])
+        report = result.format_diagnostics()
+        if report:
+            print(report)
+        if not result.ok:
             sys.exit(1)
+        print("OK - Parsing complete")
+        print("OK - Indentation processed")
         print("OK - Validation complete")
         
-        # Step 4: Create output directory
         output_dir = Path(args.output)
-        output_dir.mkdir(exist_ok=True, parents=True)
+        stem = input_path.name.replace('.htmlxify', '')
+        html_path = output_dir / (stem + '.html')
+        css_path = output_dir / (stem + '.css')
+        js_path = output_dir / (stem + '.js')
+        outputs = {
+            html_path: result.html,
+            output_dir / (stem + '.html.map'): result.source_map,
+            css_path: result.css,
+            js_path: result.js,
+        }
+        if args.shared_runtime:
+            # Runtime name is content-hashed, so an existing file is identical
+            runtime_path = output_dir / result.runtime_filename
+            if not runtime_path.exists():
+                outputs[runtime_path] = result.runtime
         
-        # Step 5: Generate HTML
-        if args.verbose:
-            print("Step 4/6: Generating HTML...")
-        
-        html_gen = HTMLGenerator(ast, input_path.name)
-        html, source_map = html_gen.generate()
-        
-        html_path = output_dir / input_path.name.replace('.htmlxify', '.html')
-        html_path.write_text(html, encoding='utf-8')
-        
-        # Write source map
-        source_map_path = output_dir / (input_path.name.replace('.htmlxify', '.html') + '.map')
-        source_map_path.write_text(source_map, encoding='utf-8')
-        
-        print(f"OK - Generated {html_path}")
-        
-        # Step 6: Generate CSS
-        if args.verbose:
-            print("Step 5/6: Generating CSS...")
-        
-        css_gen = CSSGenerator(ast)
-        css = css_gen.generate()
-        
-        css_path = output_dir / input_path.name.replace('.htmlxify', '.css')
-        css_path.write_text(css, encoding='utf-8')
-        print(f"OK - Generated {css_path}")
+        with (profiler.stage('write') if profiler else contextlib.nullcontext()):
+            output_dir.mkdir(exist_ok=True, parents=True)
+            for path, text in outputs.items():
+                path.write_text(text, encoding='utf-8')
+        if profiler:
+            profiler.count('write', bytes=sum(len(text.encode('utf-8')) for text in outputs.values()))
         
-        # Step 7: Generate JavaScript
-        if args.verbose:
-            print("Step 6/6: Generating JavaScript...")
+        for path in outputs:
+            if path.suffix != '.map':
+                print(f"OK - Generated {path}")
         
-        js_gen = JSGenerator(ast)
-        js = js_gen.generate()
+        if args.shared_runtime:
+            page_bytes = len(result.js.encode('utf-8'))
+            inline_bytes = len((result.runtime + '\n\n' + result.js).encode('utf-8'))
+            print(
+                f"   Page JS: {page_bytes:,} bytes "
+                f"(saved {inline_bytes - page_bytes:,} bytes via shared runtime)"
+            )
         
-        js_path = output_dir / input_path.name.replace('.htmlxify', '.js')
-        js_path.write_text(js, encoding='utf-8')
-        print(f"OK - Generated {js_path}")
+        if args.minify:
+            print(
+                f"   Page JS: {len(result.js.encode('utf-8')):,} bytes minified "
+                f"({result.js_unminified_bytes:,} bytes unminified)"
+            )
         
         print("\nCompilation successful!\n")
         
+        if profiler:
+            print(profiler.format_table() + "\n")
+            if args.profile_json:
+                Path(args.profile_json).write_text(profiler.to_json(), encoding='utf-8')
+                print(f"Profile written to {args.profile_json}\n")
+    
     except KeyboardInterrupt:
         print("\n\nCompilation cancelled by user")
         sys.exit(1)
@@ -147,6 +280,327 @@ def main():
             import traceback
             traceback.print_exc()
         sys.exit(1)
+    
+    finally:
+        if profiler:
+            profiler.close()
+        if tracer:
+            tracing.set_tracer(None)
+            tracer.close()
+
+
+def compile_with_daemon(args, input_path: Path) -> bool:
+    """Forward a single-file compile to the daemon; False if none is listening"""
+    options = dict(compile_options(args), validate_jobs=args.validate_jobs)
+    
+    try:
+        result = client.compile_file(str(input_path), args.output, options, args.socket)
+    except (OSError, ValueError) as e:
+        socket_path = args.socket or client.default_socket_path()
+        print(f"⚠️  No compile daemon at {socket_path} ({e}), compiling locally")
+        return False
+    
+    print(f"\nCompiling {input_path.name} (daemon)...\n")
+    
+    write_diagnostics(args, result.get('diagnostics', []))
+    if not result.get('ok'):
+        report = diagnostics.format_text(result.get('diagnostics', []), input_path.name).strip()
+        if report:
+            print(report)
+        print(f"\nCompilation failed: {result.get('error')}")
+        sys.exit(1)
+    
+    for output in result['outputs']:
+        print(f"OK - Generated {Path(args.output) / output}")
+    
+    print(f"\nCompilation successful! ({result['seconds'] * 1000:.1f} ms)\n")
+    return True
+
+
+def build_main(argv):
+    """Entry point for `htmlxify build`: compile a directory in parallel"""
+    parser = argparse.ArgumentParser(
+        prog='htmlxify build',
+        description='Compile every .htmlxify file under a directory',
+        epilog='Example: htmlxify build src/ dist/ --jobs 8'
+    )
+    
+    parser.add_argument(
+        'src',
+        help='Source directory (searched recursively)'
+    )
+    
+    parser.add_argument(
+        'output',
+        nargs='?',
+        default='dist',
+        help='Output directory; the source layout is kept (default: dist)'
+    )
+    
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Number of worker processes (default: CPU count)'
+    )
+    
+    parser.add_argument(
+        '--force',
+        action='store_true',
+        help='Recompile every page, even if unchanged since the last build'
+    )
+    
+    add_compile_options(parser)
+    add_diagnostics_options(parser)
+    
+    args = parser.parse_args(argv)
+    
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    
+    if not Path(args.src).is_dir():
+        print(f"ERROR: Directory '{args.src}' not found")
+        sys.exit(1)
+    
+    options = compile_options(args)
+    
+    print(f"\nBuilding {args.src} -> {args.output} ({args.jobs} jobs)...\n")
+    
+    def report(result):
+        if not result['ok']:
+            print(f"FAILED - {result['source']} ({result['seconds'] * 1000:.1f} ms)")
+            return
+        details = f"{result['seconds'] * 1000:.1f} ms, {result['js_bytes']:,} bytes JS"
+        if result['runtime_saved_bytes']:
+            details += f", saved {result['runtime_saved_bytes']:,} via shared runtime"
+        print(f"OK - {result['source']} ({details})")
+    
+    from htmlxify.build import build
+    
+    started = time.perf_counter()
+    try:
+        results = build(
+            args.src, args.output, options,
+            jobs=args.jobs, on_result=report, force=args.force
+        )
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\n\nBuild cancelled by user")
+        sys.exit(1)
+    elapsed = time.perf_counter() - started
+    
+    print_build_summary(results, elapsed)
+    write_diagnostics(args, [record for result in results for record in result['diagnostics']])
+    
+    if any(not result['ok'] for result in results):
+        sys.exit(1)
+
+
+def print_build_summary(results, elapsed: float):
+    """Print totals, the slowest pages and any failures"""
+    compiled = [result for result in results if not result.get('skipped')]
+    failures = [result for result in compiled if not result['ok']]
+    
+    print(
+        f"\nCompiled {len(compiled) - len(failures)} of {len(compiled)} changed pages "
+        f"in {elapsed:.2f}s ({len(results) - len(compiled)} unchanged)"
+    )
+    
+    if compiled:
+        total = sum(result['seconds'] for result in compiled)
+        print(f"   Page time: {total:.2f}s total, {total / len(compiled) * 1000:.1f} ms average")
+        js_bytes = sum(result['js_bytes'] for result in compiled)
+        saved = sum(result['runtime_saved_bytes'] for result in compiled)
+        print(f"   Page JS: {js_bytes:,} bytes total" + (
+            f" (saved {saved:,} bytes via shared runtime)" if saved else ""
+        ))
+        
+        print("\nSlowest pages:")
+        for result in sorted(compiled, key=lambda r: r['seconds'], reverse=True)[:10]:
+            print(f"   {result['seconds'] * 1000:8.1f} ms  {result['js_bytes']:>9,} bytes JS  {result['source']}")
+    
+    if failures:
+        print(f"\n{len(failures)} page(s) failed:")
+        for result in failures:
+            print(f"   {result['source']}: {result['error']}")
+            report = diagnostics.format_text(result['diagnostics'], result['source'])
+            for line in report.strip().splitlines():
+                print(f"      {line}")
+        print()
+    else:
+        print("\nBuild successful!\n")
+
+
+def watch_main(argv):
+    """Entry point for `htmlxify watch`: rebuild pages as they change"""
+    parser = argparse.ArgumentParser(
+        prog='htmlxify watch',
+        description='Recompile .htmlxify files under a directory whenever they change',
+        epilog='Example: htmlxify watch src/ dist/'
+    )
+    
+    parser.add_argument(
+        'src',
+        help='Source directory (searched recursively)'
+    )
+    
+    parser.add_argument(
+        'output',
+        nargs='?',
+        default='dist',
+        help='Output directory; the source layout is kept (default: dist)'
+    )
+    
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=0.5,
+        help='Seconds between polls for changes (default: 0.5)'
+    )
+    
+    parser.add_argument(
+        '--debounce',
+        type=float,
+        default=0.1,
+        help='Seconds a burst of saves must settle before rebuilding (default: 0.1)'
+    )
+    
+    parser.add_argument(
+        '--polling',
+        action='store_true',
+        help='Always poll, even if the watchdog package is installed'
+    )
+    
+    add_compile_options(parser)
+    
+    args = parser.parse_args(argv)
+    
+    if not Path(args.src).is_dir():
+        print(f"ERROR: Directory '{args.src}' not found")
+        sys.exit(1)
+    
+    options = compile_options(args)
+    
+    def report(result):
+        timing = f"{result['seconds'] * 1000:.1f} ms"
+        if 'latency' in result:
+            timing += f", {result['latency'] * 1000:.0f} ms after save"
+        
+        if result['ok']:
+            print(f"OK - {result['source']} ({timing})")
+            return
+        
+        print(f"FAILED - {result['source']} ({timing}): {result['error']}")
+        report = diagnostics.format_text(result['diagnostics'], result['source'])
+        for line in report.strip().splitlines():
+            print(f"   {line}")
+    
+    from htmlxify.watch import Watcher
+    
+    watcher = Watcher(
+        args.src, args.output, options,
+        interval=args.interval,
+        debounce=args.debounce,
+        use_watchdog=not args.polling,
+        on_result=report
+    )
+    
+    print(f"\nWatching {args.src} -> {args.output} ({watcher.mode})...")
+    print("Press Ctrl+C to stop.\n")
+    
+    try:
+        watcher.run()
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        print("\nStopped watching\n")
+
+
+def daemon_main(argv):
+    """Entry point for `htmlxify daemon`: serve compiles over a Unix socket"""
+    parser = argparse.ArgumentParser(
+        prog='htmlxify daemon',
+        description='Keep a warm compiler running for `htmlxify --daemon` clients',
+        epilog='Example: htmlxify daemon --idle-timeout 1800 &'
+    )
+    
+    parser.add_argument(
+        '--socket',
+        help='Socket path (default: $HTMLXIFY_SOCKET or a per-user socket)'
+    )
+    
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Number of worker processes (default: CPU count)'
+    )
+    
+    parser.add_argument(
+        '--idle-timeout',
+        type=float,
+        default=600,
+        help='Exit after this many seconds without requests (default: 600)'
+    )
+    
+    parser.add_argument(
+        '--status',
+        action='store_true',
+        help='Report whether a daemon is running, then exit'
+    )
+    
+    parser.add_argument(
+        '--stop',
+        action='store_true',
+        help='Stop a running daemon, then exit'
+    )
+    
+    args = parser.parse_args(argv)
+    socket_path = args.socket or client.default_socket_path()
+    
+    if args.status or args.stop:
+        try:
+            response = client.send({'command': 'shutdown' if args.stop else 'ping'}, socket_path)
+        except OSError:
+            print(f"No daemon running at {socket_path}")
+            sys.exit(1)
+        
+        if args.stop:
+            print(f"OK - Stopped daemon at {socket_path}")
+        else:
+            print(
+                f"Daemon running at {socket_path} (pid {response['pid']}, "
+                f"{response['jobs']} jobs, {response['requests']} requests, "
+                f"up {response['uptime']:.0f}s)"
+            )
+        return
+    
+    if args.jobs < 1:
+        parser.error('--jobs must be at least 1')
+    
+    from htmlxify.daemon import CompileDaemon
+    
+    def log(request, response):
+        name = Path(str(request.get('input', ''))).name
+        target = f"{request.get('command', '?')} {name}".strip()
+        status = 'OK' if response.get('ok') else f"FAILED: {response.get('error')}"
+        timing = f" ({response['seconds'] * 1000:.1f} ms)" if 'seconds' in response else ''
+        print(f"[{time.strftime('%H:%M:%S')}] {target} {status}{timing}", flush=True)
+    
+    daemon = CompileDaemon(socket_path, jobs=args.jobs, idle_timeout=args.idle_timeout, on_request=log)
+    
+    print(f"\nStarting compile daemon on {socket_path} ({args.jobs} jobs)...", flush=True)
+    try:
+        daemon.serve_forever()
+    except RuntimeError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+    print("Daemon stopped\n")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,59 @@
+"""
+Client - Talks to a running compile daemon (see daemon.py)
+
+Kept free of compiler imports, so forwarding a compile to the daemon costs
+little more than interpreter start-up.
+
+Protocol: one JSON object per line in each direction over a Unix socket.
+    {"command": "compile", "input": "/abs/page.htmlxify", "output": "/abs/dist",
+     "options": {"minify": true}}
+    {"command": "ping"}
+    {"command": "shutdown"}
+Every response has "ok"; failed requests also carry "error".
+"""
+
+import json
+import os
+import socket
+import tempfile
+from typing import Dict, Any, Optional
+
+
+def default_socket_path() -> str:
+    """$HTMLXIFY_SOCKET, else a per-user socket in the runtime/temp directory"""
+    if os.environ.get('HTMLXIFY_SOCKET'):
+        return os.environ['HTMLXIFY_SOCKET']
+    base = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(base, f'htmlxify-{os.getuid()}.sock')
+
+
+def send(request: Dict[str, Any], socket_path: Optional[str] = None, timeout: float = 60.0) -> Dict[str, Any]:
+    """
+    Send one request and return the response. Raises OSError (for example
+    FileNotFoundError or ConnectionRefusedError) when no daemon is listening.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path or default_socket_path())
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        
+        with sock.makefile('rb') as reader:
+            line = reader.readline()
+    if not line:
+        raise ConnectionError("Daemon closed the connection without a response")
+    return json.loads(line)
+
+
+def compile_file(
+    input_path: str,
+    output_dir: str,
+    options: Optional[Dict[str, Any]] = None,
+    socket_path: Optional[str] = None
+) -> Dict[str, Any]:
+    """Ask the daemon to compile one file; paths are made absolute here"""
+    return send({
+        'command': 'compile',
+        'input': os.path.abspath(input_path),
+        'output': os.path.abspath(output_dir),
+        'options': options or {},
+    }, socket_path)
@@ -0,0 +1,233 @@
+"""
+Compiler - In-memory compile API
+    
+    import htmlxify
+    
+    result = htmlxify.compile(source, 'index.htmlxify', {'minify': True})
+    if result.ok:
+        html, css, js = result.html, result.css, result.js
+    for issue in result.diagnostics:
+        print(issue.severity, issue.line, issue.column, issue.rule, issue.message)
+
+Runs the whole pipeline (parse, indentation, validation, HTML/CSS/JS
+generation) on a string and returns every artifact. It does no file I/O,
+printing or sys.exit, so it can be called in tight loops and from thread
+pools; the CLI, `htmlxify build` and the daemon all go through it. See
+aio.py for the asyncio version.
+"""
+
+import contextlib
+import threading
+from typing import Dict, Any, List, Optional
+
+from htmlxify.parser.ast_builder import ASTBuilder
+from htmlxify.parser.indent_processor import IndentationProcessor
+from htmlxify.validator.semantic import SemanticValidator
+from htmlxify.diagnostics import ValidationIssue, format_text, parse_error, to_records
+from htmlxify.generators.html_gen import HTMLGenerator
+from htmlxify.generators.css_gen import CSSGenerator
+from htmlxify.generators.js_gen import JSGenerator
+from htmlxify.metrics import CompileMetrics
+from htmlxify.profiler import Profiler, count_nodes
+from htmlxify import tracing
+
+
+# Compile options and their defaults
+DEFAULT_OPTIONS = {
+    'shared_runtime': False,  # Page JS registers with a separate runtime file
+    'batch_calls': False,     # Page-load API calls share one /_batch request
+    'minify': False,          # Production JS (see JSGenerator)
+    'runtime_src': None,      # URL of the shared runtime; default: its filename
+    'validate_jobs': 1,       # Processes validating large documents (see SemanticValidator)
+    'keyframes': None,        # Custom @keyframes for animate: {name: {offset: {property: value}}}
+}
+
+
+class CompileCancelled(Exception):
+    """Raised by compile() when its cancelled event is set mid-compile"""
+
+
+class CompileResult:
+    """
+    Everything one compile produced.
+    
+    html, css, js and source_map are None when compilation failed.
+    With shared_runtime, runtime holds the runtime JS to publish as
+    runtime_filename.
+    With minify, js_unminified_bytes is the size of the page JS before
+    it was minified.
+    diagnostics lists parse errors and validation errors/warnings as
+    ValidationIssue objects (severity, message, line, column, rule);
+    diagnostic_records() gives them as JSON-ready dicts (see
+    diagnostics.py).
+    metrics counts what the compile did (see metrics.py).
+    """
+    
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.html: Optional[str] = None
+        self.css: Optional[str] = None
+        self.js: Optional[str] = None
+        self.source_map: Optional[str] = None
+        self.runtime: Optional[str] = None
+        self.runtime_filename: Optional[str] = None
+        self.js_unminified_bytes: Optional[int] = None
+        self.diagnostics: List[ValidationIssue] = []
+        self.metrics = CompileMetrics()
+    
+    @property
+    def errors(self) -> List[ValidationIssue]:
+        return [issue for issue in self.diagnostics if issue.severity == 'error']
+    
+    @property
+    def warnings(self) -> List[ValidationIssue]:
+        return [issue for issue in self.diagnostics if issue.severity == 'warning']
+    
+    @property
+    def ok(self) -> bool:
+        """True when the page compiled (warnings allowed)"""
+        return self.html is not None and not self.errors
+    
+    def diagnostic_records(self) -> List[Dict[str, Any]]:
+        """Diagnostics as dicts: file, line, column, rule, severity, message"""
+        return to_records(self.diagnostics)
+    
+    def format_diagnostics(self) -> str:
+        """Diagnostics as text, in the same layout the validator prints"""
+        return format_text(self.diagnostics, self.filename)
+    
+    def __repr__(self):
+        status = 'ok' if self.ok else f'{len(self.errors)} errors'
+        return f"<CompileResult {self.filename}: {status}, {len(self.warnings)} warnings>"
+
+
+def compile(
+    source: str,
+    filename: str = '<string>',
+    options: Optional[Dict[str, Any]] = None,
+    cancelled: Optional[threading.Event] = None,
+    profiler: Optional[Profiler] = None
+) -> CompileResult:
+    """
+    Compile htmlxify source to HTML, CSS and JS.
+    
+    filename is used in diagnostics and the source map. options is a dict
+    with any of the keys in DEFAULT_OPTIONS; unknown keys and invalid
+    keyframes raise ValueError.
+    Parse and validation errors don't raise: check result.ok and
+    result.diagnostics.
+    
+    cancelled lets another thread abandon the compile: it is checked
+    between stages, and CompileCancelled is raised once it is set.
+    profiler, if given, records the cost of each stage (see profiler.py).
+    """
+    def checkpoint():
+        if cancelled is not None and cancelled.is_set():
+            raise CompileCancelled(filename)
+    
+    def stage(name):
+        return profiler.stage(name) if profiler is not None else contextlib.nullcontext()
+    
+    unknown = set(options or {}) - set(DEFAULT_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown compile option(s): {', '.join(sorted(unknown))}")
+    options = dict(DEFAULT_OPTIONS, **(options or {}))
+    if options['keyframes'] is not None:
+        CSSGenerator.check_keyframes(options['keyframes'])
+    
+    result = CompileResult(filename)
+    if profiler is not None:
+        profiler.metrics = result.metrics
+    with tracing.span('htmlxify.compile', filename=filename) as span:
+        _run_pipeline(source, filename, options, result, checkpoint, stage, profiler)
+        if span.recording:
+            span.set_attributes({
+                'ok': result.ok,
+                'errors': len(result.errors),
+                'warnings': len(result.warnings),
+            })
+    return result
+
+
+def _run_pipeline(source, filename, options, result, checkpoint, stage, profiler):
+    """The compile stages; fills in result, returning early on errors"""
+    metrics = result.metrics
+    
+    # Step 1: Parse (loading the grammar is a one-off, measured on its own)
+    with stage('load'):
+        builder = ASTBuilder(source, filename)
+    if builder.parser_cache_hit:
+        metrics.parser_cache_hits += 1
+    else:
+        metrics.parser_cache_misses += 1
+    with stage('parse'):
+        try:
+            ast = builder.parse()
+        except Exception as e:
+            result.diagnostics.append(parse_error(e, filename))
+            return
+    if profiler is not None:
+        profiler.count('parse', nodes=count_nodes(ast))
+    
+    # Step 2: Process indentation
+    checkpoint()
+    with stage('indent'):
+        ast = IndentationProcessor().process(ast)
+    
+    # Step 3: Validate
+    checkpoint()
+    with stage('validate'):
+        validator = SemanticValidator(ast, filename, profile_rules=profiler is not None)
+        valid = validator.validate(jobs=options['validate_jobs'])
+    result.diagnostics.extend(validator.errors + validator.warnings)
+    metrics.add_visits(validator)
+    if profiler is not None:
+        profiler.rules = validator.rule_costs
+        nodes = count_nodes(ast)
+        profiler.count('indent', nodes=nodes)
+        profiler.count('validate', nodes=nodes)
+    if not valid:
+        return
+    
+    # Steps 4-6: Generate
+    checkpoint()
+    js_gen = JSGenerator(
+        ast,
+        shared_runtime=options['shared_runtime'],
+        batch_calls=options['batch_calls'],
+        minify=options['minify']
+    )
+    
+    with stage('html'):
+        runtime_src = None
+        if options['shared_runtime']:
+            result.runtime_filename = js_gen.runtime_filename()
+            runtime_src = options['runtime_src'] or result.runtime_filename
+        html_gen = HTMLGenerator(ast, filename, runtime_src=runtime_src)
+        html, source_map = html_gen.generate()
+    metrics.add_visits(html_gen)
+    metrics.escape_calls += html_gen.escape_calls
+    
+    checkpoint()
+    with stage('css'):
+        css_gen = CSSGenerator(ast, keyframes=options['keyframes'])
+        css = css_gen.generate()
+    metrics.add_visits(css_gen)
+    metrics.css_rules_emitted += len(css_gen.styles) + len(css_gen.keyframes)
+    metrics.css_rules_deduped += css_gen.keyframes_deduped
+    
+    checkpoint()
+    with stage('js'):
+        js = js_gen.generate()
+        if options['shared_runtime']:
+            result.runtime = js_gen.generate_runtime()
+    metrics.add_visits(js_gen)
+    metrics.js_handlers += len(js_gen.tables.get('endpoints', {}))
+    metrics.js_data_bindings += len(js_gen.tables.get('bindings', []))
+    
+    result.html, result.source_map, result.css, result.js = html, source_map, css, js
+    result.js_unminified_bytes = js_gen.unminified_bytes
+    if profiler is not None:
+        profiler.count('html', bytes=len(html.encode('utf-8')) + len(source_map.encode('utf-8')))
+        profiler.count('css', bytes=len(css.encode('utf-8')))
+        profiler.count('js', bytes=len(js.encode('utf-8')) + len((result.runtime or '').encode('utf-8')))
@@ -0,0 +1,258 @@
+"""
+Daemon - Persistent compile server on a Unix socket
+
+Started with `htmlxify daemon`. Importing Lark and tinycss2 and loading the
+grammar costs more than compiling a typical page, so one long-running
+process keeps a pool of warm workers and compiles on request; the CLI
+forwards to it with `--daemon` (see client.py for the protocol).
+
+Each connection is served on its own thread and compiles run in worker
+processes, so concurrent requests compile in parallel and a page that
+crashes a worker only fails its own request. The daemon exits after
+idle_timeout seconds without requests.
+"""
+
+import json
+import multiprocessing
+import os
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Any, Callable, Optional
+
+from htmlxify.build import compile_file, warm_parser, write_runtime
+from htmlxify.client import default_socket_path
+
+
+OPTION_KEYS = ('shared_runtime', 'batch_calls', 'minify')
+MAX_REQUEST_BYTES = 1024 * 1024
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Serves newline-delimited JSON requests on one connection"""
+    
+    def handle(self):
+        while True:
+            line = self.rfile.readline(MAX_REQUEST_BYTES + 1)
+            if not line:
+                return
+            
+            if len(line) > MAX_REQUEST_BYTES:
+                response = {'ok': False, 'error': 'Request too large'}
+            else:
+                response = self.server.compile_daemon.handle_line(line)
+            
+            try:
+                self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            except OSError:  # Client went away
+                return
+            
+            if len(line) > MAX_REQUEST_BYTES:
+                return
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class CompileDaemon:
+    """
+    Compile server. serve_forever() blocks until a shutdown request, the
+    idle timeout, or stop(). on_request, if given, is called with each
+    request and its response (for logging).
+    """
+    
+    def __init__(
+        self,
+        socket_path: Optional[str] = None,
+        jobs: Optional[int] = None,
+        idle_timeout: float = 600.0,
+        on_request: Optional[Callable[[Dict[str, Any], Dict[str, Any]], None]] = None
+    ):
+        self.socket_path = socket_path or default_socket_path()
+        self.jobs = jobs or os.cpu_count() or 1
+        self.idle_timeout = idle_timeout
+        self.on_request = on_request
+        self.server = None
+        self.pool = None
+        self.started = None
+        self.requests = 0
+        self._active = 0
+        self._pending = set()  # Futures of compiles not yet answered
+        self._last_request = time.monotonic()
+        self._lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        self._stopped = threading.Event()
+    
+    def serve_forever(self):
+        """Bind the socket, warm the workers and serve until stopped"""
+        self._claim_socket()
+        self.pool = self._start_pool()
+        
+        self.server = _Server(self.socket_path, _Handler)
+        self.server.compile_daemon = self
+        os.chmod(self.socket_path, 0o600)
+        self.started = time.time()
+        
+        idle = threading.Thread(target=self._watch_idle, daemon=True)
+        idle.start()
+        try:
+            self.server.serve_forever()
+        finally:
+            self._stopped.set()
+            self.server.server_close()
+            # By hand: shutdown(cancel_futures=True) needs Python 3.9
+            with self._lock:
+                pending = list(self._pending)
+            for future in pending:
+                future.cancel()
+            self.pool.shutdown()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+    
+    def stop(self):
+        """Stop serving; safe to call from any thread"""
+        if self.server and not self._stopped.is_set():
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+    
+    def handle_line(self, line: bytes) -> Dict[str, Any]:
+        """Decode, dispatch and answer one request; never raises"""
+        with self._lock:
+            self._active += 1
+            self.requests += 1
+        
+        request = {}
+        try:
+            decoded = json.loads(line)
+            if not isinstance(decoded, dict):
+                raise ValueError("Request must be a JSON object")
+            request = decoded
+            response = self.handle_request(request)
+        except ValueError as e:
+            response = {'ok': False, 'error': f"Bad request: {e}"}
+        except Exception as e:
+            response = {'ok': False, 'error': f"Internal error: {e}"}
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._last_request = time.monotonic()
+        
+        if self.on_request:
+            try:
+                self.on_request(request, response)
+            except Exception:  # Logging must not cost the client its response
+                pass
+        return response
+    
+    def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Dispatch a decoded request"""
+        command = request.get('command')
+        
+        if command == 'ping':
+            return {
+                'ok': True,
+                'pid': os.getpid(),
+                'jobs': self.jobs,
+                'requests': self.requests,
+                'uptime': time.time() - self.started,
+            }
+        
+        if command == 'shutdown':
+            self.stop()
+            return {'ok': True}
+        
+        if command == 'compile':
+            return self._compile(request)
+        
+        raise ValueError(f"Unknown command {command!r}")
+    
+    def _compile(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Compile one file in a worker process"""
+        input_path, output_dir = request.get('input'), request.get('output')
+        for name, value in (('input', input_path), ('output', output_dir)):
+            if not isinstance(value, str) or not os.path.isabs(value):
+                raise ValueError(f"'{name}' must be an absolute path")
+        
+        options = request.get('options') or {}
+        if not isinstance(options, dict):
+            raise ValueError("'options' must be an object")
+        keyframes = options.get('keyframes')
+        validate_jobs = options.get('validate_jobs', 1)
+        if not isinstance(validate_jobs, int) or isinstance(validate_jobs, bool) or validate_jobs < 1:
+            raise ValueError("'validate_jobs' must be a positive integer")
+        options = {key: bool(options[key]) for key in OPTION_KEYS if key in options}
+        options['validate_jobs'] = validate_jobs
+        if keyframes is not None:
+            options['keyframes'] = keyframes  # Checked by compile(); a bad table fails the page
+        
+        source = Path(input_path)
+        if not source.is_file():
+            return {'ok': False, 'error': f"File '{input_path}' not found"}
+        
+        out = Path(output_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        if options.get('shared_runtime'):
+            write_runtime(out, options)
+        
+        pool = self.pool
+        future = pool.submit(compile_file, str(source.parent), source.name, str(out), options)
+        with self._lock:
+            self._pending.add(future)
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            # A worker died mid-compile; replace the pool, fail this request only
+            with self._pool_lock:
+                if self.pool is pool:
+                    self.pool = self._start_pool()
+                    pool.shutdown(wait=False)
+            return {'ok': False, 'source': source.name, 'error': "Compiler worker crashed"}
+        except CancelledError:
+            return {'ok': False, 'source': source.name, 'error': "Compile daemon is shutting down"}
+        finally:
+            with self._lock:
+                self._pending.discard(future)
+    
+    def _start_pool(self) -> ProcessPoolExecutor:
+        """
+        Worker pool with the grammar already loaded. Workers come from a
+        fork server, so replacing them while serving never forks this
+        multi-threaded process.
+        """
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['htmlxify.build'])
+        pool = ProcessPoolExecutor(self.jobs, mp_context=context, initializer=warm_parser)
+        
+        # Start every worker now rather than on the first requests
+        for future in [pool.submit(time.sleep, 0.05) for _ in range(self.jobs)]:
+            future.result()
+        return pool
+    
+    def _claim_socket(self):
+        """Remove a stale socket file, but refuse to replace a live daemon"""
+        if not os.path.exists(self.socket_path):
+            return
+        
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.unlink(self.socket_path)
+        else:
+            raise RuntimeError(f"A daemon is already listening on {self.socket_path}")
+        finally:
+            probe.close()
+    
+    def _watch_idle(self):
+        """Shut down once no request has arrived for idle_timeout seconds"""
+        interval = min(1.0, self.idle_timeout / 4)
+        while not self._stopped.wait(interval):
+            with self._lock:
+                idle = self._active == 0 and time.monotonic() - self._last_request >= self.idle_timeout
+            if idle:
+                self.stop()
+                return
@@ -0,0 +1,173 @@
+"""
+Diagnostics - Parse errors and validation issues as records
+    
+    from htmlxify import diagnostics
+    
+    result = htmlxify.compile(source, 'index.htmlxify')
+    for record in diagnostics.to_records(result.diagnostics):
+        print(record['file'], record['line'], record['column'], record['rule'], record['message'])
+    Path('report.sarif').write_text(diagnostics.to_sarif_json(result.diagnostics))
+
+Every diagnostic is a ValidationIssue. Its record (to_dict) has the file,
+line and column (1-based, None when unknown), rule id, severity and
+message. Records are plain JSON values: `htmlxify build` and the daemon
+return them per page, so tools can aggregate them without parsing output.
+
+Formatting is lazy. A message can be given as a function, which is only
+called when the message is read (parse errors describe the expected
+tokens this way), and text is only laid out by format_text, when printed.
+This module imports nothing else from htmlxify, so clients of the daemon
+can format its records without loading the compiler.
+"""
+
+import json
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+
+SARIF_SCHEMA = 'https://json.schemastore.org/sarif-2.1.0.json'
+SARIF_LEVELS = {'error': 'error', 'warning': 'warning'}  # Anything else is a note
+
+# Rule id of syntax errors, which no validation rule raises
+PARSE_ERROR_RULE = 'parse-error'
+
+
+class ValidationIssue:
+    """Represents an error or warning"""
+    
+    def __init__(
+        self,
+        node: Dict[str, Any],
+        message: Union[str, Callable[[], str]],
+        severity: str = 'error',
+        line: Optional[int] = None,
+        rule: Optional[str] = None,
+        column: Optional[int] = None,
+        filename: Optional[str] = None
+    ):
+        self.node = node
+        self._message = message  # Or a function returning it, called on first read
+        self.severity = severity  # 'error' or 'warning'
+        meta = node.get('meta') or {}
+        self.line = line or meta.get('line', 0)
+        self.column = column or meta.get('column', 0)
+        self.rule = rule  # Id of the rule that raised it; set by the validator
+        self.filename = filename  # Set by the validator or compiler
+    
+    @property
+    def message(self) -> str:
+        if callable(self._message):
+            self._message = self._message()
+        return self._message
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """The diagnostic as a JSON-ready record"""
+        return {
+            'file': self.filename,
+            'line': self.line or None,
+            'column': self.column or None,
+            'rule': self.rule,
+            'severity': self.severity,
+            'message': self.message,
+        }
+    
+    def __getstate__(self):
+        # Pickled to and from worker processes: send the text, not the function
+        state = dict(vars(self))
+        state['_message'] = self.message
+        return state
+    
+    def __repr__(self):
+        return f"<{self.severity.upper()}: {self.message}>"
+
+
+def parse_error(error: Exception, filename: Optional[str] = None) -> ValidationIssue:
+    """
+    A parser exception as an error. Lark's description of the expected
+    tokens is only built if the message is read.
+    """
+    line = getattr(error, 'line', None)
+    column = getattr(error, 'column', None)
+    return ValidationIssue(
+        {},
+        lambda: f"Parse error: {error}",
+        severity='error',
+        line=line if isinstance(line, int) and line > 0 else None,
+        rule=PARSE_ERROR_RULE,
+        column=column if isinstance(column, int) and column > 0 else None,
+        filename=filename
+    )
+
+
+Diagnostic = Union[ValidationIssue, Dict[str, Any]]
+
+
+def to_records(diagnostics: Iterable[Diagnostic]) -> List[Dict[str, Any]]:
+    """Records of issues; records (e.g. from a build) pass through"""
+    return [item if isinstance(item, dict) else item.to_dict() for item in diagnostics]
+
+
+def to_json(diagnostics: Iterable[Diagnostic], indent: Optional[int] = None) -> str:
+    """The records as a JSON array"""
+    return json.dumps(to_records(diagnostics), indent=indent, ensure_ascii=False)
+
+
+def to_sarif(diagnostics: Iterable[Diagnostic], tool_version: Optional[str] = None) -> Dict[str, Any]:
+    """The records as a SARIF 2.1.0 log, one run, for code-scanning tools"""
+    results = []
+    rule_ids: List[str] = []
+    for record in to_records(diagnostics):
+        rule = record['rule'] or 'htmlxify'
+        if rule not in rule_ids:
+            rule_ids.append(rule)
+        result = {
+            'ruleId': rule,
+            'level': SARIF_LEVELS.get(record['severity'], 'note'),
+            'message': {'text': record['message']},
+        }
+        location: Dict[str, Any] = {}
+        if record['file']:
+            location['artifactLocation'] = {'uri': record['file']}
+        if record['line']:
+            location['region'] = {'startLine': record['line']}
+            if record['column']:
+                location['region']['startColumn'] = record['column']
+        if location:
+            result['locations'] = [{'physicalLocation': location}]
+        results.append(result)
+    
+    driver: Dict[str, Any] = {'name': 'htmlxify', 'rules': [{'id': rule} for rule in rule_ids]}
+    if tool_version:
+        driver['version'] = tool_version
+    return {
+        '$schema': SARIF_SCHEMA,
+        'version': '2.1.0',
+        'runs': [{'tool': {'driver': driver}, 'results': results}],
+    }
+
+
+def to_sarif_json(diagnostics: Iterable[Diagnostic], tool_version: Optional[str] = None) -> str:
+    return json.dumps(to_sarif(diagnostics, tool_version), indent=2, ensure_ascii=False)
+
+
+def format_text(diagnostics: Iterable[Diagnostic], filename: Optional[str] = None) -> str:
+    """Records as the text the compiler prints: errors, then warnings"""
+    records = to_records(diagnostics)
+    lines = []
+    for category, severity in (('ERRORS', 'error'), ('WARNINGS', 'warning')):
+        issues = [
+            record for record in records
+            if (record['severity'] == 'error') == (severity == 'error')
+        ]
+        if not issues:
+            continue
+        symbol = '❌' if category == 'ERRORS' else '⚠️ '
+        lines += [f"{symbol} {category} in {filename or issues[0]['file']}:", '']
+        for i, record in enumerate(issues, 1):
+            lines.append(f"{i}. {record['message']}")
+            if record['line']:
+                position = f"   Line: {record['line']}"
+                if record['column']:
+                    position += f", column {record['column']}"
+                lines.append(position)
+            lines.append('')
+    return '\n'.join(lines)
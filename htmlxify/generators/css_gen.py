@@ -4,7 +4,9 @@ CSS Generator - Creates GPU-optimized CSS with default styles
 
 import tinycss2
 import cssbeautifier
-from typing import Dict, Any, List, Set
+from typing import Dict, Any, List, Optional, Set
+
+from htmlxify import tracing
 
 
 class CSSGenerator:
@@ -407,22 +409,6 @@ footer {
   color: #aaa;
 }
 
-/* Animations */
-@keyframes fade {
-  0% { opacity: 0; transform: translateY(10px); }
-  100% { opacity: 1; transform: translateY(0); }
-}
-
-@keyframes slide {
-  0% { transform: translateX(-100%); }
-  100% { transform: translateX(0); }
-}
-
-@keyframes bounce {
-  0%, 100% { transform: translateY(0); }
-  50% { transform: translateY(-10px); }
-}
-
 /* Responsive */
 @media (max-width: 768px) {
   h1 { font-size: 1.75rem; }
@@ -444,31 +430,102 @@ footer {
 }
 """
     
-    def __init__(self, ast: Dict[str, Any]):
+    # Built-in keyframes. Every frame only touches compositor-friendly
+    # properties, so the browser can run them without layout or paint.
+    KEYFRAMES_LIBRARY: Dict[str, Dict[str, Dict[str, str]]] = {
+        'fade': {
+            '0%': {'opacity': '0', 'transform': 'translateY(10px)'},
+            '100%': {'opacity': '1', 'transform': 'translateY(0)'},
+        },
+        'fade-out': {
+            '0%': {'opacity': '1'},
+            '100%': {'opacity': '0'},
+        },
+        'slide': {
+            '0%': {'transform': 'translateX(-100%)'},
+            '100%': {'transform': 'translateX(0)'},
+        },
+        'slide-left': {
+            '0%': {'transform': 'translateX(100%)'},
+            '100%': {'transform': 'translateX(0)'},
+        },
+        'slide-up': {
+            '0%': {'transform': 'translateY(100%)'},
+            '100%': {'transform': 'translateY(0)'},
+        },
+        'slide-down': {
+            '0%': {'transform': 'translateY(-100%)'},
+            '100%': {'transform': 'translateY(0)'},
+        },
+        'scale': {
+            '0%': {'opacity': '0', 'transform': 'scale(0.8)'},
+            '100%': {'opacity': '1', 'transform': 'scale(1)'},
+        },
+        'scale-out': {
+            '0%': {'opacity': '1', 'transform': 'scale(1)'},
+            '100%': {'opacity': '0', 'transform': 'scale(0.8)'},
+        },
+        'bounce': {
+            '0%, 100%': {'transform': 'translateY(0)'},
+            '50%': {'transform': 'translateY(-10px)'},
+        },
+        'pulse': {
+            '0%, 100%': {'transform': 'scale(1)'},
+            '50%': {'transform': 'scale(1.05)'},
+        },
+        'spin': {
+            '0%': {'transform': 'rotate(0deg)'},
+            '100%': {'transform': 'rotate(360deg)'},
+        },
+    }
+    
+    # Properties that can be animated on the compositor thread
+    COMPOSITOR_PROPERTIES = frozenset({'transform', 'opacity'})
+    
+    def __init__(
+        self,
+        ast: Dict[str, Any],
+        keyframes: Optional[Dict[str, Dict[str, Dict[str, str]]]] = None
+    ):
         self.ast = ast
         self.used_classes: Set[str] = set()
         self.styles: List[str] = []
         self.keyframes: List[str] = []
+        self._emitted_keyframes: Set[str] = set()
+        self.elements_visited = 0
+        self.text_nodes_visited = 0
+        self.keyframes_deduped = 0
+        
+        # Custom keyframes: {name: {offset: {property: value}}}
+        self.check_keyframes(keyframes or {})
+        self.custom_keyframes = dict(keyframes or {})
     
     def generate(self) -> str:
         """Generate CSS from AST"""
-        # Start with default styles
-        css = self.DEFAULT_STYLES
-        
-        # Extract any custom styles
-        self._extract_styles(self.ast)
-        
-        # Add extracted custom styles
-        if self.styles:
-            css += '\n\n/* Custom Styles */\n'
-            css += '\n\n'.join(self.styles)
-        
-        # Add keyframes
-        if self.keyframes:
-            css += '\n\n/* Custom Keyframes */\n'
-            css += '\n\n'.join(self.keyframes)
-        
-        return css
+        with tracing.span('htmlxify.css') as span:
+            # Start with default styles
+            css = self.DEFAULT_STYLES
+            
+            # Extract any custom styles
+            self._extract_styles(self.ast)
+            
+            # Add extracted custom styles
+            if self.styles:
+                css += '\n\n/* Custom Styles */\n'
+                css += '\n\n'.join(self.styles)
+            
+            # Add keyframes
+            if self.keyframes:
+                css += '\n\n/* Keyframes */\n'
+                css += '\n\n'.join(self.keyframes)
+            
+            if span.recording:
+                span.set_attributes({
+                    'bytes': len(css.encode('utf-8')),
+                    'rules': len(self.styles),
+                    'keyframes': len(self.keyframes),
+                })
+            return css
     
     def _extract_styles(self, node: Any):
         """Recursively extract styles from AST"""
@@ -476,7 +533,10 @@ footer {
             return
         
         if node.get('type') == 'Element':
+            self.elements_visited += 1
             self._process_element_styles(node)
+        elif node.get('type') == 'Text':
+            self.text_nodes_visited += 1
         
         # Recurse
         for child in node.get('children', []):
@@ -545,7 +605,56 @@ footer {
         duration = parts[1] if len(parts) > 1 else '1s'
         timing = parts[2] if len(parts) > 2 else 'ease'
         
-        return f"{name} {duration} {timing}", []
+        # Emit each referenced @keyframes block once per build
+        emitted = []
+        if name in self._emitted_keyframes:
+            self.keyframes_deduped += 1
+        else:
+            frames = self.custom_keyframes.get(name) or self.KEYFRAMES_LIBRARY.get(name)
+            if frames:
+                self._emitted_keyframes.add(name)
+                emitted.append(self._render_keyframes(name, frames))
+                self.keyframes.extend(emitted)
+        
+        return f"{name} {duration} {timing}", emitted
+    
+    @classmethod
+    def check_keyframes(cls, keyframes: Dict[str, Dict[str, Dict[str, str]]]):
+        """
+        Raise ValueError unless keyframes maps names to {offset: {property:
+        value}} and only animates compositor properties
+        """
+        if not isinstance(keyframes, dict) or not all(
+            isinstance(frames, dict) and all(isinstance(decls, dict) for decls in frames.values())
+            for frames in keyframes.values()
+        ):
+            raise ValueError("Custom keyframes must map names to {offset: {property: value}}")
+        for name, frames in keyframes.items():
+            cls._validate_keyframes(name, frames)
+    
+    @classmethod
+    def _validate_keyframes(cls, name: str, frames: Dict[str, Dict[str, str]]):
+        """Reject custom keyframes that animate layout or paint properties"""
+        bad_props = sorted({
+            prop for decls in frames.values() for prop in decls
+            if prop.strip().lower() not in cls.COMPOSITOR_PROPERTIES
+        })
+        if bad_props:
+            raise ValueError(
+                f"Keyframes '{name}' animate {', '.join(bad_props)}. "
+                f"Only {', '.join(sorted(cls.COMPOSITOR_PROPERTIES))} "
+                f"can be animated on the GPU."
+            )
+    
+    @staticmethod
+    def _render_keyframes(name: str, frames: Dict[str, Dict[str, str]]) -> str:
+        """Render a keyframes definition to a CSS @keyframes block"""
+        lines = [f"@keyframes {name} {{"]
+        for offset, decls in frames.items():
+            body = ' '.join(f"{prop}: {value};" for prop, value in decls.items())
+            lines.append(f"  {offset} {{ {body} }}")
+        lines.append("}")
+        return '\n'.join(lines)
 
 
 # Test
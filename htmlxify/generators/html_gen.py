@@ -4,9 +4,11 @@ Security: All text is HTML-escaped to prevent XSS
 """
 
 import html as html_escape_module
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 import json
 
+from htmlxify import tracing
+
 
 class HTMLGenerator:
     """
@@ -14,39 +16,60 @@ class HTMLGenerator:
     - Automatic HTML escaping
     - XSS prevention
     - Source map generation for debugging
+    
+    When runtime_src is given, a deferred <script> tag for the shared
+    htmlxify runtime is injected into <head> (or after the doctype).
     """
     
-    def __init__(self, ast: Dict[str, Any], filename: str):
+    def __init__(
+        self,
+        ast: Dict[str, Any],
+        filename: str,
+        runtime_src: Optional[str] = None
+    ):
         self.ast = ast
         self.filename = filename
+        self.runtime_src = runtime_src
         self.output: List[str] = []
         self.current_line = 0
+        self._runtime_injected = False
+        self.elements_visited = 0
+        self.text_nodes_visited = 0
+        self.escape_calls = 0
     
     def generate(self) -> Tuple[str, str]:
         """
         Generate HTML and source map.
         Returns: (html_string, source_map_json)
         """
-        # Start with doctype
-        self.output.append('<!DOCTYPE html>\n')
-        self.current_line += 1
-        
-        # Generate from AST
-        self._generate_node(self.ast)
-        
-        # Combine output
-        html_code = ''.join(self.output)
-        
-        # Simple source map (line mappings only)
-        source_map = json.dumps({
-            "version": 3,
-            "file": self.filename.replace('.htmlxify', '.html'),
-            "sources": [self.filename],
-            "names": [],
-            "mappings": ""
-        })
-        
-        return html_code, source_map
+        with tracing.span('htmlxify.html', filename=self.filename) as span:
+            # Start with doctype
+            self.output.append('<!DOCTYPE html>\n')
+            self.current_line += 1
+            
+            # Generate from AST
+            self._generate_node(self.ast)
+            
+            # No <head> in the document: load the runtime before any content
+            if self.runtime_src and not self._runtime_injected:
+                self.output.insert(1, self._runtime_script_tag() + '\n')
+                self.current_line += 1
+            
+            # Combine output
+            html_code = ''.join(self.output)
+            
+            # Simple source map (line mappings only)
+            source_map = json.dumps({
+                "version": 3,
+                "file": self.filename.replace('.htmlxify', '.html'),
+                "sources": [self.filename],
+                "names": [],
+                "mappings": ""
+            })
+            
+            if span.recording:
+                span.set_attribute('bytes', len(html_code.encode('utf-8')))
+            return html_code, source_map
     
     def _generate_node(self, node: Any, depth: int = 0):
         """Recursively generate HTML from node"""
@@ -61,11 +84,18 @@ class HTMLGenerator:
                 self._generate_node(child, depth)
         
         elif node_type == 'Element':
+            self.elements_visited += 1
             self._generate_element(node, depth)
         
         elif node_type == 'Text':
+            self.text_nodes_visited += 1
             self._generate_text(node)
     
+    def _escape(self, value: str) -> str:
+        """HTML-escape a text or attribute value (quotes included)"""
+        self.escape_calls += 1
+        return html_escape_module.escape(value, quote=True)
+    
     def _generate_element(self, node: Dict[str, Any], depth: int):
         """Generate HTML element"""
         indent = '  ' * depth
@@ -76,13 +106,13 @@ class HTMLGenerator:
         
         # ID attribute
         if node.get('id'):
-            safe_id = html_escape_module.escape(node['id'], quote=True)
+            safe_id = self._escape(node['id'])
             self.output.append(f' id="{safe_id}"')
         
         # Classes
         if node.get('classes'):
             classes = ' '.join(node['classes'])
-            safe_classes = html_escape_module.escape(classes, quote=True)
+            safe_classes = self._escape(classes)
             self.output.append(f' class="{safe_classes}"')
         
         # Other attributes
@@ -90,6 +120,13 @@ class HTMLGenerator:
         
         self.output.append('>')
         
+        # Shared runtime goes first in <head> so it is fetched early
+        if tag == 'head' and self.runtime_src and not self._runtime_injected:
+            self.output.append(f'\n{indent}  {self._runtime_script_tag()}')
+            self._runtime_injected = True
+            if not node.get('children'):
+                self.output.append(f'\n{indent}')
+        
         # Children
         has_children = node.get('children')
         if has_children:
@@ -105,6 +142,11 @@ class HTMLGenerator:
         self.output.append(f'</{tag}>\n')
         self.current_line += 1
     
+    def _runtime_script_tag(self) -> str:
+        """Deferred script tag for the shared runtime"""
+        safe_src = self._escape(self.runtime_src)
+        return f'<script src="{safe_src}" defer></script>'
+    
     def _generate_attributes(self, attrs: Dict[str, Any]):
         """Generate HTML attributes"""
         for key, value in attrs.items():
@@ -115,9 +157,18 @@ class HTMLGenerator:
                 else:
                     endpoint = str(value)
                 
-                safe_endpoint = html_escape_module.escape(endpoint, quote=True)
+                safe_endpoint = self._escape(endpoint)
                 self.output.append(f' data-api-call="{safe_endpoint}"')
             
+            elif key == '⚡-call-when':
+                # When to trigger the call: load (default), visible or idle
+                safe_when = self._escape(str(value))
+                self.output.append(f' data-api-when="{safe_when}"')
+            
+            elif key == '⚡-cache':
+                # Cache TTL is per endpoint and lives in the JS endpoint table
+                continue
+            
             elif key == '⚡-data':
                 # Dynamic data binding - mark for JS
                 if isinstance(value, dict):
@@ -125,13 +176,13 @@ class HTMLGenerator:
                 else:
                     data_key = str(value)
                 
-                safe_key = html_escape_module.escape(data_key, quote=True)
+                safe_key = self._escape(data_key)
                 self.output.append(f' data-dynamic="{safe_key}"')
             
             else:
                 # Regular attribute
-                safe_key = html_escape_module.escape(str(key), quote=True)
-                safe_value = html_escape_module.escape(str(value), quote=True)
+                safe_key = self._escape(str(key))
+                safe_value = self._escape(str(value))
                 self.output.append(f' {safe_key}="{safe_value}"')
     
     def _generate_text(self, node: Dict[str, Any]):
@@ -139,7 +190,7 @@ class HTMLGenerator:
         text = node.get('value', '')
         
         # SECURITY: Escape HTML entities to prevent XSS
-        safe_text = html_escape_module.escape(text)
+        safe_text = self._escape(text)
         
         self.output.append(safe_text)
 
@@ -2,7 +2,11 @@
 JS Generator - Secure JavaScript with XSS prevention
 """
 
-from typing import Dict, Any, List, Set
+import hashlib
+import json
+from typing import Dict, Any, Iterable, Optional, Set
+
+from htmlxify import tracing
 
 
 class JSGenerator:
@@ -11,32 +15,607 @@ class JSGenerator:
     - API call handlers
     - Dynamic data binding
     - Animation cleanup
+    
+    The static runtime (API URL resolution, handler dispatch, bindings and
+    animation utilities) is separate from the per-page tables. By default it
+    is inlined into the page script; with shared_runtime=True the page script
+    only registers its tables and the runtime is written once per build as
+    htmlxify-runtime.<hash>.js.
+    
+    With batch_calls=True, API calls made in the same tick are sent as one
+    request to the backend's /_batch endpoint (see example_backend.py).
+    
+    With minify=True (production mode), comments, console.log calls and
+    indentation are stripped, and an inlined runtime only contains the
+    sections the page uses.
     """
     
-    def __init__(self, ast: Dict[str, Any]):
+    RUNTIME_PREFIX = 'htmlxify-runtime'
+    
+    RUNTIME_HEADER = """// htmlxify runtime
+// Shared by every page compiled with htmlxify. Page scripts register their
+// tables by pushing onto window.htmlxifyPages, so the runtime and the page
+// scripts may load in any order.
+(function(window, document) {
+  'use strict';
+  
+  if (window.htmlxify) return;
+  
+  // Tables registered by page scripts
+  const apiHandlers = {};
+  const dataBindings = {};
+  
+  // Runtime sections hook into page registration and page load
+  const onRegister = [];
+  const onStart = [];
+  
+  const htmlxify = window.htmlxify = {
+    apiHandlers: apiHandlers,
+    dataBindings: dataBindings
+  };
+"""
+    
+    # Runtime sections, in output order. Production builds drop the ones the
+    # page does not use.
+    RUNTIME_SECTIONS = {
+        'api': """
+  // Backend API Configuration
+  // Users can set the API URL in 3 ways (no compiler changes needed):
+  //
+  // 1. In your HTML file, add a meta tag:
+  //    <meta name="api-url" content="https://api.yourdomain.com">
+  //
+  // 2. In your HTML file or script, set window variable:
+  //    <script>window.API_BASE_URL = 'https://api.yourdomain.com';</script>
+  //
+  // 3. Create a config.js file and include it before this script:
+  //    <script src="config.js"></script>
+  //    window.API_BASE_URL = 'https://api.yourdomain.com';
+  //
+  // Priority order (first one found is used):
+  //   1. window.API_BASE_URL (highest priority)
+  //   2. meta[name="api-url"] content attribute
+  //   3. /api (relative URL - same domain as frontend)
+  //   4. http://localhost:5000/api (local development default)
+  const API_BASE_URL = window.API_BASE_URL
+    || (function() {
+      const meta = document.querySelector('meta[name="api-url"]');
+      if (meta) return meta.getAttribute('content');
+      
+      // Use relative URL if not on localhost
+      if (window.location.hostname !== 'localhost' && window.location.hostname !== '127.0.0.1') {
+        return '/api';
+      }
+      
+      // Default to localhost for development
+      return 'http://localhost:5000/api';
+    })();
+  
+  console.log('API Configuration - API_BASE_URL:', API_BASE_URL);
+  htmlxify.apiBaseUrl = API_BASE_URL;
+  
+  async function postJson(url, body, headers) {
+    const response = await fetch(url, {
+      method: 'POST',
+      headers: Object.assign({
+        'Content-Type': 'application/json',
+      }, headers),
+      body: JSON.stringify(body)
+    });
+    
+    if (!response.ok && response.status !== 304) throw new Error(`HTTP ${response.status}`);
+    
+    return response;
+  }
+  
+  // Response cache and in-flight dedup, keyed by request path. Entries
+  // follow Cache-Control (max-age, no-cache, no-store) and are revalidated
+  // with If-None-Match when the server sent an ETag. Endpoints can also set
+  // a TTL in seconds with the ⚡-cache attribute.
+  const responseCache = new Map();
+  const inflight = new Map();
+  
+  async function requestDirect(path) {
+    const cached = responseCache.get(path);
+    const response = await postJson(
+      API_BASE_URL + '/' + path,
+      { timestamp: new Date().toISOString() },
+      cached && cached.etag ? { 'If-None-Match': cached.etag } : {}
+    );
+    
+    const result = {
+      cacheControl: response.headers.get('Cache-Control') || '',
+      etag: response.headers.get('ETag') || (cached && cached.etag)
+    };
+    result.data = response.status === 304 ? cached.data : await response.json();
+    return result;
+  }
+  
+  function cacheResponse(endpoint, path, result) {
+    const cacheControl = result.cacheControl.toLowerCase();
+    if (cacheControl.indexOf('no-store') !== -1) {
+      responseCache.delete(path);
+      return;
+    }
+    
+    const maxAge = /max-age=(\\d+)/.exec(cacheControl);
+    let ttl = (apiHandlers[endpoint] || {}).ttl || 0;
+    if (cacheControl.indexOf('no-cache') !== -1) ttl = 0;
+    else if (maxAge) ttl = Number(maxAge[1]);
+    
+    if (ttl > 0 || result.etag) {
+      responseCache.set(path, {
+        data: result.data,
+        etag: result.etag,
+        expires: Date.now() + ttl * 1000
+      });
+    }
+  }
+  
+  // Requests go out directly unless the batching section takes over
+  let sendRequest = requestDirect;
+  
+  function request(endpoint, path) {
+    const cached = responseCache.get(path);
+    if (cached && cached.expires > Date.now()) return Promise.resolve(cached.data);
+    
+    // Concurrent calls to the same endpoint share one request
+    if (inflight.has(path)) return inflight.get(path);
+    
+    const promise = sendRequest(path)
+      .then(result => {
+        cacheResponse(endpoint, path, result);
+        return result.data;
+      })
+      .finally(() => inflight.delete(path));
+    inflight.set(path, promise);
+    return promise;
+  }
+  
+  // Generic API handler, driven by the endpoint tables pages register
+  async function callEndpoint(endpoint, element) {
+    try {
+      const plan = element.getAttribute('data-plan');
+      const path = plan ? endpoint + '/' + plan : endpoint;
+      
+      const data = await request(endpoint, path);
+      console.log(endpoint + ' response:', data);
+      
+      // Update element with response data
+      const parent = element.closest('[data-container]') || element.parentElement;
+      if (parent) {
+        const content = document.createElement('div');
+        content.className = 'api-response';
+        content.textContent = data.message || JSON.stringify(data);
+        parent.appendChild(content);
+      }
+    } catch (error) {
+      console.error(endpoint + ' error:', error);
+      element.textContent = 'Error: ' + error.message;
+    }
+  }
+  
+  function call(element) {
+    const endpoint = element.getAttribute('data-api-call');
+    if (Object.prototype.hasOwnProperty.call(apiHandlers, endpoint)) {
+      console.log('Calling API:', endpoint);
+      return callEndpoint(endpoint, element);
+    }
+    console.warn('No handler for endpoint:', endpoint);
+  }
+  
+  // Lazy triggers (data-api-when), filled in by the visible/idle sections
+  const callTriggers = Object.create(null);
+  
+  function schedule(element) {
+    const trigger = callTriggers[element.getAttribute('data-api-when')];
+    if (trigger) return trigger(element);
+    call(element);
+  }
+  
+  // Schedule API calls for elements whose endpoint is in the table
+  function callApis(endpoints) {
+    document.querySelectorAll('[data-api-call]').forEach(element => {
+      const endpoint = element.getAttribute('data-api-call');
+      if (endpoints === apiHandlers || Object.prototype.hasOwnProperty.call(endpoints, endpoint)) {
+        schedule(element);
+      }
+    });
+  }
+  
+  // One delegated listener re-triggers calls for any element:
+  //   element.dispatchEvent(new CustomEvent('htmlxify:call', { bubbles: true }));
+  document.addEventListener('htmlxify:call', function(event) {
+    const element = event.target.closest && event.target.closest('[data-api-call]');
+    if (element) call(element);
+  });
+  
+  htmlxify.call = call;
+  
+  onRegister.push(function(page, loaded) {
+    Object.assign(apiHandlers, page.endpoints || {});
+    
+    // Pages registering after load trigger their own calls
+    if (loaded) callApis(page.endpoints || {});
+  });
+  
+  onStart.push(function() {
+    callApis(apiHandlers);
+  });
+""",
+        'batch': """
+  // Batching (opt-in): calls made in the same tick share one POST to
+  // /_batch, and repeated calls to the same endpoint share one entry.
+  // Each call carries its cached ETag, and each result its Cache-Control
+  // and ETag headers, so batched responses are cached like direct ones.
+  let batchQueue = null;
+  
+  function requestBatched(path) {
+    if (!batchQueue) {
+      batchQueue = new Map();
+      setTimeout(flushBatch, 0);
+    }
+    
+    let entry = batchQueue.get(path);
+    if (!entry) {
+      entry = {};
+      entry.promise = new Promise((resolve, reject) => {
+        entry.resolve = resolve;
+        entry.reject = reject;
+      });
+      batchQueue.set(path, entry);
+    }
+    return entry.promise;
+  }
+  
+  async function flushBatch() {
+    const queue = batchQueue;
+    batchQueue = null;
+    const paths = Array.from(queue.keys());
+    
+    // A lone call does not need the batch endpoint
+    if (paths.length === 1) {
+      const entry = queue.get(paths[0]);
+      requestDirect(paths[0]).then(entry.resolve, entry.reject);
+      return;
+    }
+    
+    try {
+      const response = await postJson(API_BASE_URL + '/_batch', {
+        timestamp: new Date().toISOString(),
+        calls: paths.map(path => {
+          const cached = responseCache.get(path);
+          return cached && cached.etag ? { path: path, etag: cached.etag } : { path: path };
+        })
+      });
+      const data = await response.json();
+      console.log('Batched ' + paths.length + ' API calls');
+      
+      // Fan the responses out in request order
+      paths.forEach((path, i) => {
+        const entry = queue.get(path);
+        const result = (data.results || [])[i];
+        const status = result ? result.status : 0;
+        const cached = responseCache.get(path);
+        if ((status >= 200 && status < 300) || (status === 304 && cached)) {
+          const headers = result.headers || {};
+          entry.resolve({
+            data: status === 304 ? cached.data : result.body,
+            cacheControl: headers['Cache-Control'] || '',
+            etag: headers['ETag'] || (cached && cached.etag)
+          });
+        } else {
+          entry.reject(new Error(`HTTP ${result ? result.status : 'missing'}`));
+        }
+      });
+    } catch (error) {
+      queue.forEach(entry => entry.reject(error));
+    }
+  }
+  
+  // Runs before the API hook, so late pages batch their own calls too
+  onRegister.unshift(function(page) {
+    if (page.batch) sendRequest = requestBatched;
+  });
+""",
+        'visible': """
+  // data-api-when="visible": call once the element nears the viewport
+  let visibilityObserver = null;
+  
+  callTriggers.visible = function(element) {
+    if (!('IntersectionObserver' in window)) return call(element);
+    
+    if (!visibilityObserver) {
+      visibilityObserver = new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+          if (entry.isIntersecting) {
+            visibilityObserver.unobserve(entry.target);
+            call(entry.target);
+          }
+        });
+      }, { rootMargin: '200px' });
+    }
+    visibilityObserver.observe(element);
+  };
+""",
+        'idle': """
+  // data-api-when="idle": call once the browser is idle
+  callTriggers.idle = function(element) {
+    if ('requestIdleCallback' in window) {
+      window.requestIdleCallback(() => call(element), { timeout: 2000 });
+    } else {
+      setTimeout(() => call(element), 1);
+    }
+  };
+""",
+        'bindings': """
+  // Binding index: key -> Set of bound elements. Built once, then kept
+  // current by a MutationObserver so updates never scan the DOM.
+  let bindingIndex = null;
+  
+  function indexElement(element) {
+    const key = element.getAttribute('data-dynamic');
+    if (!bindingIndex.has(key)) bindingIndex.set(key, new Set());
+    bindingIndex.get(key).add(element);
+  }
+  
+  function unindexElement(element, key) {
+    const elements = bindingIndex.get(key);
+    if (elements) elements.delete(element);
+  }
+  
+  function forEachBound(node, callback) {
+    if (node.nodeType !== 1) return;
+    if (node.hasAttribute('data-dynamic')) callback(node);
+    node.querySelectorAll('[data-dynamic]').forEach(callback);
+  }
+  
+  function buildBindingIndex() {
+    bindingIndex = new Map();
+    document.querySelectorAll('[data-dynamic]').forEach(indexElement);
+    
+    if (!('MutationObserver' in window)) return;
+    new MutationObserver(mutations => {
+      mutations.forEach(mutation => {
+        if (mutation.type === 'attributes') {
+          if (mutation.oldValue !== null) unindexElement(mutation.target, mutation.oldValue);
+          if (mutation.target.hasAttribute('data-dynamic')) indexElement(mutation.target);
+          return;
+        }
+        mutation.removedNodes.forEach(node => forEachBound(node, element => {
+          unindexElement(element, element.getAttribute('data-dynamic'));
+        }));
+        mutation.addedNodes.forEach(node => forEachBound(node, indexElement));
+      });
+    }).observe(document.documentElement, {
+      childList: true,
+      subtree: true,
+      attributes: true,
+      attributeFilter: ['data-dynamic'],
+      attributeOldValue: true
+    });
+  }
+  
+  // Updates within one animation frame are coalesced: each bound element
+  // is written at most once per frame, with the latest value.
+  let pendingBindings = new Map();
+  let bindingFlushScheduled = false;
+  
+  function flushBindings() {
+    bindingFlushScheduled = false;
+    if (!bindingIndex) buildBindingIndex();
+    
+    const updates = pendingBindings;
+    pendingBindings = new Map();
+    updates.forEach((value, key) => {
+      const elements = bindingIndex.get(key);
+      if (!elements) return;
+      elements.forEach(element => {
+        element.textContent = value;
+        element.dispatchEvent(new CustomEvent('dataUpdate', { detail: { key, value } }));
+      });
+    });
+  }
+  
+  function updateBinding(key, value) {
+    dataBindings[key] = value;
+    pendingBindings.set(key, value);
+    
+    if (!bindingFlushScheduled) {
+      bindingFlushScheduled = true;
+      (window.requestAnimationFrame || (callback => setTimeout(callback, 16)))(flushBindings);
+    }
+  }
+  
+  htmlxify.updateBinding = updateBinding;
+  window.updateBinding = updateBinding;
+  
+  onRegister.push(function(page) {
+    (page.bindings || []).forEach(key => {
+      if (!(key in dataBindings)) dataBindings[key] = null;
+    });
+  });
+  
+  onStart.push(function() {
+    if (!bindingIndex && Object.keys(dataBindings).length) buildBindingIndex();
+  });
+""",
+        'animation': """
+  // Animation Utilities
+  const animationUtils = {
+    // Remove animation class after animation completes
+    removeAnimationClass: function(element, className) {
+      element.addEventListener('animationend', function() {
+        element.classList.remove(className);
+      }, { once: true });
+    },
+    
+    // Prefetch images for animations
+    prefetchImages: function(urls) {
+      urls.forEach(url => {
+        const img = new Image();
+        img.src = url;
+      });
+    },
+    
+    // Request animation frame for smooth animations
+    smoothScroll: function(element, duration = 300) {
+      const start = window.scrollY;
+      const target = element.offsetTop;
+      const distance = target - start;
+      const startTime = performance.now();
+      
+      function easeInOutQuad(t) {
+        return t < 0.5 ? 2 * t * t : -1 + (4 - 2 * t) * t;
+      }
+      
+      function scroll(currentTime) {
+        const elapsed = currentTime - startTime;
+        const progress = Math.min(elapsed / duration, 1);
+        const ease = easeInOutQuad(progress);
+        
+        window.scrollTo(0, start + distance * ease);
+        
+        if (progress < 1) {
+          requestAnimationFrame(scroll);
+        }
+      }
+      
+      requestAnimationFrame(scroll);
+    }
+  };
+  
+  htmlxify.animationUtils = animationUtils;
+  window.animationUtils = animationUtils;
+""",
+    }
+    
+    RUNTIME_FOOTER = """
+  let loaded = false;
+  
+  function register(page) {
+    onRegister.forEach(hook => hook(page, loaded));
+  }
+  
+  function start() {
+    if (loaded) return;
+    loaded = true;
+    onStart.forEach(hook => hook());
+  }
+  
+  htmlxify.register = register;
+  
+  // Register pages that loaded before the runtime
+  const pending = window.htmlxifyPages || [];
+  window.htmlxifyPages = { push: register };
+  pending.forEach(register);
+  
+  // Auto-trigger API handlers on page load
+  if (document.readyState === 'complete') {
+    start();
+  } else {
+    document.addEventListener('DOMContentLoaded', start);
+    window.addEventListener('load', start);
+  }
+})(window, document);"""
+    
+    def __init__(
+        self,
+        ast: Dict[str, Any],
+        shared_runtime: bool = False,
+        batch_calls: bool = False,
+        minify: bool = False
+    ):
         self.ast = ast
-        self.scripts: List[str] = []
+        self.shared_runtime = shared_runtime
+        self.batch_calls = batch_calls
+        self.minify = minify
+        self.tables: Dict[str, Any] = {}
         self.api_calls: Set[str] = set()
+        self.cache_ttls: Dict[str, float] = {}
         self.data_bindings: Set[str] = set()
+        self.features: Set[str] = set()
+        self.elements_visited = 0
+        self.text_nodes_visited = 0
+        self.unminified_bytes: Optional[int] = None  # Size of the page JS before _minify, when minifying
     
     def generate(self) -> str:
-        """Generate all JavaScript"""
-        self._scan_ast(self.ast)
-        self._generate_api_handlers()
-        self._generate_data_bindings()
-        self._generate_animation_cleanup()
-        
-        if not self.scripts:
-            return "// No dynamic content"
-        
-        return '\n\n'.join(self.scripts)
+        """
+        Generate JavaScript for the page.
+        Includes the runtime unless shared_runtime is set.
+        """
+        with tracing.span('htmlxify.js', minify=self.minify, shared_runtime=self.shared_runtime) as span:
+            self._scan_ast(self.ast)
+            self._generate_api_handlers()
+            self._generate_data_bindings()
+            
+            page = self._generate_page_registration()
+            
+            if self.shared_runtime:
+                js = page or "// No dynamic content"
+            elif self.minify:
+                # Production: inline only the runtime sections this page uses
+                runtime = self._build_runtime(self.features) if self.features else ''
+                js = '\n\n'.join(part for part in (runtime, page) if part)
+                js = js or "// No dynamic content"
+            elif page:
+                js = self._build_runtime() + '\n\n' + page
+            else:
+                js = self._build_runtime()
+            
+            if self.minify:
+                self.unminified_bytes = len(js.encode('utf-8'))
+                js = self._minify(js)
+            if span.recording:
+                span.set_attributes({
+                    'bytes': len(js.encode('utf-8')),
+                    'api_calls': len(self.api_calls),
+                    'data_bindings': len(self.data_bindings),
+                })
+            return js
+    
+    def generate_runtime(self) -> str:
+        """Generate the static runtime shared by all pages"""
+        runtime = self._build_runtime()
+        return self._minify(runtime) if self.minify else runtime
+    
+    def runtime_filename(self) -> str:
+        """Versioned runtime filename, e.g. htmlxify-runtime.1a2b3c4d5e.js"""
+        digest = hashlib.sha256(self.generate_runtime().encode('utf-8')).hexdigest()
+        return f"{self.RUNTIME_PREFIX}.{digest[:10]}.js"
+    
+    def _build_runtime(self, features: Optional[Iterable[str]] = None) -> str:
+        """Assemble the runtime from all sections, or only the given ones"""
+        wanted = set(self.RUNTIME_SECTIONS if features is None else features)
+        sections = [
+            code for name, code in self.RUNTIME_SECTIONS.items() if name in wanted
+        ]
+        return self.RUNTIME_HEADER + ''.join(sections) + self.RUNTIME_FOOTER
+    
+    @staticmethod
+    def _minify(js: str) -> str:
+        """
+        Strip comments, console.log calls, indentation and blank lines.
+        Line-based: the runtime keeps comments and console.log calls on
+        lines of their own, so no JavaScript tokenizer is needed.
+        """
+        lines = []
+        for line in js.split('\n'):
+            stripped = line.strip()
+            if not stripped or stripped.startswith(('//', 'console.log(')):
+                continue
+            lines.append(stripped)
+        return '\n'.join(lines)
     
     def _scan_ast(self, node: Any):
         """Scan AST for special attributes"""
         if not isinstance(node, dict):
             return
         
-        if node.get('type') == 'Element':
+        if node.get('type') == 'Text':
+            self.text_nodes_visited += 1
+        elif node.get('type') == 'Element':
+            self.elements_visited += 1
             attrs = node.get('attributes', {})
             
             # Collect API calls
@@ -47,6 +626,22 @@ class JSGenerator:
                     endpoint = call_val.get('endpoint', '')
                 if endpoint:
                     self.api_calls.add(str(endpoint))
+                    self.features.add('api')
+                    
+                    # Lazy triggers need their runtime section
+                    trigger = str(attrs.get('⚡-call-when', ''))
+                    if trigger in ('visible', 'idle'):
+                        self.features.add(trigger)
+                    
+                    # Client-side cache TTL; the shortest one wins
+                    if '⚡-cache' in attrs:
+                        try:
+                            ttl = float(attrs['⚡-cache'])
+                        except (TypeError, ValueError):
+                            ttl = 0
+                        if ttl > 0:
+                            previous = self.cache_ttls.get(str(endpoint), ttl)
+                            self.cache_ttls[str(endpoint)] = min(previous, ttl)
             
             # Collect data bindings
             if '⚡-data' in attrs:
@@ -56,182 +651,54 @@ class JSGenerator:
                     data_key = data_val.get('key', '')
                 if data_key:
                     self.data_bindings.add(str(data_key))
+                    self.features.add('bindings')
+            
+            # Animation utilities are only needed with animations
+            if 'animate' in attrs:
+                self.features.add('animation')
         
         # Recurse
         for child in node.get('children', []):
             self._scan_ast(child)
     
+    def _generate_page_registration(self) -> str:
+        """Emit the page tables as a registration call for the runtime"""
+        if not self.tables:
+            return ''
+        
+        table = json.dumps(self.tables, separators=(',', ':'), ensure_ascii=False)
+        return (
+            "// Page tables (requires the htmlxify runtime)\n"
+            f"(window.htmlxifyPages = window.htmlxifyPages || []).push({table});"
+        )
+    
     def _generate_api_handlers(self):
-        """Generate API handler functions with configurable backend URL"""
+        """Build the endpoint table consumed by the runtime's generic handler"""
         if not self.api_calls:
             return
         
-        code = """// Backend API Configuration
-// Users can set the API URL in 3 ways (no compiler changes needed):
-//
-// 1. In your HTML file, add a meta tag:
-//    <meta name="api-url" content="https://api.yourdomain.com">
-//
-// 2. In your HTML file or script, set window variable:
-//    <script>window.API_BASE_URL = 'https://api.yourdomain.com';</script>
-//
-// 3. Create a config.js file and include it before this script:
-//    <script src="config.js"></script>
-//    window.API_BASE_URL = 'https://api.yourdomain.com';
-//
-// Priority order (first one found is used):
-//   1. window.API_BASE_URL (highest priority)
-//   2. meta[name="api-url"] content attribute  
-//   3. /api (relative URL - same domain as frontend)
-//   4. http://localhost:5000/api (local development default)
-
-const API_BASE_URL = window.API_BASE_URL 
-  || (function() {
-    const meta = document.querySelector('meta[name="api-url"]');
-    if (meta) return meta.getAttribute('content');
-    
-    // Use relative URL if not on localhost
-    if (window.location.hostname !== 'localhost' && window.location.hostname !== '127.0.0.1') {
-      return '/api';
-    }
-    
-    // Default to localhost for development
-    return 'http://localhost:5000/api';
-  })();
-
-console.log('API Configuration - API_BASE_URL:', API_BASE_URL);
-
-// API Handlers (calls backend server)
-const apiHandlers = {
-"""
-        
+        endpoints: Dict[str, Dict[str, Any]] = {}
         for endpoint in sorted(self.api_calls):
-            code += f"""  '{endpoint}': async function(element) {{
-    try {{
-      const plan = element.getAttribute('data-plan');
-      const url = plan 
-        ? API_BASE_URL + '/{endpoint}/' + plan 
-        : API_BASE_URL + '/{endpoint}';
-      
-      const response = await fetch(url, {{
-        method: 'POST',
-        headers: {{
-          'Content-Type': 'application/json',
-        }},
-        body: JSON.stringify({{ timestamp: new Date().toISOString() }})
-      }});
-      
-      if (!response.ok) throw new Error(`HTTP ${{response.status}}`);
-      
-      const data = await response.json();
-      console.log('{endpoint} response:', data);
-      
-      // Update element with response data
-      const parent = element.closest('[data-container]') || element.parentElement;
-      if (parent) {{
-        const content = document.createElement('div');
-        content.className = 'api-response';
-        content.textContent = data.message || JSON.stringify(data);
-        parent.appendChild(content);
-      }}
-    }} catch (error) {{
-      console.error('{endpoint} error:', error);
-      element.textContent = 'Error: ' + error.message;
-    }}
-  }},
-"""
+            options = {}
+            if endpoint in self.cache_ttls:
+                ttl = self.cache_ttls[endpoint]
+                options['ttl'] = int(ttl) if ttl.is_integer() else ttl
+            endpoints[endpoint] = options
         
-        code += """};\n
-// Auto-trigger API handlers on page load
-document.addEventListener('DOMContentLoaded', function() {
-  console.log('API_BASE_URL:', API_BASE_URL);
-  
-  document.querySelectorAll('[data-api-call]').forEach(element => {
-    const endpoint = element.getAttribute('data-api-call');
-    if (apiHandlers[endpoint]) {
-      console.log('Calling API:', endpoint);
-      apiHandlers[endpoint](element);
-    } else {
-      console.warn('No handler for endpoint:', endpoint);
-    }
-  });
-});"""
+        self.tables['endpoints'] = endpoints
         
-        self.scripts.append(code)
+        # Page-load calls are sent together to the backend's /_batch endpoint
+        if self.batch_calls:
+            self.tables['batch'] = True
+            self.features.add('batch')
     
     def _generate_data_bindings(self):
-        """Generate data binding code"""
+        """Build the data binding table"""
         if not self.data_bindings:
             return
         
-        code = """// Data Bindings
-const dataBindings = {
-"""
-        
-        for binding in sorted(self.data_bindings):
-            code += f"""  '{binding}': null,
-"""
-        
-        code += """};\n
-function updateBinding(key, value) {
-  dataBindings[key] = value;
-  document.querySelectorAll(`[data-dynamic="${key}"]`).forEach(element => {
-    element.textContent = value;
-    element.dispatchEvent(new CustomEvent('dataUpdate', { detail: { key, value } }));
-  });
-}\n
-// Example: updateBinding('myData', 'new value');
-"""
-        
-        self.scripts.append(code)
-    
-    def _generate_animation_cleanup(self):
-        """Generate animation cleanup code"""
-        code = """// Animation Utilities
-const animationUtils = {
-  // Remove animation class after animation completes
-  removeAnimationClass: function(element, className) {
-    element.addEventListener('animationend', function() {
-      element.classList.remove(className);
-    }, { once: true });
-  },
-  
-  // Prefetch images for animations
-  prefetchImages: function(urls) {
-    urls.forEach(url => {
-      const img = new Image();
-      img.src = url;
-    });
-  },
-  
-  // Request animation frame for smooth animations
-  smoothScroll: function(element, duration = 300) {
-    const start = window.scrollY;
-    const target = element.offsetTop;
-    const distance = target - start;
-    const startTime = performance.now();
-    
-    function easeInOutQuad(t) {
-      return t < 0.5 ? 2 * t * t : -1 + (4 - 2 * t) * t;
-    }
-    
-    function scroll(currentTime) {
-      const elapsed = currentTime - startTime;
-      const progress = Math.min(elapsed / duration, 1);
-      const ease = easeInOutQuad(progress);
-      
-      window.scrollTo(0, start + distance * ease);
-      
-      if (progress < 1) {
-        requestAnimationFrame(scroll);
-      }
-    }
-    
-    requestAnimationFrame(scroll);
-  }
-};"""
-        
-        self.scripts.append(code)
+        # Example: updateBinding('myData', 'new value');
+        self.tables['bindings'] = sorted(self.data_bindings)
 
 
 # Test
@@ -0,0 +1,48 @@
+"""
+Metrics - What one compile did
+    
+    result = htmlxify.compile(source, 'page.htmlxify')
+    print(result.metrics.to_dict())
+
+The stages count as they go, as plain attributes, and compile() copies
+the counts into result.metrics after each stage. A profiled compile also
+prints them under the stage table (see profiler.py), so slow pages can be
+matched to what is in them.
+"""
+
+from typing import Any, Dict
+
+
+class CompileMetrics:
+    """Counters for one compile; all start at zero"""
+    
+    def __init__(self):
+        self.elements_visited = 0     # Element nodes walked by validate and the generators
+        self.text_nodes_visited = 0   # Text nodes walked, likewise
+        self.escape_calls = 0         # Text and attribute values HTML-escaped
+        self.parser_cache_hits = 0    # Parses that reused the loaded grammar
+        self.parser_cache_misses = 0  # Parses that had to load it
+        self.css_rules_emitted = 0    # Custom rules and @keyframes blocks written
+        self.css_rules_deduped = 0    # @keyframes blocks skipped, already written
+        self.js_handlers = 0          # Endpoints in the page's API handler table
+        self.js_data_bindings = 0     # Keys in the page's data binding table
+    
+    def add_visits(self, walker: Any):
+        """Add the nodes a validator or generator walked"""
+        self.elements_visited += walker.elements_visited
+        self.text_nodes_visited += walker.text_nodes_visited
+    
+    def to_dict(self) -> Dict[str, int]:
+        return dict(vars(self))
+    
+    def format_table(self) -> str:
+        """Counters as an aligned text table"""
+        header = f"{'Counter':<22} {'Value':>10}"
+        lines = [header, '-' * len(header)]
+        for name, value in self.to_dict().items():
+            lines.append(f"{name:<22} {value:>10,}")
+        return '\n'.join(lines)
+    
+    def __repr__(self):
+        counts = ', '.join(f"{name}={value}" for name, value in self.to_dict().items())
+        return f"<CompileMetrics {counts}>"
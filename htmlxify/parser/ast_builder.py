@@ -1,20 +1,42 @@
 ﻿"""
 AST Builder - Converts Lark parse tree to custom Abstract Syntax Tree
 PRODUCTION READY VERSION
+
+Thread-safe: every ASTBuilder shares one Lark parser, built once under a
+lock and only read afterwards (Lark keeps per-parse state local to each
+parse call). Transformers and ASTs are per-parse.
 """
 
+import threading
 from pathlib import Path
 from typing import Dict, Any, List, Optional
-from lark import Lark, Transformer, Tree, Token
+from lark import Lark, Transformer, Tree, Token, v_args
+
+from htmlxify import tracing
+from htmlxify.diagnostics import format_text, parse_error
+from htmlxify.profiler import count_nodes
 
 # Load grammar file
 GRAMMAR_FILE = Path(__file__).parent / "grammar.lark"
 
 
+def _position(meta) -> Dict[str, int]:
+    """Node meta: where the node starts and ends in the source (1-based, end exclusive)"""
+    if getattr(meta, 'empty', True):
+        return {}
+    return {
+        'line': meta.line,
+        'column': meta.column,
+        'end_line': meta.end_line,
+        'end_column': meta.end_column,
+    }
+
+
 class ASTTransformer(Transformer):
     """
     Transforms Lark parse tree to custom AST
     Matches grammar: start: element+
+    Elements and text get their start and end line and column in node['meta'].
     """
     
     def start(self, children: list) -> Dict[str, Any]:
@@ -26,7 +48,8 @@ class ASTTransformer(Transformer):
             'meta': {}
         }
     
-    def element(self, children: list) -> Dict[str, Any]:
+    @v_args(meta=True)
+    def element(self, meta, children: list) -> Dict[str, Any]:
         """
         element: tag_with_selectors attributes? body? | tag_with_selectors
         children[0] is always tag_with_selectors
@@ -47,7 +70,8 @@ class ASTTransformer(Transformer):
             'classes': tag_data.get('classes', []),
             'id': tag_data.get('id'),
             'attributes': {},
-            'children': []
+            'children': [],
+            'meta': _position(meta)
         }
         
         # Process optional attributes and body
@@ -155,7 +179,8 @@ class ASTTransformer(Transformer):
         """Alias for text_content inside body"""
         return children[0] if children else None
     
-    def full_element(self, children: list) -> Dict[str, Any]:
+    @v_args(meta=True)
+    def full_element(self, meta, children: list) -> Dict[str, Any]:
         """
         full_element: WORD class_sel* id_sel? attributes? body
         First child is WORD, rest are optional selectors/attributes/body
@@ -189,28 +214,22 @@ class ASTTransformer(Transformer):
             'classes': classes,
             'id': element_id,
             'attributes': attributes,
-            'children': body_children
+            'children': body_children,
+            'meta': _position(meta)
         }
     
-    def text_content(self, children: list) -> Dict[str, Any]:
-        """text_content: text_token+"""
-        text_parts = []
-        for child in children:
-            if isinstance(child, str):
-                text_parts.append(child)
-        
-        text = ' '.join(text_parts).strip()
+    @v_args(meta=True)
+    def text_content(self, meta, children: list) -> Dict[str, Any]:
+        """text_content: TEXT (whitespace runs collapse to one space)"""
+        text = ' '.join(str(children[0]).split()) if children else ''
         if text:
             return {
                 'type': 'Text',
-                'value': text
+                'value': text,
+                'meta': _position(meta)
             }
         return None
     
-    def text_token(self, children: list) -> str:
-        """text_token: TEXT_CHUNK | WORD"""
-        return str(children[0]) if children else ''
-    
     # ============================================================
     # TERMINAL HANDLERS
     # ============================================================
@@ -218,7 +237,7 @@ class ASTTransformer(Transformer):
     def WORD(self, token: Token) -> str:
         return str(token)
     
-    def TEXT_CHUNK(self, token: Token) -> str:
+    def TEXT(self, token: Token) -> str:
         return str(token)
     
     def STRING(self, token: Token) -> str:
@@ -250,84 +269,75 @@ class ASTBuilder:
     PRODUCTION READY
     """
     
-    # Class-level parser cache for performance
+    # Class-level parser cache for performance; written once, under the lock
     _parser_cache = None
+    _parser_lock = threading.Lock()
     
     def __init__(self, source_code: str, filename: str):
         self.source = source_code
         self.filename = filename
         self.parser = None
+        self.parser_cache_hit = True  # False when this builder loaded the grammar
         self._load_parser()
     
     def _load_parser(self):
         """Load and cache Lark parser"""
         # Use cached parser if available
-        if ASTBuilder._parser_cache is not None:
-            self.parser = ASTBuilder._parser_cache
-            return
+        parser = ASTBuilder._parser_cache
+        if parser is None:
+            with ASTBuilder._parser_lock:
+                # Another thread may have built it while we waited
+                if ASTBuilder._parser_cache is None:
+                    ASTBuilder._parser_cache = self._create_parser()
+                    self.parser_cache_hit = False
+                parser = ASTBuilder._parser_cache
+        self.parser = parser
+    
+    @staticmethod
+    def _create_parser() -> Lark:
+        """Build the Lark parser from the grammar file"""
+        with open(GRAMMAR_FILE, 'r', encoding='utf-8') as f:
+            grammar = f.read()
         
-        try:
-            with open(GRAMMAR_FILE, 'r', encoding='utf-8') as f:
-                grammar = f.read()
-            
-            # Create parser with optimized settings
-            self.parser = Lark(
-                grammar,
-                start='start',
-                parser='earley',           # Handles ambiguity
-                lexer='dynamic',           # Works with earley
-                propagate_positions=True,  # Track line numbers
-                maybe_placeholders=True,   # Allow None for optionals
-                ambiguity='resolve'        # Auto-resolve ambiguity
-            )
-            
-            # Cache for future instances
-            ASTBuilder._parser_cache = self.parser
-            
-        except FileNotFoundError:
-            print(f"❌ Error: Grammar file not found: {GRAMMAR_FILE}")
-            raise
-        except Exception as e:
-            print(f"❌ Error loading grammar: {e}")
-            raise
-    
-    def parse(self) -> Dict[str, Any]:
-        """Parse source code into AST"""
-        try:
-            # Step 1: Parse with Lark
-            tree = self.parser.parse(self.source)
+        # Create parser with optimized settings
+        return Lark(
+            grammar,
+            start='start',
+            parser='earley',           # Handles ambiguity
+            lexer='dynamic',           # Works with earley
+            propagate_positions=True,  # Track line numbers
+            maybe_placeholders=True,   # Allow None for optionals
+            ambiguity='resolve'        # Auto-resolve ambiguity
+        )
+    
+    def parse(self, report: bool = False) -> Dict[str, Any]:
+        """
+        Parse source code into AST.
+        Parse errors are re-raised; with report=True they are also printed.
+        """
+        with tracing.span('htmlxify.parse', filename=self.filename) as span:
+            if span.recording:
+                span.set_attribute('bytes', len(self.source.encode('utf-8')))
+            try:
+                # Step 1: Parse with Lark
+                tree = self.parser.parse(self.source)
+                
+                # Step 2: Transform to custom AST
+                transformer = ASTTransformer()
+                ast = transformer.transform(tree)
             
-            # Step 2: Transform to custom AST
-            transformer = ASTTransformer()
-            ast = transformer.transform(tree)
+            except Exception as e:
+                if report:
+                    self._handle_parse_error(e)
+                raise
             
+            if span.recording:
+                span.set_attribute('nodes', count_nodes(ast))
             return ast
-            
-        except Exception as e:
-            self._handle_parse_error(e)
-            raise
     
     def _handle_parse_error(self, error: Exception):
-        """Pretty-print parser errors"""
-        print(f"\n❌ Parse Error in {self.filename}:")
-        print(f"   {str(error)}")
-        
-        # Try to extract line number
-        error_str = str(error)
-        if 'line' in error_str.lower():
-            try:
-                import re
-                match = re.search(r'line (\d+)', error_str, re.IGNORECASE)
-                if match:
-                    line_num = int(match.group(1))
-                    lines = self.source.split('\n')
-                    if 0 <= line_num - 1 < len(lines):
-                        print(f"\n   Line {line_num}: {lines[line_num - 1]}")
-                        print(f"   {'':>{len(str(line_num)) + 7}}^")
-            except:
-                pass
-        
-        print()
+        """Pretty-print parser errors (Lark's message shows the source line)"""
+        print('\n' + format_text([parse_error(error, self.filename)]))
 
 
 # ============================================================
@@ -391,13 +401,13 @@ def test_parser():
         
         try:
             builder = ASTBuilder(code, 'test.htmlxify')
-            ast = builder.parse()
+            ast = builder.parse(report=True)
             
             import json
             print("PASSED")
             print(json.dumps(ast, indent=2))
             passed += 1
-            
+        
         except Exception as e:
             print(f"FAILED: {e}")
             failed += 1
@@ -4,6 +4,9 @@ Indentation Processor - Converts flat indented elements to nested tree
 
 from typing import Dict, Any, List
 
+from htmlxify import tracing
+from htmlxify.profiler import count_nodes
+
 
 class IndentationProcessor:
     """
@@ -22,6 +25,14 @@ class IndentationProcessor:
     
     def process(self, ast: Dict[str, Any]) -> Dict[str, Any]:
         """Convert flat list with indent info to nested tree"""
+        with tracing.span('htmlxify.indent') as span:
+            tree = self._nest(ast)
+            if span.recording:
+                span.set_attribute('nodes', count_nodes(tree))
+            return tree
+    
+    def _nest(self, ast: Dict[str, Any]) -> Dict[str, Any]:
+        """Nest elements under the closest less-indented element before them"""
         if ast['type'] != 'Document':
             return ast
         
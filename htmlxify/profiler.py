@@ -0,0 +1,202 @@
+"""
+Profiler - Per-stage cost of a compile
+    
+    profiler = Profiler()
+    with profiler:
+        result = htmlxify.compile(source, 'page.htmlxify', profiler=profiler)
+    print(profiler.format_table())
+
+Each stage (load, parse, indent, validate, html, css, js, and the CLI's
+write) records wall time, CPU time of the compiling thread and peak
+traced memory, plus what it processed: AST nodes, or bytes emitted. load
+is the one-off grammar load, near zero once the parser is warm.
+compile() only touches the profiler when one is passed, so unprofiled
+compiles pay nothing. It also hands the profiler the compile's counters
+(see metrics.py) and the cost of each validation rule, which the
+reports include.
+
+Memory is measured with tracemalloc, started for the profiler's lifetime
+if it isn't already running. Tracing slows Python down severalfold, so
+compare stage times with each other, not with unprofiled runs, or pass
+memory=False. Python 3.8 has no tracemalloc.reset_peak(): there the
+profiler restarts its own tracing before each stage, and when tracing
+was started by someone else, a stage that doesn't raise the peak reports
+the memory it still holds at its end.
+"""
+
+import contextlib
+import json
+import time
+import tracemalloc
+from typing import Dict, Any, Iterator, List, Optional
+
+from htmlxify.metrics import CompileMetrics
+
+
+class StageProfile:
+    """Cost of one pipeline stage"""
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.wall = 0.0         # Seconds
+        self.cpu = 0.0          # Seconds on the compiling thread
+        self.peak_memory = 0    # Bytes allocated above the stage's start, at peak
+        self.nodes: Optional[int] = None
+        self.bytes: Optional[int] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'stage': self.name,
+            'wall_ms': round(self.wall * 1000, 3),
+            'cpu_ms': round(self.cpu * 1000, 3),
+            'peak_memory_bytes': self.peak_memory,
+            'nodes': self.nodes,
+            'bytes': self.bytes,
+        }
+
+
+class RuleProfile:
+    """Cost of one validation rule, summed over the nodes it ran on"""
+    
+    def __init__(self, rule_id: str):
+        self.rule = rule_id
+        self.calls = 0
+        self.wall = 0.0  # Seconds
+        self.issues = 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'rule': self.rule,
+            'calls': self.calls,
+            'wall_ms': round(self.wall * 1000, 3),
+            'issues': self.issues,
+        }
+
+
+class Profiler:
+    """
+    Collects StageProfiles. Use it as a context manager (or call close())
+    so tracemalloc is stopped again when it was started for profiling.
+    """
+    
+    def __init__(self, memory: bool = True):
+        self.memory = memory
+        self.stages: List[StageProfile] = []
+        self.metrics: Optional[CompileMetrics] = None
+        self.rules: Dict[str, RuleProfile] = {}  # Validation rules, by id
+        self._tracing = False
+    
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[StageProfile]:
+        """Measure the enclosed block as one stage"""
+        stage = StageProfile(name)
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracing = True
+            if hasattr(tracemalloc, 'reset_peak'):
+                tracemalloc.reset_peak()
+            elif self._tracing:
+                # Python 3.8: restarting is the only way to reset the peak
+                tracemalloc.stop()
+                tracemalloc.start()
+            baseline, peak_before = tracemalloc.get_traced_memory()
+        
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield stage
+        finally:
+            stage.wall = time.perf_counter() - wall
+            stage.cpu = time.thread_time() - cpu
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                # A peak from before the stage (only on 3.8) says nothing about it
+                top = peak if peak > peak_before or peak_before == baseline else current
+                stage.peak_memory = max(0, top - baseline)
+            self.stages.append(stage)
+    
+    def count(self, name: str, nodes: Optional[int] = None, bytes: Optional[int] = None):
+        """Record what the most recent stage called name processed"""
+        for stage in reversed(self.stages):
+            if stage.name == name:
+                if nodes is not None:
+                    stage.nodes = nodes
+                if bytes is not None:
+                    stage.bytes = bytes
+                return
+    
+    def close(self):
+        """Stop tracemalloc if this profiler started it"""
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Stages, totals and counters, for JSON reports"""
+        report = {
+            'stages': [stage.to_dict() for stage in self.stages],
+            'total': {
+                'wall_ms': round(sum(stage.wall for stage in self.stages) * 1000, 3),
+                'cpu_ms': round(sum(stage.cpu for stage in self.stages) * 1000, 3),
+                'peak_memory_bytes': max((stage.peak_memory for stage in self.stages), default=0),
+            },
+        }
+        if self.metrics is not None:
+            report['metrics'] = self.metrics.to_dict()
+        if self.rules:
+            report['rules'] = [rule.to_dict() for rule in self._rules_by_cost()]
+        return report
+    
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), indent=2)
+    
+    def format_table(self) -> str:
+        """Stages as an aligned text table"""
+        def cell(value):
+            return '-' if value is None else f'{value:,}'
+        
+        header = f"{'Stage':<10} {'Wall ms':>10} {'CPU ms':>10} {'Peak KiB':>10} {'Nodes':>10} {'Bytes':>12}"
+        lines = [header, '-' * len(header)]
+        for stage in self.stages:
+            lines.append(
+                f"{stage.name:<10} {stage.wall * 1000:>10.2f} {stage.cpu * 1000:>10.2f} "
+                f"{stage.peak_memory / 1024:>10.1f} {cell(stage.nodes):>10} {cell(stage.bytes):>12}"
+            )
+        
+        total = self.to_dict()['total']
+        lines.append('-' * len(header))
+        lines.append(
+            f"{'total':<10} {total['wall_ms']:>10.2f} {total['cpu_ms']:>10.2f} "
+            f"{total['peak_memory_bytes'] / 1024:>10.1f}"
+        )
+        if self.metrics is not None:
+            lines += ['', self.metrics.format_table()]
+        if self.rules:
+            header = f"{'Rule':<22} {'Calls':>10} {'Wall ms':>10} {'Issues':>10}"
+            lines += ['', header, '-' * len(header)]
+            for rule in self._rules_by_cost():
+                lines.append(f"{rule.rule:<22} {rule.calls:>10,} {rule.wall * 1000:>10.2f} {rule.issues:>10,}")
+        return '\n'.join(lines)
+    
+    def _rules_by_cost(self) -> List[RuleProfile]:
+        return sorted(self.rules.values(), key=lambda rule: rule.wall, reverse=True)
+
+
+def count_nodes(ast: Dict[str, Any]) -> int:
+    """Number of element and text nodes in an AST"""
+    count = 0
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, dict):
+            continue
+        if node.get('type') in ('Element', 'Text'):
+            count += 1
+        stack.extend(node.get('children', []))
+    return count
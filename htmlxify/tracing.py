@@ -0,0 +1,222 @@
+"""
+Tracing - Spans around each compile stage
+    
+    from htmlxify import tracing
+    
+    with tracing.JSONLinesTracer('trace.jsonl') as tracer:
+        tracing.set_tracer(tracer)
+        htmlxify.compile(source, 'index.htmlxify')
+
+compile() runs inside an htmlxify.compile span. Inside it, ASTBuilder.parse,
+IndentationProcessor.process, SemanticValidator.validate and each generator
+open their own span (htmlxify.parse, .indent, .validate, .html, .css, .js),
+with attributes such as filename, nodes and bytes. Each stage also opens
+its span when called on its own.
+
+The default tracer is a no-op. Its spans aren't recording, so stages skip
+attributes that cost work to compute, such as node counts. The tracer is
+set per process; set_tracer() swaps it for every thread. Spans nest per
+thread and per asyncio task, through a context variable.
+
+JSONLinesTracer writes one JSON object per finished span. OpenTelemetryTracer
+hands spans to the optional opentelemetry-api package, so compile spans
+appear inside the caller's own traces.
+"""
+
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from typing import Dict, Any, IO, Iterator, Optional, Union
+
+
+class Span:
+    """One traced operation. Stages add attributes while it runs."""
+    
+    recording = True
+    
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None, parent: Optional['Span'] = None):
+        self.name = name
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.start_ns = time.time_ns()
+        self.duration_ns: Optional[int] = None
+        self.error: Optional[str] = None
+        self._started = time.perf_counter_ns()
+    
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+    
+    def set_attributes(self, attributes: Dict[str, Any]):
+        self.attributes.update(attributes)
+    
+    def end(self):
+        self.duration_ns = time.perf_counter_ns() - self._started
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent.span_id if self.parent else None,
+            'start_ns': self.start_ns,
+            'duration_ms': round((self.duration_ns or 0) / 1e6, 3),
+            'status': 'error' if self.error else 'ok',
+            'error': self.error,
+            'attributes': self.attributes,
+        }
+
+
+class _NoOpSpan:
+    """Span of the no-op tracer: accepts attributes and drops them"""
+    
+    recording = False
+    
+    def set_attribute(self, key: str, value: Any):
+        pass
+    
+    def set_attributes(self, attributes: Dict[str, Any]):
+        pass
+
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('htmlxify_span', default=None)
+
+
+class Tracer:
+    """
+    Base tracer. Subclasses export finished spans by overriding
+    end_span(); the base class just times them.
+    """
+    
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """Run the enclosed block as a span, a child of the current one"""
+        span = self.start_span(name, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+            self.end_span(span)
+    
+    def start_span(self, name: str, attributes: Dict[str, Any]) -> Span:
+        return Span(name, attributes, parent=_current_span.get())
+    
+    def end_span(self, span: Span):
+        """Called with each span once it has finished"""
+
+
+class NoOpTracer(Tracer):
+    """Default tracer: records nothing and costs next to nothing"""
+    
+    _span = _NoOpSpan()
+    _context = contextlib.nullcontext(_span)
+    
+    def span(self, name: str, **attributes):
+        return self._context
+
+
+class JSONLinesTracer(Tracer):
+    """
+    Writes every finished span as one line of JSON (see Span.to_dict) to a
+    file path, opened for appending, or to an open text stream. Lines from
+    many threads don't interleave. Close it (or use it as a context
+    manager) to close a file it opened.
+    """
+    
+    def __init__(self, destination: Union[str, 'os.PathLike[str]', IO[str]]):
+        if isinstance(destination, (str, os.PathLike)):
+            self.stream = open(destination, 'a', encoding='utf-8')
+            self._owns_stream = True
+        else:
+            self.stream = destination
+            self._owns_stream = False
+        self._lock = threading.Lock()
+    
+    def end_span(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str) + '\n'
+        with self._lock:
+            self.stream.write(line)
+            self.stream.flush()
+    
+    def close(self):
+        if self._owns_stream:
+            self.stream.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _OpenTelemetrySpan:
+    """Adapts an OpenTelemetry span to the Span attribute methods"""
+    
+    def __init__(self, span):
+        self.span = span
+        self.recording = span.is_recording()
+    
+    def set_attribute(self, key: str, value: Any):
+        if value is not None:  # OpenTelemetry attributes can't be None
+            self.span.set_attribute(key, value)
+    
+    def set_attributes(self, attributes: Dict[str, Any]):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+
+class OpenTelemetryTracer(Tracer):
+    """
+    Hands spans to OpenTelemetry. Spans start as the current OpenTelemetry
+    span, so they nest under whatever span the caller has open.
+    
+    tracer is an opentelemetry.trace.Tracer. By default it is the global
+    provider's "htmlxify" tracer, which needs the opentelemetry-api package.
+    """
+    
+    def __init__(self, tracer=None):
+        if tracer is None:
+            try:
+                from opentelemetry import trace
+            except ImportError as e:
+                raise ImportError(
+                    "OpenTelemetryTracer needs the opentelemetry-api package "
+                    "(pip install opentelemetry-api)"
+                ) from e
+            tracer = trace.get_tracer('htmlxify')
+        self.tracer = tracer
+    
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes) -> Iterator[_OpenTelemetrySpan]:
+        attributes = {key: value for key, value in attributes.items() if value is not None}
+        with self.tracer.start_as_current_span(name, attributes=attributes) as span:
+            yield _OpenTelemetrySpan(span)
+
+
+_tracer: Tracer = NoOpTracer()
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def set_tracer(tracer: Optional[Tracer]) -> Tracer:
+    """Use tracer for every compile in this process (None: no-op); returns the previous one"""
+    global _tracer
+    previous = _tracer
+    _tracer = tracer if tracer is not None else NoOpTracer()
+    return previous
+
+
+def span(name: str, **attributes):
+    """A span from the current tracer: `with tracing.span('name', key=value) as span:`"""
+    return _tracer.span(name, **attributes)
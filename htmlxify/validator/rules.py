@@ -0,0 +1,179 @@
+"""
+Rules - Registry of validation rules
+    
+    from htmlxify.validator.semantic import DEFAULT_RULES, ValidationIssue
+    
+    ORG_RULES = DEFAULT_RULES.copy()
+    
+    @ORG_RULES.rule('org-button-type', fields=('tag',), tags=('button',))
+    def check_button_type(node, attrs):
+        if 'type' not in attrs:
+            yield ValidationIssue(node, "Buttons need a type", severity='warning')
+    
+    SemanticValidator(ast, filename, rules=ORG_RULES).validate()
+
+A rule is a function of (node, attrs) yielding ValidationIssues. It
+declares the node fields it checks, either node keys ('id', 'classes',
+'value') or attributes ('attributes.style'), and optionally the tags it
+applies to: a collection, or a predicate called once per tag. It only
+runs on nodes that have at least one of those fields set, so nodes
+without an id never reach the id check. Rules look at their own node,
+not its descendants: incremental validation reuses a node's issues while
+the node itself is unchanged.
+
+The registry compiles its rules into a dispatch table once per node type
+and tag: each field maps to the rules that check it. Walking a node then
+costs one lookup per field it has, not a call per rule. Rules run in
+registration order, so the order of issues is stable.
+"""
+
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+
+ATTRIBUTE_PREFIX = 'attributes.'
+
+
+class Rule:
+    """One validation check and where it applies"""
+    
+    def __init__(
+        self,
+        rule_id: str,
+        check: Callable,
+        fields: Iterable[str],
+        tags: Union[Iterable[str], Callable[[str], bool], None] = None,
+        node_type: str = 'Element'
+    ):
+        self.id = rule_id
+        self.check = check
+        self.fields = tuple(fields)
+        # None: every tag. A predicate is called once per tag, when the
+        # dispatch table for that tag is compiled
+        self.tags = tags if tags is None or callable(tags) else frozenset(tags)
+        self.node_type = node_type
+        if not self.fields:
+            raise ValueError(f"Rule '{rule_id}' must declare the fields it checks")
+    
+    def applies_to(self, node_type: str, tag: Optional[str]) -> bool:
+        if node_type != self.node_type:
+            return False
+        if self.tags is None:
+            return True
+        if callable(self.tags):
+            return tag is not None and bool(self.tags(tag))
+        return tag in self.tags
+    
+    def __repr__(self):
+        return f"<Rule {self.id}>"
+
+
+class DispatchTable:
+    """
+    Rules for one node type and tag. Every field maps to a bitmask of the
+    rules that check it; a node's fields OR together into a mask, and the
+    rules for each mask seen are kept, so most nodes cost a few lookups.
+    """
+    
+    def __init__(self, rules: List[Rule]):
+        self.rules = rules
+        node_fields: Dict[str, int] = {}
+        self.attribute_fields: Dict[str, int] = {}
+        for index, rule in enumerate(rules):
+            for field in rule.fields:
+                if field.startswith(ATTRIBUTE_PREFIX):
+                    key = field[len(ATTRIBUTE_PREFIX):]
+                    self.attribute_fields[key] = self.attribute_fields.get(key, 0) | 1 << index
+                else:
+                    node_fields[field] = node_fields.get(field, 0) | 1 << index
+        self.node_fields: Tuple[Tuple[str, int], ...] = tuple(node_fields.items())
+        self._selections: Dict[int, Tuple[Rule, ...]] = {0: ()}
+    
+    def select(self, node: dict, attrs: dict) -> Tuple[Rule, ...]:
+        """The rules to run on node, in registration order"""
+        mask = 0
+        for field, bits in self.node_fields:
+            if node.get(field):
+                mask |= bits
+        if attrs and self.attribute_fields:
+            attribute_fields = self.attribute_fields
+            for key in attrs:
+                bits = attribute_fields.get(key)
+                if bits:
+                    mask |= bits
+        
+        rules = self._selections.get(mask)
+        if rules is None:
+            rules = tuple(rule for index, rule in enumerate(self.rules) if mask >> index & 1)
+            self._selections[mask] = rules
+        return rules
+
+
+class RuleRegistry:
+    """Ordered rules, compiled into dispatch tables on first use"""
+    
+    def __init__(self, rules: Iterable[Rule] = ()):
+        self.rules: List[Rule] = []
+        self._tables: Dict[Tuple[str, Optional[str]], DispatchTable] = {}
+        self._lock = threading.Lock()
+        for rule in rules:
+            self.add(rule)
+    
+    def add(self, rule: Rule) -> Rule:
+        """Register a rule after the existing ones; ids must be unique"""
+        with self._lock:
+            if any(existing.id == rule.id for existing in self.rules):
+                raise ValueError(f"A rule with id '{rule.id}' is already registered")
+            self.rules = self.rules + [rule]
+            self._tables = {}
+        return rule
+    
+    def remove(self, rule_id: str):
+        with self._lock:
+            rules = [rule for rule in self.rules if rule.id != rule_id]
+            if len(rules) == len(self.rules):
+                raise KeyError(rule_id)
+            self.rules = rules
+            self._tables = {}
+    
+    def rule(
+        self,
+        rule_id: str,
+        fields: Iterable[str],
+        tags: Union[Iterable[str], Callable[[str], bool], None] = None,
+        node_type: str = 'Element'
+    ) -> Callable:
+        """Decorator: register the function as a rule"""
+        def register(check):
+            self.add(Rule(rule_id, check, fields, tags, node_type))
+            return check
+        return register
+    
+    def copy(self) -> 'RuleRegistry':
+        return RuleRegistry(self.rules)
+    
+    def table(self, node_type: str, tag: Optional[str]) -> DispatchTable:
+        """The dispatch table for nodes of this type and tag, compiled once"""
+        key = (node_type, tag)
+        table = self._tables.get(key)
+        if table is None:
+            tables = self._tables
+            table = DispatchTable([rule for rule in self.rules if rule.applies_to(node_type, tag)])
+            tables[key] = table  # A concurrent add() swaps in a fresh dict
+        return table
+    
+    def __getstate__(self):
+        # Pickled to run in a process pool (see SemanticValidator.validate);
+        # rule functions pickle by name, so they must be module-level
+        return {'rules': self.rules}
+    
+    def __setstate__(self, state):
+        self.rules = state['rules']
+        self._tables = {}
+        self._lock = threading.Lock()
+    
+    def __iter__(self):
+        return iter(self.rules)
+    
+    def __len__(self):
+        return len(self.rules)
@@ -1,29 +1,204 @@
 ﻿"""
 Semantic Validator - Checks AST for errors and warnings
 Security: Ensures no emoji identifiers, validates backend calls
+
+Each check is a rule in DEFAULT_RULES (see rules.py); pass rules= to
+validate against another registry, e.g. DEFAULT_RULES.copy() plus your
+own rules.
+
+validate(jobs=N) splits a large document's top-level subtrees across a
+process pool; the issues come back in the same order as a serial walk.
+validate(previous=validator) revalidates an edited document, running the
+rules only on nodes that changed since the previous validation.
 """
 
 import re
-from typing import List, Dict, Any, Optional
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import repeat
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+from htmlxify import tracing
+from htmlxify.diagnostics import ValidationIssue, format_text
+from htmlxify.profiler import RuleProfile, count_nodes
+from htmlxify.validator.rules import Rule, RuleRegistry
+
+
+# Valid identifier pattern (JavaScript-compatible)
+IDENTIFIER_PATTERN = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_-]*$')
+
+# Component name pattern (must have hyphen)
+COMPONENT_PATTERN = re.compile(r'^[a-z]+-[a-z-]+$')
+
+# Values accepted by ⚡-call-when
+CALL_TRIGGERS = ('load', 'visible', 'idle')
+
+# Style properties that trigger layout when they change
+LAYOUT_PROPERTIES = ('left', 'top', 'width', 'height')
+
+
+DEFAULT_RULES = RuleRegistry()
+
+
+@DEFAULT_RULES.rule('invalid-id', fields=('id',))
+def check_id(node, attrs):
+    """IDs are identifiers: no emojis or special characters"""
+    element_id = node['id']
+    if not IDENTIFIER_PATTERN.match(element_id):
+        return [ValidationIssue(
+            node,
+            f"Invalid ID '{element_id}'. "
+            f"Use only alphanumeric characters, hyphens, and underscores. "
+            f"Emojis are NOT allowed in identifiers.",
+            severity='error'
+        )]
+
 
+@DEFAULT_RULES.rule('invalid-class', fields=('classes',))
+def check_classes(node, attrs):
+    """Class names are identifiers too"""
+    return [
+        ValidationIssue(
+            node,
+            f"Invalid class name '{cls}'. "
+            f"No emojis or special characters allowed.",
+            severity='error'
+        )
+        for cls in node['classes'] if not IDENTIFIER_PATTERN.match(cls)
+    ]
 
-class ValidationIssue:
-    """Represents an error or warning"""
+
+def is_component(tag: str) -> bool:
+    """Custom component tags contain a hyphen or the word component"""
+    return 'component' in tag.lower() or '-' in tag
+
+
+@DEFAULT_RULES.rule('component-name', fields=('tag',), tags=is_component)
+def check_component_name(node, attrs):
+    """Custom components are lowercase with a hyphen"""
+    tag = node['tag']
+    if not COMPONENT_PATTERN.match(tag):
+        return [ValidationIssue(
+            node,
+            f"Component names must be lowercase with hyphen: '{tag}' → 'my-component'",
+            severity='error'
+        )]
+
+
+@DEFAULT_RULES.rule('animation-gpu', fields=('attributes.animate',))
+def check_animation(node, attrs):
+    """Warn if animate is defined but might not use GPU"""
+    if attrs['animate']:
+        return [ValidationIssue(
+            node,
+            "Animation detected. Ensure you use 'transform' and 'opacity' "
+            "for GPU acceleration. Avoid animating 'left', 'top', 'width', 'height'.",
+            severity='warning'
+        )]
+
+
+@DEFAULT_RULES.rule('call-trigger', fields=('attributes.⚡-call-when',))
+def check_call_trigger(node, attrs):
+    """Lazy API call triggers need a call and a known trigger"""
+    trigger = attrs['⚡-call-when']
+    if trigger is None:
+        return None
+    if '⚡-call' not in attrs:
+        return [ValidationIssue(
+            node,
+            "'⚡-call-when' has no effect without '⚡-call'.",
+            severity='warning'
+        )]
+    if str(trigger) not in CALL_TRIGGERS:
+        return [ValidationIssue(
+            node,
+            f"Invalid '⚡-call-when' value '{trigger}'. "
+            f"Use one of: {', '.join(CALL_TRIGGERS)}.",
+            severity='error'
+        )]
+
+
+@DEFAULT_RULES.rule('cache-ttl', fields=('attributes.⚡-cache',))
+def check_cache_ttl(node, attrs):
+    """Client-side cache TTLs are seconds, on elements with a call"""
+    ttl = attrs['⚡-cache']
+    try:
+        valid_ttl = float(ttl) >= 0
+    except (TypeError, ValueError):
+        valid_ttl = False
     
-    def __init__(
-        self,
-        node: Dict[str, Any],
-        message: str,
-        severity: str = 'error',
-        line: Optional[int] = None
-    ):
-        self.node = node
-        self.message = message
-        self.severity = severity  # 'error' or 'warning'
-        self.line = line or node.get('meta', {}).get('line', 0)
+    if '⚡-call' not in attrs:
+        return [ValidationIssue(
+            node,
+            "'⚡-cache' has no effect without '⚡-call'.",
+            severity='warning'
+        )]
+    if not valid_ttl:
+        return [ValidationIssue(
+            node,
+            f"Invalid '⚡-cache' value '{ttl}'. Use a number of seconds, e.g. ⚡-cache: 60.",
+            severity='error'
+        )]
+
+
+@DEFAULT_RULES.rule('layout-property', fields=('attributes.style',))
+def check_layout_properties(node, attrs):
+    """Inline styles that set layout properties (by name, not substring)"""
+    style = attrs['style']
+    if isinstance(style, dict):
+        declared = {str(prop).strip().lower() for prop in style}
+    elif isinstance(style, str):
+        declared = {
+            declaration.split(':', 1)[0].strip().lower()
+            for declaration in style.split(';') if ':' in declaration
+        }
+    else:
+        return None
     
-    def __repr__(self):
-        return f"<{self.severity.upper()}: {self.message}>"
+    return [
+        ValidationIssue(
+            node,
+            f"Animating '{prop}' causes layout recalculation. "
+            f"Use 'transform' instead for better performance.",
+            severity='warning'
+        )
+        for prop in LAYOUT_PROPERTIES if prop in declared
+    ]
+
+
+@DEFAULT_RULES.rule('endpoint-path', fields=('attributes.⚡-call',))
+def check_endpoint(node, attrs):
+    """
+    Backend call endpoints are names, not paths. Dynamic data (⚡-data)
+    needs no check: the runtime inserts it with textContent and the HTML
+    generator escapes it
+    """
+    endpoint = attrs['⚡-call']
+    if isinstance(endpoint, dict):
+        endpoint = endpoint.get('endpoint', '')
+    endpoint = str(endpoint)
+    
+    # Check for suspicious patterns
+    if any(char in endpoint for char in ['..', '/', '\\']):
+        return [ValidationIssue(
+            node,
+            f"Backend endpoint '{endpoint}' contains suspicious characters. "
+            f"Ensure this is intentional.",
+            severity='warning'
+        )]
+
+
+@DEFAULT_RULES.rule('long-text', fields=('value',), node_type='Text')
+def check_text_length(node, attrs):
+    """Extremely long text might be a paste error"""
+    text = node['value']
+    if len(text) > 10000:
+        return [ValidationIssue(
+            node,
+            f"Text content is extremely long ({len(text)} chars). "
+            f"Consider moving to external content.",
+            severity='warning'
+        )]
 
 
 class SemanticValidator:
@@ -33,35 +208,90 @@ class SemanticValidator:
     - Performance anti-patterns
     - Security issues
     - Component naming conventions
+    
+    Each node only runs the rules that apply to its tag and check a field
+    it has. With profile_rules=True, rule_costs records the calls, time
+    and issues of every rule that ran.
     """
     
-    # Valid identifier pattern (JavaScript-compatible)
-    IDENTIFIER_PATTERN = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_-]*$')
+    IDENTIFIER_PATTERN = IDENTIFIER_PATTERN
+    COMPONENT_PATTERN = COMPONENT_PATTERN
+    CALL_TRIGGERS = CALL_TRIGGERS
     
-    # Component name pattern (must have hyphen)
-    COMPONENT_PATTERN = re.compile(r'^[a-z]+-[a-z-]+$')
+    # Smallest document (element and text nodes) that validate(jobs=N)
+    # splits across processes. Starting a pool takes ~50ms and the default
+    # rules take a few µs a node, so smaller documents validate faster serially
+    PARALLEL_MIN_NODES = 20000
     
-    def __init__(self, ast: Dict[str, Any], filename: str):
+    def __init__(
+        self,
+        ast: Dict[str, Any],
+        filename: str,
+        rules: Optional[RuleRegistry] = None,
+        profile_rules: bool = False
+    ):
         self.ast = ast
         self.filename = filename
+        self.rules = rules if rules is not None else DEFAULT_RULES
         self.errors: List[ValidationIssue] = []
         self.warnings: List[ValidationIssue] = []
+        self.elements_visited = 0
+        self.text_nodes_visited = 0
+        self.rule_costs: Optional[Dict[str, RuleProfile]] = {} if profile_rules else None
     
-    def validate(self) -> bool:
+    def validate(
+        self,
+        report: bool = False,
+        jobs: int = 1,
+        executor: Optional[Executor] = None,
+        previous: Optional['SemanticValidator'] = None,
+        changed: Optional[Iterable[Dict[str, Any]]] = None
+    ) -> bool:
         """
         Run all validation checks.
         Returns True if valid, False if errors found.
         Warnings don't prevent compilation.
+        Issues are in self.errors and self.warnings; with report=True they
+        are also printed. The AST is only read, never modified.
+        
+        With jobs > 1, documents of PARALLEL_MIN_NODES or more have their
+        top-level subtrees validated in a pool of that many processes,
+        started for this call; or pass a ProcessPoolExecutor to reuse one.
+        Custom rules then have to be picklable (module-level functions).
+        
+        previous is a validator that ran on an earlier version of this
+        document. Subtrees equal to their counterpart in it, and nodes
+        equal apart from their children and position, get its issues again
+        without running the rules; changed lists nodes of this AST whose
+        subtrees are known to differ, to validate them without comparing.
+        The issues are the same as a full validation's, provided rules only
+        look at their own node and not at its descendants, as the default
+        rules do. jobs is then ignored.
         """
-        self._walk_ast(self.ast)
+        with tracing.span('htmlxify.validate', filename=self.filename) as span:
+            partitions = [] if previous is not None else self._partition(jobs, executor)
+            if previous is not None:
+                self._validate_incremental(previous, changed)
+            elif partitions:
+                self._validate_parallel(partitions, jobs, executor)
+            else:
+                self._walk_ast(self.ast)
+            if span.recording:
+                span.set_attributes({
+                    'nodes': count_nodes(self.ast),
+                    'errors': len(self.errors),
+                    'warnings': len(self.warnings),
+                    'partitions': len(partitions) or 1,
+                })
         
         # Report issues
         if self.errors:
-            self._report_issues('ERRORS', self.errors)
+            if report:
+                self._report_issues(self.errors)
             return False
         
-        if self.warnings:
-            self._report_issues('WARNINGS', self.warnings)
+        if self.warnings and report:
+            self._report_issues(self.warnings)
         
         return True
     
@@ -70,139 +300,342 @@ class SemanticValidator:
         if not isinstance(node, dict):
             return
         
-        # Validate this node
-        if node.get('type') == 'Element':
-            self._validate_element(node)
-        elif node.get('type') == 'Text':
-            self._validate_text(node)
+        self._check_node(node)
         
         # Recurse into children
         for child in node.get('children', []):
             self._walk_ast(child)
     
-    def _validate_element(self, node: Dict[str, Any]):
-        """Validate element node"""
-        
-        # 1. Validate ID (NO EMOJIS)
-        element_id = node.get('id')
-        if element_id:
-            if not self.IDENTIFIER_PATTERN.match(element_id):
-                self.errors.append(ValidationIssue(
-                    node,
-                    f"Invalid ID '{element_id}'. "
-                    f"Use only alphanumeric characters, hyphens, and underscores. "
-                    f"Emojis are NOT allowed in identifiers.",
-                    severity='error'
-                ))
-        
-        # 2. Validate class names
-        for cls in node.get('classes', []):
-            if not self.IDENTIFIER_PATTERN.match(cls):
-                self.errors.append(ValidationIssue(
-                    node,
-                    f"Invalid class name '{cls}'. "
-                    f"No emojis or special characters allowed.",
-                    severity='error'
-                ))
+    def _check_node(self, node: Dict[str, Any]):
+        """Run the rules that apply to one node"""
+        node_type = node.get('type')
+        if node_type in ('Element', 'Text'):
+            if node_type == 'Element':
+                self.elements_visited += 1
+            else:
+                self.text_nodes_visited += 1
+            
+            attrs = node.get('attributes') or {}
+            rules = self.rules.table(node_type, node.get('tag')).select(node, attrs)
+            if self.rule_costs is not None:
+                for rule in rules:
+                    self._run_rule_timed(rule, node, attrs)
+            else:
+                for rule in rules:
+                    for issue in rule.check(node, attrs) or ():
+                        self._file_issue(issue, rule)
+    
+    def _validate_incremental(
+        self,
+        previous: 'SemanticValidator',
+        changed: Optional[Iterable[Dict[str, Any]]]
+    ):
+        """Validate against a previous validation of the same document"""
+        cached: Dict[int, List[ValidationIssue]] = {}
+        for issue in previous.errors + previous.warnings:
+            cached.setdefault(id(issue.node), []).append(issue)
+        holders: set = set()
+        if cached:
+            _collect_holders(previous.ast, cached, holders)
+        changed_ids = {id(node) for node in changed or ()}
+        self._walk_changes(self.ast, previous.ast, cached, holders, changed_ids)
+    
+    def _walk_changes(
+        self,
+        node: Any,
+        old: Any,
+        cached: Dict[int, List[ValidationIssue]],
+        holders: set,
+        changed: set
+    ):
+        """
+        Walk node like _walk_ast, alongside old, its counterpart in the
+        previous AST (None for new nodes). Issues are filed in the same
+        order as a full walk, reused ones included.
+        """
+        if not isinstance(node, dict):
+            return
+        if not isinstance(old, dict) or id(node) in changed:
+            self._walk_ast(node)
+            return
+        # Whole subtrees, positions included, compare at C speed; nodes
+        # after an edit that added or removed lines only match one by one
+        if node == old:
+            self._reuse_subtree(node, old, cached, holders)
+            return
         
-        # 3. Check component naming
-        tag = node.get('tag', '')
-        if 'component' in tag.lower() or '-' in tag:
-            # This is a custom component
-            if not self.COMPONENT_PATTERN.match(tag):
-                self.errors.append(ValidationIssue(
-                    node,
-                    f"Component names must be lowercase with hyphen: '{tag}' → 'my-component'",
-                    severity='error'
-                ))
+        if node.get('type') in ('Element', 'Text'):
+            if _same_node(node, old):
+                self._reuse_issues(node, old, cached)
+            else:
+                self._check_node(node)
         
-        # 4. Performance warnings
-        self._check_performance(node)
+        children = node.get('children')
+        if children:
+            counterparts = _counterparts(old.get('children') or [], children)
+            for child, counterpart in zip(children, counterparts):
+                self._walk_changes(child, counterpart, cached, holders, changed)
+    
+    def _reuse_subtree(self, node: Any, old: Any, cached: Dict[int, List[ValidationIssue]], holders: set):
+        """File the issues of old's subtree again, on the same nodes of node's"""
+        if id(old) not in holders:
+            return
+        self._reuse_issues(node, old, cached)
+        for child, old_child in zip(node.get('children') or (), old.get('children') or ()):
+            self._reuse_subtree(child, old_child, cached, holders)
+    
+    def _reuse_issues(self, node: Dict[str, Any], old: Dict[str, Any], cached: Dict[int, List[ValidationIssue]]):
+        """File old's issues again, on node and moved to its line"""
+        issues = cached.get(id(old))
+        if not issues:
+            return
+        shift = _node_line(node) - _node_line(old)
+        old_column = (old.get('meta') or {}).get('column', 0)
+        for issue in issues:
+            line = issue.line + shift if issue.line else None
+            column = None if issue.column == old_column else issue.column
+            reused = ValidationIssue(
+                node, issue.message, issue.severity, line, issue.rule, column, self.filename
+            )
+            if reused.severity == 'error':
+                self.errors.append(reused)
+            else:
+                self.warnings.append(reused)
+    
+    def _partition(self, jobs: int, executor: Optional[Executor]) -> List[Tuple[int, int]]:
+        """
+        Ranges of top-level children to validate in parallel, balanced by
+        node count; none when the document should be validated serially
+        """
+        if jobs <= 1 and executor is None:
+            return []
+        children = self.ast.get('children')
+        if self.ast.get('type') in ('Element', 'Text') or not children:
+            return []
+        sizes = [count_nodes(child) for child in children]
+        total = sum(sizes)
+        if total < self.PARALLEL_MIN_NODES:
+            return []
         
-        # 5. Security checks
-        self._check_security(node)
+        # A few ranges per worker, so one large subtree doesn't leave the
+        # others idle
+        target = total / (max(jobs, 2) * 4)
+        partitions = []
+        start = filled = 0
+        for index, size in enumerate(sizes):
+            filled += size
+            if filled >= target:
+                partitions.append((start, index + 1))
+                start, filled = index + 1, 0
+        if start < len(children):
+            partitions.append((start, len(children)))
+        return partitions if len(partitions) > 1 else []
     
-    def _check_performance(self, node: Dict[str, Any]):
-        """Check for performance anti-patterns"""
-        attrs = node.get('attributes', {})
+    def _validate_parallel(
+        self,
+        partitions: List[Tuple[int, int]],
+        jobs: int,
+        executor: Optional[Executor]
+    ):
+        """Validate each range in a worker process and merge in order"""
+        children = self.ast['children']
+        rules = None if self.rules is DEFAULT_RULES else self.rules  # Workers import their own
+        profile = self.rule_costs is not None
+        starts, ends = zip(*partitions)
         
-        # Check if animating non-GPU properties
-        animate = attrs.get('animate')
-        if animate:
-            # Warn if animate is defined but might not use GPU
-            self.warnings.append(ValidationIssue(
-                node,
-                "Animation detected. Ensure you use 'transform' and 'opacity' "
-                "for GPU acceleration. Avoid animating 'left', 'top', 'width', 'height'.",
-                severity='warning'
+        if executor is None:
+            # The children reach each worker once, through the initializer;
+            # where processes fork they aren't even pickled
+            with ProcessPoolExecutor(
+                jobs,
+                initializer=_init_partition_worker,
+                initargs=(children, self.filename, rules, profile)
+            ) as pool:
+                results = list(pool.map(_validate_range, starts, ends))
+        else:
+            results = list(executor.map(
+                _validate_subtrees,
+                [children[start:end] for start, end in partitions],
+                starts,
+                repeat(self.filename),
+                repeat(rules),
+                repeat(profile)
             ))
         
-        # Check inline styles for bad properties
-        style = attrs.get('style', '')
-        bad_props = ['left', 'top', 'width', 'height']
-        
-        if isinstance(style, str):
-            for prop in bad_props:
-                if prop in style.lower():
-                    self.warnings.append(ValidationIssue(
-                        node,
-                        f"Animating '{prop}' causes layout recalculation. "
-                        f"Use 'transform' instead for better performance.",
-                        severity='warning'
-                    ))
-    
-    def _check_security(self, node: Dict[str, Any]):
-        """Check security issues"""
-        attrs = node.get('attributes', {})
-        
-        # Mark nodes with dynamic data for sanitization
-        if '⚡-data' in attrs:
-            node['_needs_sanitization'] = True
-            data_attr = attrs['⚡-data']
-            if isinstance(data_attr, dict):
-                data_attr = data_attr.get('key', 'unknown')
-            node['_sanitize_key'] = str(data_attr)
+        for result in results:
+            self._merge_partition(result)
+    
+    def _merge_partition(self, result: Tuple):
+        """Add one worker's issues, node counts and rule costs"""
+        issues, elements_visited, text_nodes_visited, rule_costs = result
+        for path, node, message, severity, line, column, rule_id in issues:
+            if path is not None:
+                node = self.ast
+                for index in path:
+                    node = node['children'][index]
+            issue = ValidationIssue(node, message, severity, line, rule_id, column, self.filename)
+            if severity == 'error':
+                self.errors.append(issue)
+            else:
+                self.warnings.append(issue)
         
-        # Validate backend call endpoints
-        if '⚡-call' in attrs:
-            endpoint = attrs['⚡-call']
-            if isinstance(endpoint, dict):
-                endpoint = endpoint.get('endpoint', '')
-            endpoint = str(endpoint)
-            
-            # Check for suspicious patterns
-            if any(char in endpoint for char in ['..', '/', '\\']):
-                self.warnings.append(ValidationIssue(
-                    node,
-                    f"Backend endpoint '{endpoint}' contains suspicious characters. "
-                    f"Ensure this is intentional.",
-                    severity='warning'
-                ))
-    
-    def _validate_text(self, node: Dict[str, Any]):
-        """Validate text node"""
-        text = node.get('value', '')
+        self.elements_visited += elements_visited
+        self.text_nodes_visited += text_nodes_visited
+        if self.rule_costs is not None:
+            for rule_id, (calls, wall, issue_count) in rule_costs.items():
+                cost = self.rule_costs.get(rule_id)
+                if cost is None:
+                    cost = self.rule_costs[rule_id] = RuleProfile(rule_id)
+                cost.calls += calls
+                cost.wall += wall
+                cost.issues += issue_count
+    
+    def _run_rule_timed(self, rule: Rule, node: Dict[str, Any], attrs: Dict[str, Any]):
+        """Run one rule on a node, adding its cost to rule_costs"""
+        started = time.perf_counter()
+        issues = list(rule.check(node, attrs) or ())
+        cost = self.rule_costs.get(rule.id)
+        if cost is None:
+            cost = self.rule_costs[rule.id] = RuleProfile(rule.id)
+        cost.calls += 1
+        cost.wall += time.perf_counter() - started
+        cost.issues += len(issues)
         
-        # Check for extremely long text (might be a paste error)
-        if len(text) > 10000:
-            self.warnings.append(ValidationIssue(
-                node,
-                f"Text content is extremely long ({len(text)} chars). "
-                f"Consider moving to external content.",
-                severity='warning'
-            ))
+        for issue in issues:
+            self._file_issue(issue, rule)
+    
+    def _file_issue(self, issue: ValidationIssue, rule: Rule):
+        """Add an issue to errors or warnings, tagged with its rule"""
+        issue.rule = issue.rule or rule.id
+        issue.filename = issue.filename or self.filename
+        if issue.severity == 'error':
+            self.errors.append(issue)
+        else:
+            self.warnings.append(issue)
     
-    def _report_issues(self, category: str, issues: List[ValidationIssue]):
+    def _report_issues(self, issues: List[ValidationIssue]):
         """Pretty-print validation issues"""
-        symbol = '❌' if category == 'ERRORS' else '⚠️ '
-        
-        print(f"\n{symbol} {category} in {self.filename}:\n")
-        
-        for i, issue in enumerate(issues, 1):
-            print(f"{i}. {issue.message}")
-            if issue.line:
-                print(f"   Line: {issue.line}")
-            print()
+        print('\n' + format_text(issues, self.filename))
+
+
+def _node_line(node: Dict[str, Any]) -> int:
+    return (node.get('meta') or {}).get('line') or 0
+
+
+def _collect_holders(node: Any, cached: Dict[int, List[ValidationIssue]], holders: set) -> bool:
+    """Add the ids of node and its descendants whose subtrees have cached issues"""
+    found = id(node) in cached
+    for child in node.get('children') or ():
+        if not isinstance(child, dict):
+            continue
+        if child.get('children'):
+            found = _collect_holders(child, cached, holders) or found
+        elif id(child) in cached:  # Leaves inline: most nodes are leaves
+            holders.add(id(child))
+            found = True
+    if found:
+        holders.add(id(node))
+    return found
+
+
+def _same_node(node: Dict[str, Any], old: Dict[str, Any]) -> bool:
+    """
+    Whether a node would get the same issues as old: equal fields,
+    ignoring meta (its position) and what its children contain
+    """
+    if node.keys() != old.keys():
+        return False
+    for key, value in node.items():
+        if key == 'children':
+            if len(value or ()) != len(old[key] or ()):
+                return False
+        elif key != 'meta' and value != old[key]:
+            return False
+    return True
+
+
+def _counterparts(old: List[Any], new: List[Any]) -> List[Any]:
+    """
+    The old child each new child most likely came from, or None. Unchanged
+    runs at the start and end line up; children between them pair by
+    position, so an edited element's unchanged descendants still match.
+    """
+    if len(old) == len(new):
+        return old
+    
+    def same(a, b):
+        return isinstance(a, dict) and isinstance(b, dict) and _same_node(a, b)
+    
+    size = min(len(old), len(new))
+    start = 0
+    while start < size and same(new[start], old[start]):
+        start += 1
+    end = 0
+    while end < size - start and same(new[-1 - end], old[-1 - end]):
+        end += 1
+    
+    paired = min(len(new), len(old)) - start - end
+    inserted = len(new) - start - end - paired
+    return old[:start + paired] + [None] * inserted + old[len(old) - end:]
+
+
+# Parallel validation workers. A pool started by validate() gets the
+# document's top-level children once, in its initializer, and is then sent
+# ranges of them; a caller's executor is sent the subtrees themselves.
+_partition_source: Optional[Tuple] = None
+
+
+def _init_partition_worker(children, filename, rules, profile_rules):
+    global _partition_source
+    _partition_source = (children, filename, rules, profile_rules)
+
+
+def _validate_range(start: int, end: int) -> Tuple:
+    children, filename, rules, profile_rules = _partition_source
+    return _validate_subtrees(children[start:end], start, filename, rules, profile_rules)
+
+
+def _validate_subtrees(
+    subtrees: List[Dict[str, Any]],
+    offset: int,
+    filename: str,
+    rules: Optional[RuleRegistry],
+    profile_rules: bool
+) -> Tuple:
+    """
+    Validate top-level subtrees offset, offset + 1, ... of a document.
+    Issues come back as plain tuples in walk order, with the path of child
+    indexes from the document root to their node instead of the node.
+    """
+    validator = SemanticValidator(
+        {'type': 'Root', 'children': subtrees}, filename, rules, profile_rules
+    )
+    validator._walk_ast(validator.ast)
+    
+    # errors and warnings are each in walk order; the parent keeps them apart
+    found = validator.errors + validator.warnings
+    paths: Dict[int, Tuple[int, ...]] = {}
+    wanted = {id(issue.node) for issue in found}
+    stack = [((offset + index,), node) for index, node in enumerate(subtrees)]
+    while stack and len(paths) < len(wanted):
+        path, node = stack.pop()
+        if id(node) in wanted:
+            paths[id(node)] = path
+        if isinstance(node, dict):
+            stack.extend((path + (index,), child) for index, child in enumerate(node.get('children', [])))
+    
+    issues = []
+    for issue in found:
+        path = paths.get(id(issue.node))
+        # A node that isn't in the tree travels as itself
+        node = issue.node if path is None else None
+        issues.append((path, node, issue.message, issue.severity, issue.line, issue.column, issue.rule))
+    
+    rule_costs = {
+        rule_id: (cost.calls, cost.wall, cost.issues)
+        for rule_id, cost in (validator.rule_costs or {}).items()
+    }
+    return issues, validator.elements_visited, validator.text_nodes_visited, rule_costs
 
 
 # Test
@@ -236,6 +669,6 @@ if __name__ == '__main__':
     }
     
     validator = SemanticValidator(test_ast, 'test.htmlxify')
-    result = validator.validate()
+    result = validator.validate(report=True)
     
     print(f"\nValidation result: {'✅ PASSED' if result else '❌ FAILED'}")
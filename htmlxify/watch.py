@@ -0,0 +1,153 @@
+"""
+Watch - Recompiles pages as their sources change
+
+Used by `htmlxify watch src/ dist/`. One long-running process keeps the
+parser and caches warm and recompiles only the pages that changed, through
+the incremental build (see build.py). Changes are found by polling file
+stamps; if the optional `watchdog` package is installed, its filesystem
+events wake the watcher instead of waiting for the next poll. Bursts of
+editor saves are debounced into one rebuild.
+"""
+
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional, Set, Tuple
+
+from htmlxify.build import SOURCE_SUFFIX, build, find_sources, warm_parser
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # Optional: fall back to polling
+    Observer = None
+    FileSystemEventHandler = object
+
+
+class _WakeHandler(FileSystemEventHandler):
+    """Wakes the watcher on any event for a source file"""
+    
+    def __init__(self, wake: threading.Event):
+        self.wake = wake
+    
+    def on_any_event(self, event):
+        paths = [getattr(event, 'src_path', ''), getattr(event, 'dest_path', '')]
+        if any(str(path).endswith(SOURCE_SUFFIX) for path in paths):
+            self.wake.set()
+
+
+class Watcher:
+    """
+    Watches a source tree and rebuilds changed pages into out_dir.
+    
+    interval is the polling period in seconds and debounce the quiet period
+    a burst of changes must settle for before rebuilding. on_result is
+    called with each compiled page's result; after a change, results also
+    carry 'latency': seconds from the source file's last write to its
+    outputs being written.
+    """
+    
+    def __init__(
+        self,
+        src_dir: str,
+        out_dir: str,
+        options: Optional[Dict[str, Any]] = None,
+        interval: float = 0.5,
+        debounce: float = 0.1,
+        use_watchdog: bool = True,
+        on_result: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        self.src = Path(src_dir)
+        self.out = Path(out_dir)
+        self.options = options or {}
+        self.interval = interval
+        self.debounce = debounce
+        self.on_result = on_result
+        self.use_watchdog = use_watchdog and Observer is not None
+        self.stamps: Dict[str, Tuple[int, int]] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+    
+    @property
+    def mode(self) -> str:
+        """'watchdog' or 'polling'"""
+        return 'watchdog' if self.use_watchdog else 'polling'
+    
+    def snapshot(self) -> Dict[str, Tuple[int, int]]:
+        """(mtime_ns, size) of every source file, keyed by relative path"""
+        stamps = {}
+        for rel_path in find_sources(self.src):
+            try:
+                stat = (self.src / rel_path).stat()
+            except OSError:  # Deleted while scanning
+                continue
+            stamps[rel_path.as_posix()] = (stat.st_mtime_ns, stat.st_size)
+        return stamps
+    
+    def poll(self) -> Set[str]:
+        """Sources added, changed or deleted since the last poll"""
+        stamps = self.snapshot()
+        changed = {
+            path for path in stamps.keys() | self.stamps.keys()
+            if stamps.get(path) != self.stamps.get(path)
+        }
+        self.stamps = stamps
+        return changed
+    
+    def wait_for_changes(self) -> Set[str]:
+        """Block until sources change and then stay quiet for the debounce period"""
+        changed: Set[str] = set()
+        while not self._stop.is_set():
+            self._wake.wait(self.debounce if changed else self.interval)
+            self._wake.clear()
+            
+            new = self.poll()
+            if new:
+                changed |= new
+            elif changed:
+                return changed
+        return changed
+    
+    def rebuild(self, paths: Optional[Set[str]] = None) -> List[Dict[str, Any]]:
+        """Build the given sources (all of them when None) in this process"""
+        def finished(result):
+            stamp = self.stamps.get(result['source'])
+            if stamp and paths is not None:
+                result['latency'] = time.time() - stamp[0] / 1e9
+            if self.on_result:
+                self.on_result(result)
+        
+        return build(
+            str(self.src), str(self.out), self.options,
+            jobs=1, on_result=finished, paths=paths
+        )
+    
+    def start(self) -> List[Dict[str, Any]]:
+        """Warm the parser, take the first snapshot and bring the output up to date"""
+        warm_parser()
+        self.stamps = self.snapshot()
+        return self.rebuild()
+    
+    def run(self):
+        """Start, then rebuild on every change until stop() is called"""
+        observer = None
+        if self.use_watchdog:
+            observer = Observer()
+            observer.schedule(_WakeHandler(self._wake), str(self.src), recursive=True)
+            observer.start()
+        
+        try:
+            self.start()
+            while not self._stop.is_set():
+                changed = self.wait_for_changes()
+                if changed:
+                    self.rebuild(changed)
+        finally:
+            if observer:
+                observer.stop()
+                observer.join()
+    
+    def stop(self):
+        """Stop run() after the current rebuild"""
+        self._stop.set()
+        self._wake.set()
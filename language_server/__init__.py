@@ -0,0 +1,9 @@
+"""
+htmlxify Language Server
+    
+    htmlxify-lsp
+
+server.py serves LSP over stdio with pygls; worker.py analyzes open
+documents on a background thread, and analysis.py parses and validates
+each one incrementally. See README.md.
+"""
@@ -0,0 +1,3 @@
+from language_server.server import start_server
+
+start_server()
@@ -0,0 +1,348 @@
+"""
+Analysis - Parse and validate one open document, incrementally
+    
+    document = DocumentAnalysis('page.htmlxify')
+    issues = document.update(source)   # First version: parsed whole
+    issues = document.update(edited)   # Later ones: only the edited element
+
+Parsing dominates analysis (the Earley parser takes about 1.5 ms a line),
+so an update only reparses the source of the smallest element around the
+edit. The edit is found by comparing the new source with the last one that
+parsed; the element's new text is parsed alone and spliced into a copy of
+the last AST, shifting the positions of everything after it. If the text
+no longer parses as one element, its parent is tried, and so on up to the
+run of top-level elements the edit touches. Top-level elements parse
+independently, so that run's errors are the document's errors.
+
+The new AST is validated against the last validation (see
+SemanticValidator.validate's previous), so untouched subtrees reuse their
+issues. While the source doesn't parse, the last AST stays the baseline:
+the parse error is reported with the last issues outside the edit.
+"""
+
+import bisect
+import copy
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from htmlxify.diagnostics import ValidationIssue, parse_error
+from htmlxify.parser.ast_builder import ASTBuilder
+from htmlxify.parser.indent_processor import IndentationProcessor
+from htmlxify.validator.semantic import SemanticValidator
+
+
+# Source with nothing to parse: whitespace and comments (start needs an element)
+BLANK = re.compile(r'(?:\s|//[^\n]*)*\Z')
+
+# Where an element's head (tag.class#id) ends
+HEAD_END = re.compile(r'[({]')
+
+
+class AnalysisCancelled(Exception):
+    """A newer version of the document arrived; the rest of the analysis was skipped"""
+
+
+class ParseFailure(Exception):
+    """The edited source doesn't parse; issue is the error, in document positions"""
+    
+    def __init__(self, issue: ValidationIssue):
+        super().__init__(issue.message)
+        self.issue = issue
+
+
+class Edit:
+    """
+    The span of source that changed between two versions: old[start:old_end]
+    became new[start:new_end]. Maps positions after it to the new source.
+    """
+    
+    def __init__(self, start: int, old_end: int, new_end: int, old_lines: List[int], new_lines: List[int]):
+        self.start = start
+        self.old_end = old_end
+        self.new_end = new_end
+        self.delta = new_end - old_end
+        self.line, self.column = _position(old_lines, old_end)
+        new_line, new_column = _position(new_lines, new_end)
+        self.line_delta = new_line - self.line
+        self.column_delta = new_column - self.column
+    
+    def shift(self, line: int, column: int) -> Tuple[int, int]:
+        """New position of an old one at or after the edit's end"""
+        if line == self.line:
+            column += self.column_delta
+        return line + self.line_delta, column
+    
+    def shift_node(self, node: Dict[str, Any]) -> Dict[str, Any]:
+        """A node after the edit, moved to its new position (shared if it doesn't move)"""
+        meta = node.get('meta') or {}
+        if not self.line_delta and meta.get('line', 0) > self.line:
+            return node  # It and its subtree are on later lines, which kept their numbers
+        moved = dict(node)
+        moved['meta'] = self.shift_meta(meta)
+        if 'children' in node:
+            moved['children'] = [self.shift_node(child) for child in node['children']]
+        return moved
+    
+    def shift_meta(self, meta: Dict[str, Any], start: bool = True) -> Dict[str, Any]:
+        """meta with its end (and, if start, its start) moved past the edit"""
+        meta = dict(meta)
+        keys = (('line', 'column'), ('end_line', 'end_column')) if start else (('end_line', 'end_column'),)
+        for line_key, column_key in keys:
+            if line_key in meta:
+                meta[line_key], meta[column_key] = self.shift(meta[line_key], meta[column_key])
+        return meta
+
+
+class DocumentAnalysis:
+    """
+    The parse and validation of one document, updated version by version.
+    Not thread-safe: one thread updates it (see worker.AnalysisWorker).
+    """
+    
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.source: Optional[str] = None          # Last version that parsed
+        self.ast: Optional[Dict[str, Any]] = None  # Its Document, before indentation
+        self.validator: Optional[SemanticValidator] = None  # Last validation, the baseline for the next
+        self.issues: List[ValidationIssue] = []    # Diagnostics of the last update
+        self.parsed_chars = 0                      # Source the last update parsed
+        self._lines: List[int] = []                # Offsets where the source's lines start
+        self._validated: Optional[Dict[str, Any]] = None  # The AST self.validator ran on
+    
+    def update(self, source: str, cancelled: Optional[threading.Event] = None) -> List[ValidationIssue]:
+        """
+        Analyze a new version of the document; returns its errors, then warnings.
+        Once cancelled is set, the remaining stages are skipped and
+        AnalysisCancelled is raised. A finished parse is kept either way,
+        so the next update starts from it.
+        """
+        _check(cancelled)
+        lines = _line_starts(source)
+        changed = None
+        self.parsed_chars = 0
+        if self.ast is None:
+            try:
+                ast = self._parse(source, lines, 0, len(source))
+            except ParseFailure as failure:
+                self.issues = [failure.issue]
+                return self.issues
+            self.source, self.ast, self._lines = source, ast, lines
+        elif source != self.source:
+            edit = Edit(*_edit_span(self.source, source), self._lines, lines)
+            try:
+                self.ast, changed = self._reparse(source, lines, edit, cancelled)
+            except ParseFailure as failure:
+                self.issues = [failure.issue] + self._carried_issues(edit)
+                return self.issues
+            self.source, self._lines = source, lines
+        
+        if self._validated is not self.ast:
+            _check(cancelled)
+            validator = SemanticValidator(IndentationProcessor().process(self.ast), self.filename)
+            validator.validate(previous=self.validator, changed=changed)
+            self.validator, self._validated = validator, self.ast
+        self.issues = self.validator.errors + self.validator.warnings
+        return self.issues
+    
+    def _reparse(
+        self,
+        source: str,
+        lines: List[int],
+        edit: Edit,
+        cancelled: Optional[threading.Event]
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """The new AST, and the nodes that were parsed again"""
+        # Elements around the edit, outermost first
+        path: List[Tuple[List[Dict[str, Any]], int]] = []
+        siblings = self.ast['children']
+        while True:
+            index = self._enclosing(siblings, edit)
+            if index is None:
+                break
+            path.append((siblings, index))
+            siblings = siblings[index]['children']
+        
+        # Nested elements, innermost first: their new text must be one element.
+        # The edit spares their head (up to the first "(" or "{"), so text
+        # before them stops where it did, and their last character, so they
+        # still end in ")" or "}"
+        for depth in range(len(path) - 1, 0, -1):
+            _check(cancelled)
+            siblings, index = path[depth]
+            start, end = self._span(siblings[index])
+            try:
+                parsed = self._parse(source, lines, start, end + edit.delta)
+            except ParseFailure:
+                continue
+            if len(parsed['children']) == 1:
+                return self._splice(path[:depth], parsed['children'], index, index + 1, edit), parsed['children']
+        
+        # The run of top-level elements the edit touches, and the gaps around it
+        _check(cancelled)
+        children = self.ast['children']
+        first = 0
+        while first < len(children) and self._span(children[first])[1] < edit.start:
+            first += 1
+        # An element without a body can take selectors, attributes or a body typed after it
+        while first and self.source[self._span(children[first - 1])[1] - 1] != '}':
+            first -= 1
+        last = first
+        while last < len(children) and (
+            self._span(children[last])[0] <= edit.old_end
+            or self._commented(source, self._span(children[last])[0] + edit.delta)
+        ):
+            last += 1
+        start = self._span(children[first - 1])[1] if first else 0
+        end = self._span(children[last])[0] if last < len(children) else len(self.source)
+        parsed = self._parse(source, lines, start, end + edit.delta)
+        return self._splice([], parsed['children'], first, last, edit), parsed['children']
+    
+    def _enclosing(self, siblings: List[Dict[str, Any]], edit: Edit) -> Optional[int]:
+        """Index of the element holding the whole edit between its head and its last character"""
+        for index, node in enumerate(siblings):
+            if node.get('type') != 'Element':
+                continue
+            start, end = self._span(node)
+            if start >= edit.start:
+                return None
+            if edit.old_end < end:
+                head = HEAD_END.search(self.source, start, end)
+                return index if head and head.start() < edit.start else None
+        return None
+    
+    @staticmethod
+    def _commented(source: str, offset: int) -> bool:
+        """Whether a comment may start before offset on its line (the edit may have added one)"""
+        return '//' in source[source.rfind('\n', 0, offset) + 1:offset]
+    
+    def _splice(
+        self,
+        path: List[Tuple[List[Dict[str, Any]], int]],
+        nodes: List[Dict[str, Any]],
+        first: int,
+        last: int,
+        edit: Edit
+    ) -> Dict[str, Any]:
+        """
+        A copy of the AST with the children first:last of the node at the
+        end of path replaced by nodes. Nodes before the edit are shared;
+        the path is copied, and nodes after the edit are moved.
+        """
+        def replaced(siblings: List[Dict[str, Any]], depth: int) -> List[Dict[str, Any]]:
+            if depth == len(path):
+                return siblings[:first] + nodes + [edit.shift_node(node) for node in siblings[last:]]
+            index = path[depth][1]
+            parent = dict(siblings[index])
+            parent['meta'] = edit.shift_meta(parent['meta'], start=False)
+            parent['children'] = replaced(parent['children'], depth + 1)
+            return siblings[:index] + [parent] + [edit.shift_node(node) for node in siblings[index + 1:]]
+        
+        document = dict(self.ast)
+        document['children'] = replaced(self.ast['children'], 0)
+        return document
+    
+    def _parse(self, source: str, lines: List[int], start: int, end: int) -> Dict[str, Any]:
+        """
+        Parse source[start:end] into a Document whose positions are in the
+        whole source. Raises ParseFailure, with the error positioned likewise.
+        """
+        text = source[start:end]
+        self.parsed_chars += len(text)
+        if BLANK.match(text):
+            return {'type': 'Document', 'children': [], 'meta': {}}
+        line, column = _position(lines, start)
+        try:
+            ast = ASTBuilder(text, self.filename).parse()
+        except Exception as e:
+            issue = parse_error(e, self.filename)
+            if issue.line:
+                issue.line, issue.column = _relocate(issue.line, issue.column or 1, line, column)
+            else:
+                issue.line, issue.column = _position(lines, end)
+            raise ParseFailure(issue) from e
+        if start:
+            for node in ast['children']:
+                _relocate_subtree(node, line, column)
+        return ast
+    
+    def _span(self, node: Dict[str, Any]) -> Tuple[int, int]:
+        """Source offsets of a node of the last AST (end exclusive)"""
+        meta = node['meta']
+        return (
+            self._lines[meta['line'] - 1] + meta['column'] - 1,
+            self._lines[meta['end_line'] - 1] + meta['end_column'] - 1,
+        )
+    
+    def _carried_issues(self, edit: Edit) -> List[ValidationIssue]:
+        """The last valid version's issues outside the edit, moved to the new source"""
+        if self.validator is None:
+            return []
+        start_line = _position(self._lines, edit.start)[0]
+        carried = []
+        for issue in self.validator.errors + self.validator.warnings:
+            if issue.line < start_line:
+                carried.append(issue)
+            elif issue.line > edit.line:
+                moved = copy.copy(issue)
+                moved.line += edit.line_delta
+                carried.append(moved)
+        return carried
+
+
+def _check(cancelled: Optional[threading.Event]):
+    if cancelled is not None and cancelled.is_set():
+        raise AnalysisCancelled()
+
+
+def _line_starts(source: str) -> List[int]:
+    return [0] + [match.end() for match in re.finditer('\n', source)]
+
+
+def _position(lines: List[int], offset: int) -> Tuple[int, int]:
+    """(line, column), 1-based, of a source offset"""
+    line = bisect.bisect_right(lines, offset)
+    return line, offset - lines[line - 1] + 1
+
+
+def _relocate(line: int, column: int, base_line: int, base_column: int) -> Tuple[int, int]:
+    """A position in text starting at (base_line, base_column), in the whole source"""
+    if line == 1:
+        column += base_column - 1
+    return line + base_line - 1, column
+
+
+def _relocate_subtree(node: Dict[str, Any], base_line: int, base_column: int):
+    meta = node.get('meta')
+    if meta:
+        meta['line'], meta['column'] = _relocate(meta['line'], meta['column'], base_line, base_column)
+        meta['end_line'], meta['end_column'] = _relocate(meta['end_line'], meta['end_column'], base_line, base_column)
+    for child in node.get('children', ()):
+        _relocate_subtree(child, base_line, base_column)
+
+
+def _edit_span(old: str, new: str) -> Tuple[int, int, int]:
+    """
+    (start, old_end, new_end) of the one span that differs between old
+    and new. Prefix and suffix are found by bisection on slices, which
+    compare in C.
+    """
+    limit = min(len(old), len(new))
+    prefix = _common_length(lambda lo, hi: old[lo:hi] == new[lo:hi], limit)
+    suffix = _common_length(
+        lambda lo, hi: old[len(old) - hi:len(old) - lo] == new[len(new) - hi:len(new) - lo],
+        limit - prefix
+    )
+    return prefix, len(old) - suffix, len(new) - suffix
+
+
+def _common_length(equal, limit: int) -> int:
+    """Largest n <= limit with equal(0, n), where equal(lo, hi) compares one range"""
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if equal(lo, mid):
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
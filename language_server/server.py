@@ -0,0 +1,132 @@
+"""
+Server - htmlxify Language Server (pygls)
+    
+    htmlxify-lsp                    # Speaks LSP on stdin/stdout
+    htmlxify-lsp --debounce-ms 300
+
+Documents sync incrementally: the client sends only the edited ranges and
+pygls applies them to its copy. The change handlers just hand the new
+version to an AnalysisWorker, which parses and validates it on its own
+thread once typing pauses, cancels analyses that a newer version has made
+stale, and publishes the SemanticValidator's issues as diagnostics.
+"""
+
+import argparse
+from typing import List, Optional
+
+from lsprotocol import types
+from pygls.server import LanguageServer
+from pygls.uris import to_fs_path
+
+from htmlxify.diagnostics import PARSE_ERROR_RULE, ValidationIssue
+from language_server.worker import DEFAULT_DEBOUNCE, AnalysisWorker
+
+
+SEVERITIES = {
+    'error': types.DiagnosticSeverity.Error,
+    'warning': types.DiagnosticSeverity.Warning,
+}
+
+
+def _version() -> str:
+    try:
+        from importlib.metadata import version
+        return version('htmlxify')
+    except Exception:
+        return 'dev'
+
+
+class HtmlxifyLanguageServer(LanguageServer):
+    """A LanguageServer that analyzes documents on an AnalysisWorker"""
+    
+    def __init__(self, debounce: float = DEFAULT_DEBOUNCE, **kwargs):
+        super().__init__('htmlxify-lsp', _version(), **kwargs)
+        self.worker = AnalysisWorker(self._publish, debounce, filename=lambda uri: to_fs_path(uri) or uri)
+    
+    def analyze(self, uri: str):
+        """Schedule the document's current version; returns at once"""
+        document = self.workspace.get_text_document(uri)
+        self.worker.schedule(uri, document.version, document.source)
+    
+    def _publish(self, uri: str, version: int, source: str, issues: List[ValidationIssue]):
+        # Called on the worker thread; the protocol belongs to the event loop
+        lines = None if source.isascii() else source.split('\n')
+        diagnostics = [to_diagnostic(issue, lines) for issue in issues]
+        self.loop.call_soon_threadsafe(self.publish_diagnostics, uri, diagnostics, version)
+
+
+def to_diagnostic(issue: ValidationIssue, lines: Optional[List[str]] = None) -> types.Diagnostic:
+    """
+    An issue as an LSP diagnostic. It covers the element's tag, the text,
+    or one character of a parse error. LSP columns count UTF-16 units:
+    pass the source's lines if it has characters outside ASCII.
+    """
+    line = max(issue.line - 1, 0)
+    start = max(issue.column - 1, 0)
+    node = issue.node
+    meta = node.get('meta') or {}
+    if node.get('type') == 'Element':
+        length = len(node.get('tag') or '') or 1
+    elif node.get('type') == 'Text' and meta.get('end_line') == meta.get('line'):
+        length = meta['end_column'] - meta['column']
+    else:
+        length = 1
+    end = start + length
+    
+    if lines is not None and line < len(lines):
+        start, end = _utf16(lines[line], start), _utf16(lines[line], end)
+    return types.Diagnostic(
+        range=types.Range(
+            start=types.Position(line=line, character=start),
+            end=types.Position(line=line, character=end),
+        ),
+        message=issue.message,
+        severity=SEVERITIES.get(issue.severity, types.DiagnosticSeverity.Information),
+        code=issue.rule,
+        source='htmlxify' if issue.rule != PARSE_ERROR_RULE else 'htmlxify parser',
+    )
+
+
+def _utf16(text: str, column: int) -> int:
+    """A character column as UTF-16 units"""
+    return column + sum(1 for char in text[:column] if ord(char) > 0xFFFF)
+
+
+server = HtmlxifyLanguageServer()
+
+
+@server.feature(types.TEXT_DOCUMENT_DID_OPEN)
+def did_open(ls: HtmlxifyLanguageServer, params: types.DidOpenTextDocumentParams):
+    ls.analyze(params.text_document.uri)
+
+
+@server.feature(types.TEXT_DOCUMENT_DID_CHANGE)
+def did_change(ls: HtmlxifyLanguageServer, params: types.DidChangeTextDocumentParams):
+    ls.analyze(params.text_document.uri)
+
+
+@server.feature(types.TEXT_DOCUMENT_DID_CLOSE)
+def did_close(ls: HtmlxifyLanguageServer, params: types.DidCloseTextDocumentParams):
+    ls.worker.close(params.text_document.uri)
+    ls.publish_diagnostics(params.text_document.uri, [])
+
+
+@server.feature(types.SHUTDOWN)
+def shutdown(ls: HtmlxifyLanguageServer, params):
+    ls.worker.stop(timeout=1)
+
+
+def start_server(argv=None):
+    """Entry point of htmlxify-lsp: serve over stdio"""
+    parser = argparse.ArgumentParser(prog='htmlxify-lsp', description='htmlxify Language Server (stdio)')
+    parser.add_argument(
+        '--debounce-ms', type=int, default=int(DEFAULT_DEBOUNCE * 1000),
+        help='Quiet time after a change before the document is analyzed (default: %(default)s)'
+    )
+    args = parser.parse_args(argv)
+    server.worker.debounce = args.debounce_ms / 1000
+    server.start_io()
+
+
+if __name__ == '__main__':
+    start_server()
@@ -0,0 +1,120 @@
+"""
+Worker - Debounced analyses on a background thread
+    
+    worker = AnalysisWorker(publish, debounce=0.2)
+    worker.schedule(uri, version, source)   # From the editor's change events
+    ...
+    worker.stop()
+
+schedule() only records the newest version and returns at once, so change
+events never wait on analysis. The worker thread analyzes a document once
+it has gone debounce seconds without a change, then calls
+publish(uri, version, source, issues). A change to a document that is being
+analyzed cancels that analysis between stages (a parse can't be stopped
+part way), and issues of a version that is no longer the newest are never
+published.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from htmlxify.diagnostics import ValidationIssue
+from language_server.analysis import AnalysisCancelled, DocumentAnalysis
+
+
+DEFAULT_DEBOUNCE = 0.2  # Seconds without a change before a document is analyzed
+
+Publish = Callable[[str, int, str, List[ValidationIssue]], None]
+
+
+class AnalysisWorker:
+    """One thread analyzing the newest version of each open document"""
+    
+    def __init__(
+        self,
+        publish: Publish,
+        debounce: float = DEFAULT_DEBOUNCE,
+        filename: Callable[[str], str] = str
+    ):
+        self.publish = publish
+        self.debounce = debounce
+        self.filename = filename  # uri -> name used in diagnostics
+        self.documents: Dict[str, DocumentAnalysis] = {}
+        self._pending: Dict[str, Tuple[int, str, float]] = {}  # uri -> (version, source, due time)
+        self._running: Optional[Tuple[str, threading.Event]] = None
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+    
+    def schedule(self, uri: str, version: int, source: str):
+        """Analyze this version once the document stops changing"""
+        with self._condition:
+            self._pending[uri] = (version, source, time.monotonic() + self.debounce)
+            self._cancel(uri)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='htmlxify-analysis', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+    
+    def close(self, uri: str):
+        """Forget a closed document; an analysis of it is dropped"""
+        with self._condition:
+            self._pending.pop(uri, None)
+            self._cancel(uri)
+            self.documents.pop(uri, None)
+    
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the thread after the current stage of the running analysis"""
+        with self._condition:
+            self._stopped = True
+            self._pending.clear()
+            if self._running:
+                self._running[1].set()
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+    
+    def _cancel(self, uri: str):
+        # Holding the condition
+        if self._running and self._running[0] == uri:
+            self._running[1].set()
+    
+    def _next(self) -> Optional[Tuple[str, int, str, threading.Event]]:
+        """Wait for the next document due for analysis; None once stopped"""
+        with self._condition:
+            while not self._stopped:
+                now = time.monotonic()
+                due = min(self._pending.items(), key=lambda item: item[1][2], default=None)
+                if due is not None and due[1][2] <= now:
+                    uri, (version, source, _) = due
+                    del self._pending[uri]
+                    cancelled = threading.Event()
+                    self._running = (uri, cancelled)
+                    return uri, version, source, cancelled
+                self._condition.wait(None if due is None else due[1][2] - now)
+            return None
+    
+    def _run(self):
+        while True:
+            job = self._next()
+            if job is None:
+                return
+            uri, version, source, cancelled = job
+            document = self.documents.get(uri)
+            if document is None:
+                document = self.documents[uri] = DocumentAnalysis(self.filename(uri))
+            try:
+                issues = document.update(source, cancelled)
+            except AnalysisCancelled:
+                continue
+            except Exception as e:  # Keep serving other documents
+                issues = [ValidationIssue({}, f"Internal error analyzing the document: {e}", rule='internal-error')]
+            finally:
+                with self._condition:
+                    self._running = None
+            with self._condition:
+                stale = cancelled.is_set() or uri in self._pending or self.documents.get(uri) is not document
+            if not stale:
+                self.publish(uri, version, source, issues)
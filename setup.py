@@ -26,7 +26,7 @@ setup(
     url='https://github.com/Aquib489/htmlxify',
     
     # Package discovery
-    packages=find_packages(exclude=['tests', 'tests.*']),
+    packages=find_packages(exclude=['tests', 'tests.*', 'benchmarks', 'benchmarks.*']),
     
     # Include non-Python files
     package_data={
@@ -2,16 +2,33 @@
 Integration tests for end-to-end compilation
 """
 
+import asyncio
+import json
+import os
 import pytest
 from pathlib import Path
 import tempfile
 import shutil
+import socket
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from htmlxify.parser.ast_builder import ASTBuilder
 from htmlxify.parser.indent_processor import IndentationProcessor
 from htmlxify.validator.semantic import SemanticValidator
 from htmlxify.generators.html_gen import HTMLGenerator
 from htmlxify.generators.css_gen import CSSGenerator
 from htmlxify.generators.js_gen import JSGenerator
+from htmlxify.build import build
+from htmlxify.watch import Watcher
+from htmlxify.daemon import CompileDaemon
+from htmlxify import client
+from htmlxify.diagnostics import to_records
+from benchmarks import lsp_latency, scaling
+from benchmarks.generator import generate_document
+from language_server.analysis import DocumentAnalysis
+from language_server.worker import AnalysisWorker
+import example_backend
 
 
 class TestEndToEndCompilation:
@@ -166,4 +183,778 @@ div.container {
         assert 'Page 3' in outputs['page3.htmlxify']['html']
 
 
+
+class TestConcurrentCompile:
+    """Test the pipeline gives identical results from many threads at once"""
+    
+    THREADS = 32
+    
+    def documents(self):
+        """Fixture pages plus generated variants, keyed by filename"""
+        fixtures = Path(__file__).parent.parent / 'fixtures'
+        docs = {path.name: path.read_text(encoding='utf-8') for path in sorted(fixtures.glob('*.v1'))}
+        for i in range(4):
+            docs[f'generated{i}.htmlxify'] = '\n'.join([
+                f'div#page{i}.container {{',
+                f'  h1.title {{ Page {i} }}',
+                f'  span(⚡-data: "user{i}") {{ Guest }}',
+                f'  div(⚡-call: "load{i}", ⚡-call-when: "visible", ⚡-cache: {i}) {{ Loading }}',
+                f'  p(animate: "fade {i + 1}s") {{ {"text " * i} }}',
+                '}',
+            ])
+        docs['broken.htmlxify'] = 'div {\n  ((( broken'
+        return docs
+    
+    def snapshot(self, result):
+        """Everything a compile produced, as comparable values"""
+        return (
+            result.html, result.css, result.js, result.source_map, result.runtime,
+            [(issue.severity, issue.line, issue.message) for issue in result.diagnostics]
+        )
+    
+    def test_threads_match_serial(self, monkeypatch):
+        """Test 32 threads compiling same and different documents match serial runs"""
+        import htmlxify
+        
+        docs = self.documents()
+        option_sets = [{}, {'minify': True, 'shared_runtime': True, 'batch_calls': True}]
+        jobs = [(name, options) for name in docs for options in option_sets]
+        expected = {
+            (name, json.dumps(options)): self.snapshot(htmlxify.compile(docs[name], name, options))
+            for name, options in jobs
+        }
+        
+        # Start cold, so the threads also race to build the parser
+        monkeypatch.setattr(ASTBuilder, '_parser_cache', None)
+        barrier = threading.Barrier(self.THREADS)
+        
+        def worker(index):
+            barrier.wait()
+            # Every thread compiles one shared document and its own share of the rest
+            mine = [jobs[0], jobs[index % len(jobs)], jobs[index * 7 % len(jobs)]]
+            return [
+                ((name, json.dumps(options)), self.snapshot(htmlxify.compile(docs[name], name, options)))
+                for name, options in mine
+            ]
+        
+        with ThreadPoolExecutor(self.THREADS) as pool:
+            outputs = [item for items in pool.map(worker, range(self.THREADS)) for item in items]
+        
+        assert len(outputs) > self.THREADS
+        for key, snapshot in outputs:
+            assert snapshot == expected[key], key
+    
+    def test_validation_leaves_ast_unchanged(self):
+        """Test the validator only reads the AST"""
+        import copy
+        
+        source = 'div(⚡-call: "getUser") { span(⚡-data: "username") { Guest } }'
+        ast = IndentationProcessor().process(ASTBuilder(source, 'test.htmlxify').parse())
+        before = copy.deepcopy(ast)
+        
+        SemanticValidator(ast, 'test.htmlxify').validate()
+        
+        assert ast == before
+
+
+class TestAsyncCompile:
+    """Test the asyncio compile API"""
+    
+    SOURCE = 'div.box(⚡-call: "getData") { span(⚡-data: "user") { Guest } }'
+    
+    @pytest.fixture
+    def temp_dir(self):
+        """Create temporary directory for test outputs"""
+        temp = tempfile.mkdtemp()
+        yield temp
+        shutil.rmtree(temp)
+    
+    def test_compile_async_matches_compile(self):
+        """Test compile_async gives the same result as compile"""
+        import htmlxify
+        
+        expected = htmlxify.compile(self.SOURCE, 'page.htmlxify', {'minify': True})
+        result = asyncio.run(htmlxify.compile_async(self.SOURCE, 'page.htmlxify', {'minify': True}))
+        
+        assert result.ok
+        assert (result.html, result.css, result.js) == (expected.html, expected.css, expected.js)
+    
+    def test_compile_async_process_executor(self):
+        """Test compiling on a process pool"""
+        import htmlxify
+        from htmlxify.build import warm_parser
+        
+        async def run():
+            with ProcessPoolExecutor(1, initializer=warm_parser) as pool:
+                return await htmlxify.compile_async(self.SOURCE, 'page.htmlxify', executor=pool)
+        
+        result = asyncio.run(run())
+        
+        assert result.ok
+        assert result.html == htmlxify.compile(self.SOURCE, 'page.htmlxify').html
+    
+    def test_compile_file_async_writes_outputs(self, temp_dir):
+        """Test compile_file_async reads the source and writes every artifact"""
+        import htmlxify
+        
+        src = Path(temp_dir) / 'page.htmlxify'
+        src.write_text(self.SOURCE, encoding='utf-8')
+        out = Path(temp_dir) / 'dist'
+        
+        result = asyncio.run(htmlxify.compile_file_async(str(src), str(out), {'shared_runtime': True}))
+        
+        assert result.ok
+        assert (out / 'page.html').read_text(encoding='utf-8') == result.html
+        assert (out / 'page.js').exists() and (out / 'page.css').exists()
+        assert (out / result.runtime_filename).exists()
+    
+    def test_stream_html(self):
+        """Test streamed chunks add up to the page"""
+        import htmlxify
+        
+        async def collect(source):
+            return [chunk async for chunk in htmlxify.stream_html(source, 'page.htmlxify', chunk_size=64)]
+        
+        chunks = asyncio.run(collect(self.SOURCE))
+        
+        assert len(chunks) > 1
+        assert all(len(chunk) <= 64 for chunk in chunks)
+        assert ''.join(chunks) == htmlxify.compile(self.SOURCE, 'page.htmlxify').html
+        
+        with pytest.raises(htmlxify.CompileError) as error:
+            asyncio.run(collect('div {\n  ((( broken'))
+        assert not error.value.result.ok
+    
+    def test_cancel_stops_running_compile(self, monkeypatch):
+        """Test cancelling the task signals a compile running on a thread"""
+        import htmlxify
+        from htmlxify import aio
+        from htmlxify.compiler import CompileCancelled
+        
+        signalled = threading.Event()
+        
+        def slow_compile(source, filename, options, cancelled=None):
+            # Stands in for a long parse; returns as soon as it is cancelled
+            if cancelled.wait(10):
+                signalled.set()
+                raise CompileCancelled(filename)
+        
+        monkeypatch.setattr(aio, 'compile', slow_compile)
+        
+        async def run():
+            task = asyncio.create_task(htmlxify.compile_async(self.SOURCE))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        
+        started = time.perf_counter()
+        asyncio.run(run())
+        
+        assert signalled.is_set()
+        assert time.perf_counter() - started < 5
+    
+    def test_compile_checks_cancelled_event(self):
+        """Test compile stops between stages once its event is set"""
+        import htmlxify
+        from htmlxify.compiler import CompileCancelled
+        
+        cancelled = threading.Event()
+        cancelled.set()
+        
+        with pytest.raises(CompileCancelled):
+            htmlxify.compile(self.SOURCE, cancelled=cancelled)
+
+
+class TestDirectoryBuild:
+    """Test `htmlxify build` over a source tree"""
+    
+    @pytest.fixture
+    def temp_dir(self):
+        """Create temporary directory for test outputs"""
+        temp = tempfile.mkdtemp()
+        yield Path(temp)
+        shutil.rmtree(temp)
+    
+    def write_sources(self, src: Path):
+        """Write a small tree with one broken page"""
+        (src / 'blog' / '2024').mkdir(parents=True)
+        (src / 'index.htmlxify').write_text('div { Home }', encoding='utf-8')
+        (src / 'blog' / 'post.htmlxify').write_text('div { Post }', encoding='utf-8')
+        (src / 'blog' / '2024' / 'old.htmlxify').write_text('div { Old }', encoding='utf-8')
+        (src / 'broken.htmlxify').write_text('div {{{', encoding='utf-8')
+    
+    @pytest.mark.parametrize('jobs', [1, 2])
+    def test_build_keeps_layout(self, temp_dir, jobs):
+        """Test outputs mirror the source tree, serially and in a pool"""
+        src, out = temp_dir / 'src', temp_dir / 'dist'
+        self.write_sources(src)
+        
+        results = build(str(src), str(out), jobs=jobs)
+        
+        assert [r['source'] for r in results] == [
+            'blog/2024/old.htmlxify',
+            'blog/post.htmlxify',
+            'broken.htmlxify',
+            'index.htmlxify',
+        ]
+        assert 'Post' in (out / 'blog' / 'post.html').read_text(encoding='utf-8')
+        assert (out / 'blog' / '2024' / 'old.css').exists()
+        assert (out / 'index.js').exists()
+        assert all(r['seconds'] >= 0 for r in results)
+    
+    def test_build_reports_failures(self, temp_dir):
+        """Test a broken page fails without stopping the build"""
+        src, out = temp_dir / 'src', temp_dir / 'dist'
+        self.write_sources(src)
+        
+        results = {r['source']: r for r in build(str(src), str(out), jobs=1)}
+        
+        assert not results['broken.htmlxify']['ok']
+        [record] = results['broken.htmlxify']['diagnostics']
+        assert record['message'].startswith('Parse error')
+        assert (record['file'], record['line'], record['rule']) == ('broken.htmlxify', 1, 'parse-error')
+        assert not (out / 'broken.html').exists()
+        assert results['index.htmlxify']['ok']
+    
+    def test_build_shared_runtime_path(self, temp_dir):
+        """Test nested pages reference the runtime at the output root"""
+        src, out = temp_dir / 'src', temp_dir / 'dist'
+        self.write_sources(src)
+        
+        results = {r['source']: r for r in build(str(src), str(out), {'shared_runtime': True}, jobs=1)}
+        
+        runtimes = list(out.glob('htmlxify-runtime.*.js'))
+        assert len(runtimes) == 1
+        html = (out / 'blog' / '2024' / 'old.html').read_text(encoding='utf-8')
+        assert f'src="../../{runtimes[0].name}"' in html
+        
+        # The page script is counted without the runtime it no longer inlines
+        old = results['blog/2024/old.htmlxify']
+        assert old['js_bytes'] == len((out / 'blog' / '2024' / 'old.js').read_bytes())
+        assert old['runtime_saved_bytes'] > old['js_bytes']
+        assert results['broken.htmlxify']['runtime_saved_bytes'] == 0
+    
+    
+    def test_incremental_build_skips_unchanged(self, temp_dir):
+        """Test a rebuild only compiles changed pages"""
+        src, out = temp_dir / 'src', temp_dir / 'dist'
+        self.write_sources(src)
+        build(str(src), str(out), jobs=1)
+        
+        (src / 'index.htmlxify').write_text('div { Home page }', encoding='utf-8')
+        results = {r['source']: r for r in build(str(src), str(out), jobs=1)}
+        
+        assert not results['index.htmlxify'].get('skipped')
+        assert results['blog/post.htmlxify']['skipped']
+        assert 'Home page' in (out / 'index.html').read_text(encoding='utf-8')
+        
+        # Failed pages are retried until they compile
+        assert not results['broken.htmlxify'].get('skipped')
+    
+    def test_incremental_build_keeps_diagnostics(self, temp_dir):
+        """Test a skipped page still reports its warnings"""
+        src, out = temp_dir / 'src', temp_dir / 'dist'
+        self.write_sources(src)
+        (src / 'blog' / 'post.htmlxify').write_text('div(animate: "fade 1s") { Post }', encoding='utf-8')
+        first = {r['source']: r for r in build(str(src), str(out), jobs=1)}
+        
+        results = {r['source']: r for r in build(str(src), str(out), jobs=1)}
+        
+        assert results['blog/post.htmlxify']['skipped']
+        assert results['blog/post.htmlxify']['diagnostics'] == first['blog/post.htmlxify']['diagnostics']
+        [record] = results['blog/post.htmlxify']['diagnostics']
+        assert (record['file'], record['rule']) == ('blog/post.htmlxify', 'animation-gpu')
+    
+    def test_incremental_build_invalidation(self, temp_dir):
+        """Test option changes, missing outputs and deleted sources"""
+        src, out = temp_dir / 'src', temp_dir / 'dist'
+        self.write_sources(src)
+        build(str(src), str(out), jobs=1)
+        
+        results = build(str(src), str(out), {'minify': True}, jobs=1)
+        assert not any(r.get('skipped') for r in results)
+        
+        (out / 'blog' / 'post.css').unlink()
+        (src / 'index.htmlxify').unlink()
+        results = {r['source']: r for r in build(str(src), str(out), {'minify': True}, jobs=1)}
+        
+        assert not results['blog/post.htmlxify'].get('skipped')
+        assert results['blog/2024/old.htmlxify']['skipped']
+        assert 'index.htmlxify' not in results
+        assert not (out / 'index.html').exists()
+    
+    @pytest.mark.parametrize('rebuild', [{'options': {'minify': True}}, {'force': True}])
+    def test_deleted_source_removed_on_full_rebuild(self, temp_dir, rebuild):
+        """Test a full rebuild still removes the outputs of deleted sources"""
+        src, out = temp_dir / 'src', temp_dir / 'dist'
+        self.write_sources(src)
+        build(str(src), str(out), jobs=1)
+        
+        (src / 'blog' / 'post.htmlxify').unlink()
+        results = build(str(src), str(out), jobs=1, **rebuild)
+        
+        assert not any(r.get('skipped') for r in results)
+        assert not list((out / 'blog').glob('post.*'))
+        assert (out / 'index.html').exists()
+        
+        # The new state is current: a no-op rebuild skips every page that compiled
+        results = build(str(src), str(out), rebuild.get('options'), jobs=1)
+        assert [r['source'] for r in results if not r.get('skipped')] == ['broken.htmlxify']
+
+
+
+class TestWatch:
+    """Test `htmlxify watch` change detection and rebuilds"""
+    
+    @pytest.fixture
+    def temp_dir(self):
+        """Create temporary directory for test outputs"""
+        temp = tempfile.mkdtemp()
+        yield Path(temp)
+        shutil.rmtree(temp)
+    
+    def test_watch_rebuilds_changed_pages(self, temp_dir):
+        """Test only changed and deleted sources are rebuilt"""
+        src, out = temp_dir / 'src', temp_dir / 'dist'
+        src.mkdir()
+        (src / 'one.htmlxify').write_text('div { One }', encoding='utf-8')
+        (src / 'two.htmlxify').write_text('div { Two }', encoding='utf-8')
+        
+        watcher = Watcher(str(src), str(out), use_watchdog=False)
+        assert len(watcher.start()) == 2
+        assert watcher.poll() == set()
+        
+        (src / 'one.htmlxify').write_text('div { One again }', encoding='utf-8')
+        (src / 'two.htmlxify').unlink()
+        changed = watcher.poll()
+        results = watcher.rebuild(changed)
+        
+        assert changed == {'one.htmlxify', 'two.htmlxify'}
+        assert [r['source'] for r in results] == ['one.htmlxify']
+        assert results[0]['latency'] >= 0
+        assert 'One again' in (out / 'one.html').read_text(encoding='utf-8')
+        assert not (out / 'two.html').exists()
+    
+    def test_watch_run_debounces_saves(self, temp_dir):
+        """Test a burst of saves while running produces one rebuild"""
+        src, out = temp_dir / 'src', temp_dir / 'dist'
+        src.mkdir()
+        (src / 'page.htmlxify').write_text('div { v0 }', encoding='utf-8')
+        
+        compiled = []
+        watcher = Watcher(
+            str(src), str(out), interval=0.05, debounce=0.2,
+            use_watchdog=False, on_result=compiled.append
+        )
+        thread = threading.Thread(target=watcher.run)
+        thread.start()
+        try:
+            deadline = time.time() + 10
+            while not compiled and time.time() < deadline:
+                time.sleep(0.01)
+            
+            for i in range(1, 4):
+                (src / 'page.htmlxify').write_text(f'div {{ save{i} {"pad " * i}}}', encoding='utf-8')
+                time.sleep(0.03)
+            
+            while len(compiled) < 2 and time.time() < deadline:
+                time.sleep(0.01)
+            time.sleep(0.3)
+        finally:
+            watcher.stop()
+            thread.join(5)
+        
+        assert len(compiled) == 2
+        assert 'save3' in (out / 'page.html').read_text(encoding='utf-8')
+
+
+
+class TestCompileDaemon:
+    """Test the compile daemon and its client"""
+    
+    @pytest.fixture
+    def daemon(self):
+        """Run a daemon on a temporary socket"""
+        temp = Path(tempfile.mkdtemp())
+        daemon = CompileDaemon(str(temp / 'hx.sock'), jobs=2, idle_timeout=30)
+        thread = threading.Thread(target=daemon.serve_forever)
+        thread.start()
+        
+        deadline = time.time() + 30
+        while daemon.started is None and time.time() < deadline:
+            time.sleep(0.01)
+        
+        yield daemon, temp
+        daemon.stop()
+        thread.join(10)
+        shutil.rmtree(temp)
+    
+    def test_daemon_compiles_concurrently(self, daemon):
+        """Test concurrent compile requests all succeed"""
+        daemon, temp = daemon
+        for i in range(6):
+            (temp / f'page{i}.htmlxify').write_text(f'div {{ Page{i} }}', encoding='utf-8')
+        
+        def compile_page(i):
+            return client.compile_file(
+                str(temp / f'page{i}.htmlxify'), str(temp / 'dist'),
+                socket_path=daemon.socket_path
+            )
+        
+        with ThreadPoolExecutor(6) as pool:
+            results = list(pool.map(compile_page, range(6)))
+        
+        assert all(r['ok'] for r in results)
+        assert 'Page5' in (temp / 'dist' / 'page5.html').read_text(encoding='utf-8')
+        assert client.send({'command': 'ping'}, daemon.socket_path)['requests'] == 7
+    
+    def test_daemon_survives_bad_input(self, daemon):
+        """Test malformed requests and broken pages only fail themselves"""
+        daemon, temp = daemon
+        (temp / 'broken.htmlxify').write_text('div {{{', encoding='utf-8')
+        
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(daemon.socket_path)
+            sock.sendall(b'not json\n[1]\n{"command": "compile", "input": "relative"}\n')
+            reader = sock.makefile('rb')
+            responses = [json.loads(reader.readline()) for _ in range(3)]
+        
+        assert not any(r['ok'] for r in responses)
+        assert all('Bad request' in r['error'] for r in responses)
+        
+        result = client.compile_file(str(temp / 'broken.htmlxify'), str(temp / 'dist'), socket_path=daemon.socket_path)
+        assert not result['ok']
+        assert result['diagnostics'][0]['message'].startswith('Parse error')
+        
+        assert client.send({'command': 'ping'}, daemon.socket_path)['ok']
+    
+    def test_daemon_validate_jobs_option(self, daemon):
+        """Test validate_jobs is forwarded to the compile, and checked"""
+        daemon, temp = daemon
+        (temp / 'page.htmlxify').write_text('div { Page }', encoding='utf-8')
+        
+        def compile_page(options):
+            return client.compile_file(
+                str(temp / 'page.htmlxify'), str(temp / 'dist'), options, socket_path=daemon.socket_path
+            )
+        
+        assert compile_page({'validate_jobs': 2})['ok']
+        for jobs in (0, '2', True):
+            result = compile_page({'validate_jobs': jobs})
+            assert not result['ok'] and 'validate_jobs' in result['error']
+    
+    def test_daemon_idle_timeout(self):
+        """Test the daemon exits and removes its socket when idle"""
+        temp = Path(tempfile.mkdtemp())
+        try:
+            daemon = CompileDaemon(str(temp / 'hx.sock'), jobs=1, idle_timeout=0.5)
+            thread = threading.Thread(target=daemon.serve_forever)
+            thread.start()
+            thread.join(30)
+            
+            assert not thread.is_alive()
+            assert not (temp / 'hx.sock').exists()
+        finally:
+            shutil.rmtree(temp)
+
+
+class TestExampleBackend:
+    """Test the example backend's /api/_batch endpoint"""
+    
+    @pytest.fixture
+    def client(self):
+        return example_backend.app.test_client()
+    
+    def count_calls(self, monkeypatch, endpoint, headers=None):
+        """Wrap a view to record the If-None-Match of each call and add headers"""
+        calls = []
+        view = example_backend.app.view_functions[endpoint]
+        
+        def counted(*args, **kwargs):
+            calls.append(example_backend.request.headers.get('If-None-Match'))
+            response = example_backend.app.make_response(view(*args, **kwargs))
+            response.headers.update(headers or {})
+            return response
+        
+        monkeypatch.setitem(example_backend.app.view_functions, endpoint, counted)
+        return calls
+    
+    def batch(self, client, calls):
+        response = client.post('/api/_batch', json={'calls': calls})
+        assert response.status_code == 200
+        return response.get_json()['results']
+    
+    def test_batch_answers_repeated_calls_once(self, client, monkeypatch):
+        """Test calls to the same endpoint share one dispatch and one result"""
+        calls = self.count_calls(monkeypatch, 'get_data')
+        
+        results = self.batch(client, [{'path': 'getData'}, {'path': 'getStats'}, {'path': '/getData/'}])
+        
+        assert [result['status'] for result in results] == [200, 200, 200]
+        assert results[0] == results[2]
+        assert results[1]['body']['stats']
+        assert len(calls) == 1
+    
+    def test_batch_rejects_invalid_calls(self, client):
+        """Test bad entries get their own 400, and a bad payload fails as a whole"""
+        results = self.batch(client, [1, 'getData', {'path': '_batch'}, {}, {'path': 'getData'}])
+        
+        assert [result['status'] for result in results] == [400, 400, 400, 400, 200]
+        for payload in ({'calls': {'path': 'getData'}}, [{'path': 'getData'}], {}):
+            assert client.post('/api/_batch', json=payload).status_code == 400
+        assert client.post('/api/_batch', data='not json').status_code == 400
+    
+    def test_batch_uses_the_route_method(self, client):
+        """Test GET-only routes are called with GET unless a call names a method"""
+        results = self.batch(client, [
+            {'path': 'health'},
+            {'path': 'health', 'method': 'POST'},
+            {'path': 'users', 'method': 'get'},
+        ])
+        
+        assert results[0]['status'] == 200
+        assert results[0]['body']['status'] == 'healthy'
+        assert results[1]['status'] == 405
+        assert results[2]['status'] == 200
+    
+    def test_batch_passes_cache_headers(self, client, monkeypatch):
+        """Test each result carries its cache headers, and a call's etag is sent as If-None-Match"""
+        calls = self.count_calls(monkeypatch, 'get_data', {'Cache-Control': 'max-age=60', 'ETag': '"v1"'})
+        
+        [result] = self.batch(client, [{'path': 'getData', 'etag': '"v0"'}])
+        
+        assert result['headers'] == {'Cache-Control': 'max-age=60', 'ETag': '"v1"'}
+        assert calls == ['"v0"']
+
+
+class TestLanguageServer:
+    """Test the language server's incremental analysis, its worker and the protocol"""
+    
+    SOURCE = (
+        'header(style: "top: 0") { Top }\n'
+        'main {\n'
+        '  ul {\n'
+        + ''.join(f'    li.item{i}(⚡-call: "items-{i}") {{ Item {i} }}\n' for i in range(12))
+        + '  }\n'
+        '  div(⚡-call: "feed", ⚡-cache: 60) { Feed }\n'
+        '}\n'
+        'footer(animate: "fade") { Bottom }\n'
+    )
+    
+    @staticmethod
+    def full_issues(source):
+        ast = IndentationProcessor().process(ASTBuilder(source, 'page.htmlxify').parse())
+        validator = SemanticValidator(ast, 'page.htmlxify')
+        validator.validate()
+        return to_records(validator.errors + validator.warnings)
+    
+    def test_edits_reparse_only_the_edited_element(self):
+        """Test each edit matches a full parse and validation, parsing far less"""
+        document = DocumentAnalysis('page.htmlxify')
+        source = self.SOURCE
+        document.update(source)
+        assert document.parsed_chars == len(source)
+        
+        # (old, new, start and end of the element parsed again)
+        edits = [
+            ('Item 3 }', 'Item three }', 'li.item3', '}'),                  # Text
+            ('⚡-cache: 60', '⚡-cache: "often"', 'div(', '}'),             # Attribute, now an error
+            ('Feed }\n', 'Feed }\n  p(style: "width: 1px") { New }\n', 'main', '\n}'),  # New line in main
+            ('li.item5(', 'li.item5.extra(', 'ul', '\n  }'),                 # Element head: its parent
+            ('Top }', 'Top } nav { Links }', 'header', 'Links }'),           # New top-level element
+        ]
+        for old, new, first, last in edits:
+            source = source.replace(old, new)
+            issues = document.update(source)
+            
+            assert document.ast == ASTBuilder(source, 'page.htmlxify').parse()
+            assert to_records(issues) == self.full_issues(source)
+            start = source.index(first)
+            element = source[start:source.index(last, start) + len(last)]
+            # Top-level elements are parsed with the line breaks around them
+            assert document.parsed_chars <= len(element) + 2
+        
+        assert [issue.rule for issue in issues[:1]] == ['cache-ttl']
+    
+    def test_parse_error_keeps_issues_outside_the_edit(self):
+        """Test a broken edit reports the parse error and keeps the other issues"""
+        document = DocumentAnalysis('page.htmlxify')
+        document.update(self.SOURCE)
+        
+        assert [(issue.rule, issue.line) for issue in document.issues] == [
+            ('layout-property', 1), ('animation-gpu', 19)
+        ]
+        
+        broken = self.SOURCE.replace('Item 4 }', 'Item 4 {\n')
+        issues = document.update(broken)
+        
+        assert issues[0].rule == 'parse-error'
+        # The warnings before and after the edit stay; those after move down a line
+        assert [(issue.rule, issue.line) for issue in issues[1:]] == [
+            ('layout-property', 1), ('animation-gpu', 20)
+        ]
+        
+        # Fixing it parses the edited part again, against the last valid version
+        fixed = broken.replace('Item 4 {', 'Item 4 }')
+        assert to_records(document.update(fixed)) == self.full_issues(fixed)
+    
+    def test_worker_publishes_the_newest_version(self):
+        """Test changes within the debounce are analyzed once, as the last version"""
+        published = []
+        done = threading.Event()
+        
+        def publish(uri, version, source, issues):
+            published.append((uri, version, [issue.rule for issue in issues]))
+            done.set()
+        
+        worker = AnalysisWorker(publish, debounce=0.2)
+        try:
+            for version in range(1, 4):
+                source = self.SOURCE if version == 3 else self.SOURCE.replace('⚡-cache: 60', '⚡-cache: "x"')
+                worker.schedule('file:///page.htmlxify', version, source)
+            assert done.wait(30)
+            time.sleep(0.3)
+        finally:
+            worker.stop(10)
+        
+        assert [(uri, version) for uri, version, _ in published] == [('file:///page.htmlxify', 3)]
+        assert 'cache-ttl' not in published[0][2]
+    
+    def test_worker_cancels_stale_analysis(self):
+        """Test a change during an analysis drops it; only the new version is published"""
+        source = generate_document(seed=1, elements=300)
+        published = []
+        done = threading.Event()
+        
+        def publish(uri, version, source, issues):
+            published.append(version)
+            done.set()
+        
+        worker = AnalysisWorker(publish, debounce=0)
+        try:
+            worker.schedule('file:///big.htmlxify', 1, source)
+            deadline = time.time() + 30
+            while worker._running is None and time.time() < deadline:
+                time.sleep(0.001)
+            worker.schedule('file:///big.htmlxify', 2, source.replace('{', '{ Edited', 1))
+            assert done.wait(120)
+        finally:
+            worker.stop(10)
+        
+        assert published == [2]
+    
+    def test_latency_benchmark(self):
+        """Test the latency benchmark times every edit of a generated document"""
+        results = lsp_latency.measure(lines=300, edits=5)
+        
+        assert results['lines'] >= 250
+        assert len(results['change_handler']) == len(results['edit_to_diagnostics']) == 5
+        assert max(results['parsed_chars']) < results['bytes']
+    
+    def test_server_over_stdio(self):
+        """Test the server publishes diagnostics, and updates them after an incremental change"""
+        pytest.importorskip('pygls')
+        import queue
+        import subprocess
+        import sys
+        
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'language_server.server', '--debounce-ms', '20'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            cwd=str(Path(__file__).parent.parent.parent)
+        )
+        messages = queue.Queue()
+        
+        def read():
+            while True:
+                headers = {}
+                while True:
+                    line = process.stdout.readline()
+                    if not line:
+                        return
+                    if not line.strip():
+                        break
+                    key, _, value = line.decode('ascii').partition(':')
+                    headers[key.lower()] = value.strip()
+                messages.put(json.loads(process.stdout.read(int(headers['content-length']))))
+        
+        def send(message):
+            body = json.dumps(dict(message, jsonrpc='2.0')).encode('utf-8')
+            process.stdin.write(b'Content-Length: %d\r\n\r\n' % len(body) + body)
+            process.stdin.flush()
+        
+        def diagnostics(version):
+            while True:
+                message = messages.get(timeout=60)
+                if message.get('method') == 'textDocument/publishDiagnostics' and message['params'].get('version') == version:
+                    return message['params']['diagnostics']
+        
+        threading.Thread(target=read, daemon=True).start()
+        uri = 'file:///tmp/page.htmlxify'
+        source = self.SOURCE.replace('⚡-cache: 60', '⚡-cache: "often"')
+        try:
+            send({'id': 1, 'method': 'initialize', 'params': {'processId': None, 'rootUri': None, 'capabilities': {}}})
+            send({'method': 'initialized', 'params': {}})
+            send({'method': 'textDocument/didOpen', 'params': {'textDocument': {
+                'uri': uri, 'languageId': 'htmlxify', 'version': 1, 'text': source
+            }}})
+            
+            errors = [d for d in diagnostics(1) if d['severity'] == 1]
+            assert [d['code'] for d in errors] == ['cache-ttl']
+            assert errors[0]['range'] == {'start': {'line': 16, 'character': 2}, 'end': {'line': 16, 'character': 5}}
+            
+            # Only the edited range is sent
+            start = source.splitlines()[16].index('"often"')
+            send({'method': 'textDocument/didChange', 'params': {
+                'textDocument': {'uri': uri, 'version': 2},
+                'contentChanges': [{'range': {
+                    'start': {'line': 16, 'character': start},
+                    'end': {'line': 16, 'character': start + len('"often"')},
+                }, 'text': '60'}],
+            }})
+            assert not [d for d in diagnostics(2) if d['severity'] == 1]
+            
+            send({'id': 2, 'method': 'shutdown', 'params': None})
+            send({'method': 'exit', 'params': None})
+            assert process.wait(30) == 0
+        finally:
+            if process.poll() is None:
+                process.kill()
+            process.stdin.close()
+            process.stdout.close()
+
+
+# Growth exponent above which a stage counts as superlinear (quadratic is 2)
+MAX_GROWTH_EXPONENT = float(os.environ.get('HTMLXIFY_MAX_GROWTH_EXPONENT', '1.3'))
+
+
+class TestScaling:
+    """Test no stage's runtime grows faster than linearly with input size"""
+    
+    def test_fit_exponent(self):
+        """Test the fit recovers known growth rates"""
+        sizes = [100, 200, 400, 800]
+        assert scaling.fit_exponent(sizes, [3 * n for n in sizes]) == pytest.approx(1.0)
+        assert scaling.fit_exponent(sizes, [n * n / 50 for n in sizes]) == pytest.approx(2.0)
+    
+    def test_long_text_is_one_text_node(self):
+        """Test a long run of words parses into a single Text node"""
+        source = scaling.long_text(50)
+        ast = ASTBuilder(source, 'long.htmlxify').parse()
+        
+        texts = [child for child in ast['children'][0]['children'] if child['type'] == 'Text']
+        assert len(texts) == 1
+        assert texts[0]['value'] == source[len('p { '):-len(' }\n')]
+    
+    @pytest.mark.parametrize('shape', sorted(scaling.SHAPES))
+    def test_stage_growth_is_linear(self, shape):
+        """Test every measurable stage stays under MAX_GROWTH_EXPONENT"""
+        exponents = scaling.growth_exponents(shape)
+        
+        assert 'parse' in exponents
+        over = {stage: k for stage, k in exponents.items() if k > MAX_GROWTH_EXPONENT}
+        assert not over, f"{shape}: growth exponents {over} exceed {MAX_GROWTH_EXPONENT}"
+
+
 # Run tests: pytest tests/integration/test_e2e.py -v
@@ -2,6 +2,7 @@
 Comprehensive unit tests for htmlxify compiler
 """
 
+import json
 import pytest
 from pathlib import Path
 from htmlxify.parser.ast_builder import ASTBuilder
@@ -117,6 +118,20 @@ def test_empty_element():
     assert element['children'] == []
 
 
+def test_node_positions():
+    """Test elements and text record where they start and end"""
+    code = 'div {\n  p(title: "x") { Hi there }\n}'
+    
+    builder = ASTBuilder(code, 'test.htmlxify')
+    ast = builder.parse()
+    
+    div = ast['children'][0]
+    paragraph = div['children'][0]
+    assert div['meta'] == {'line': 1, 'column': 1, 'end_line': 3, 'end_column': 2}
+    assert paragraph['meta'] == {'line': 2, 'column': 3, 'end_line': 2, 'end_column': 29}
+    assert paragraph['children'][0]['meta'] == {'line': 2, 'column': 19, 'end_line': 2, 'end_column': 27}
+
+
 # ==================== ATTRIBUTE TESTS ====================
 
 def test_single_attribute():
@@ -167,6 +182,21 @@ def test_dynamic_data_attribute():
     assert '⚡-data' in element['attributes']
 
 
+def test_call_when_attribute():
+    """Test ⚡-call-when attribute is parsed and emitted as data attribute"""
+    code = 'div(⚡-call: "getStats", ⚡-call-when: "visible") { Stats }'
+    
+    builder = ASTBuilder(code, 'test.htmlxify')
+    ast = builder.parse()
+    
+    element = ast['children'][0]
+    assert element['attributes']['⚡-call-when'] == 'visible'
+    
+    html, _ = HTMLGenerator(ast, 'test.htmlxify').generate()
+    assert 'data-api-call="getStats"' in html
+    assert 'data-api-when="visible"' in html
+
+
 # ==================== VALIDATOR TESTS ====================
 
 def test_valid_identifier():
@@ -226,6 +256,214 @@ def test_performance_warning():
     assert len(validator.warnings) > 0
 
 
+def test_invalid_cache_ttl():
+    """Test non-numeric ⚡-cache values are rejected"""
+    code = 'div(⚡-call: "getStats", ⚡-cache: "soon") { Stats }'
+    
+    builder = ASTBuilder(code, 'test.htmlxify')
+    ast = builder.parse()
+    
+    validator = SemanticValidator(ast, 'test.htmlxify')
+    assert validator.validate() == False
+    assert 'soon' in validator.errors[0].message
+
+
+def test_invalid_call_trigger():
+    """Test unknown ⚡-call-when values are rejected"""
+    test_ast = {
+        'type': 'Document',
+        'children': [
+            {
+                'type': 'Element',
+                'tag': 'div',
+                'id': None,
+                'classes': [],
+                'attributes': {
+                    '⚡-call': 'getStats',
+                    '⚡-call-when': 'later'
+                },
+                'children': [],
+                'meta': {}
+            }
+        ]
+    }
+    
+    validator = SemanticValidator(test_ast, 'test.htmlxify')
+    assert validator.validate() == False
+    assert 'later' in validator.errors[0].message
+
+
+def test_validator_issues_carry_rule_ids():
+    """Test every issue names the rule that raised it"""
+    code = 'div#box(⚡-call: "a/b", animate: "fade 1s") { Hi }'
+    ast = ASTBuilder(code, 'test.htmlxify').parse()
+    ast['children'][0]['id'] = '🎨'
+    
+    validator = SemanticValidator(ast, 'test.htmlxify')
+    validator.validate()
+    
+    assert [issue.rule for issue in validator.errors] == ['invalid-id']
+    assert [issue.rule for issue in validator.warnings] == ['animation-gpu', 'endpoint-path']
+
+
+def test_validator_layout_property_names():
+    """Test layout warnings match style property names, not substrings"""
+    from htmlxify.validator.semantic import check_layout_properties
+    
+    def warned(style):
+        issues = check_layout_properties({}, {'style': style}) or []
+        return [issue.message.split("'")[1] for issue in issues]
+    
+    assert warned('margin-left: 2px; max-width: 10px; stop-color: red') == []
+    assert warned('top: 0; LEFT: 2px') == ['left', 'top']
+    assert warned({'height': '10px', 'border-width': '1px'}) == ['height']
+
+
+def test_rule_registry_dispatch():
+    """Test rules only run on nodes with their fields and tags"""
+    from htmlxify.validator.rules import RuleRegistry
+    from htmlxify.validator.semantic import DEFAULT_RULES, ValidationIssue
+    
+    rules = DEFAULT_RULES.copy()
+    calls = []
+    
+    @rules.rule('org-button-type', fields=('tag',), tags=('button',))
+    def check_button_type(node, attrs):
+        calls.append(node['tag'])
+        if 'type' not in attrs:
+            yield ValidationIssue(node, "Buttons need a type", severity='warning')
+    
+    @rules.rule('org-no-title', fields=('attributes.title',), tags=lambda tag: tag.startswith('h'))
+    def check_title(node, attrs):
+        calls.append(node['tag'] + '@title')
+        return [ValidationIssue(node, "Headings get no title", severity='error')]
+    
+    code = 'div(title: "x") {\n  button { Go }\n  button(type: "submit") { Send }\n  h2(title: "t") { Hi }\n  h3 { Bye }\n}'
+    ast = IndentationProcessor().process(ASTBuilder(code, 'test.htmlxify').parse())
+    
+    validator = SemanticValidator(ast, 'test.htmlxify', rules=rules)
+    assert not validator.validate()
+    assert calls == ['button', 'button', 'h2@title']
+    assert [(issue.rule, issue.message) for issue in validator.warnings] == [('org-button-type', 'Buttons need a type')]
+    assert [issue.rule for issue in validator.errors] == ['org-no-title']
+    
+    # The defaults are untouched, and rule ids are unique
+    assert SemanticValidator(ast, 'test.htmlxify').validate()
+    with pytest.raises(ValueError):
+        rules.rule('org-no-title', fields=('tag',))(check_title)
+    with pytest.raises(ValueError):
+        RuleRegistry().rule('no-fields', fields=())(check_title)
+
+
+def test_profiler_records_rule_costs():
+    """Test a profiled compile reports the cost of each validation rule"""
+    import htmlxify
+    from htmlxify.profiler import Profiler
+    
+    with Profiler(memory=False) as profiler:
+        htmlxify.compile('div.a(⚡-call: "x/y") {\n  p.b { Hi }\n}', profiler=profiler)
+    
+    assert profiler.rules['invalid-class'].calls == 2
+    assert profiler.rules['endpoint-path'].issues == 1
+    assert 'component-name' not in profiler.rules
+    report = profiler.to_dict()
+    assert {rule['rule'] for rule in report['rules']} == {'invalid-class', 'endpoint-path', 'long-text'}
+    assert 'invalid-class' in profiler.format_table()
+
+
+def test_parallel_validation_matches_serial(monkeypatch):
+    """Test validating subtrees in processes gives the serial issues, in order"""
+    import pickle
+    from concurrent.futures import ProcessPoolExecutor
+    from htmlxify.validator.semantic import DEFAULT_RULES
+    
+    code = ''.join(
+        f'section.s{i}(⚡-call: "a/{i}", ⚡-cache: "{"x" if i % 3 else 5}") {{\n'
+        f'  p(animate: "fade", style: "top: {i}px") {{ Item {i} }}\n}}\n'
+        for i in range(12)
+    )
+    ast = IndentationProcessor().process(ASTBuilder(code, 'test.htmlxify').parse())
+    
+    def issues(validator):
+        return [
+            [(issue.node is not None and issue.node.get('tag'), issue.message, issue.line, issue.rule) for issue in found]
+            for found in (validator.errors, validator.warnings)
+        ]
+    
+    serial = SemanticValidator(ast, 'test.htmlxify', profile_rules=True)
+    assert not serial.validate()
+    
+    # Below the threshold, jobs has no effect
+    assert SemanticValidator(ast, 'test.htmlxify')._partition(4, None) == []
+    
+    monkeypatch.setattr(SemanticValidator, 'PARALLEL_MIN_NODES', 0)
+    parallel = SemanticValidator(ast, 'test.htmlxify', profile_rules=True)
+    assert len(parallel._partition(2, None)) > 1
+    assert not parallel.validate(jobs=2)
+    with ProcessPoolExecutor(2) as pool:
+        pooled = SemanticValidator(ast, 'test.htmlxify')
+        assert not pooled.validate(executor=pool)
+    
+    for validator in (parallel, pooled):
+        assert issues(validator) == issues(serial)
+        assert (validator.elements_visited, validator.text_nodes_visited) == (serial.elements_visited, serial.text_nodes_visited)
+    # Issues point at the nodes of the caller's AST
+    assert parallel.errors[0].node is serial.errors[0].node
+    assert {rule: cost.calls for rule, cost in parallel.rule_costs.items()} == {rule: cost.calls for rule, cost in serial.rule_costs.items()}
+    
+    # Registries pickle without their lock and dispatch tables
+    copied = pickle.loads(pickle.dumps(DEFAULT_RULES))
+    assert [rule.id for rule in copied] == [rule.id for rule in DEFAULT_RULES]
+
+
+def test_incremental_validation_matches_full():
+    """Test revalidating an edited document only checks the changed nodes"""
+    def page(edited):
+        items = ''.join(
+            f'  li.item{i}(⚡-call: "items/{i}") {{ Item {i} }}\n'
+            for i in range(20) if not (edited and i == 7)
+        )
+        cache = '"often"' if edited else '60'
+        extra = '  p(style: "width: 1px") { New }\n' if edited else ''
+        return (
+            f'header(style: "top: 0") {{ Top }}\n'
+            f'main {{\n  ul {{\n{items}  }}\n  div(⚡-call: "x", ⚡-cache: {cache}) {{ Feed }}\n{extra}}}\n'
+            f'footer(animate: "fade") {{ Bottom }}\n'
+        )
+    
+    def issues(validator):
+        return [
+            [(id(issue.node), issue.message, issue.line, issue.rule) for issue in found]
+            for found in (validator.errors, validator.warnings)
+        ]
+    
+    before = IndentationProcessor().process(ASTBuilder(page(False), 'test.htmlxify').parse())
+    after = IndentationProcessor().process(ASTBuilder(page(True), 'test.htmlxify').parse())
+    previous = SemanticValidator(before, 'test.htmlxify')
+    assert previous.validate()
+    
+    full = SemanticValidator(after, 'test.htmlxify')
+    assert not full.validate()
+    incremental = SemanticValidator(after, 'test.htmlxify')
+    assert not incremental.validate(previous=previous)
+    assert issues(incremental) == issues(full)
+    assert [issue.rule for issue in incremental.errors] == ['cache-ttl']
+    # Only the edited div, the new paragraph and its text, and main and ul,
+    # whose number of children changed, ran the rules
+    assert (incremental.elements_visited, incremental.text_nodes_visited) == (4, 1)
+    
+    # Nodes known to have changed are validated without comparing them
+    hinted = SemanticValidator(after, 'test.htmlxify')
+    hinted.validate(previous=previous, changed=[after['children'][1]['children'][1]])
+    assert issues(hinted) == issues(full)
+    
+    # An unchanged document reuses every issue
+    again = SemanticValidator(after, 'test.htmlxify')
+    again.validate(previous=incremental)
+    assert issues(again) == issues(full)
+    assert (again.elements_visited, again.text_nodes_visited) == (0, 0)
+
+
 # ==================== HTML GENERATOR TESTS ====================
 
 def test_html_generation_simple():
@@ -361,6 +599,64 @@ def test_css_animation_generation():
     assert '@keyframes' in css.lower()
 
 
+def test_css_keyframes_emitted_once():
+    """Test used keyframes are emitted once and unused ones are omitted"""
+    test_ast = {
+        'type': 'Document',
+        'children': [
+            {
+                'type': 'Element',
+                'tag': 'div',
+                'id': None,
+                'classes': [f'item-{i}'],
+                'attributes': {
+                    'animate': 'fade 1s'
+                },
+                'children': []
+            }
+            for i in range(1000)
+        ]
+    }
+    
+    gen = CSSGenerator(test_ast)
+    css = gen.generate()
+    
+    assert css.count('@keyframes fade ') == 1
+    assert '@keyframes bounce' not in css
+    assert '@keyframes slide' not in css
+
+
+def test_css_custom_keyframes():
+    """Test custom keyframes are emitted and validated"""
+    test_ast = {
+        'type': 'Document',
+        'children': [
+            {
+                'type': 'Element',
+                'tag': 'div',
+                'id': 'logo',
+                'classes': [],
+                'attributes': {
+                    'animate': 'wobble 1s'
+                },
+                'children': []
+            }
+        ]
+    }
+    
+    wobble = {
+        '0%, 100%': {'transform': 'rotate(0deg)'},
+        '50%': {'transform': 'rotate(5deg)'}
+    }
+    gen = CSSGenerator(test_ast, keyframes={'wobble': wobble})
+    css = gen.generate()
+    
+    assert '@keyframes wobble' in css
+    
+    with pytest.raises(ValueError):
+        CSSGenerator(test_ast, keyframes={'grow': {'0%': {'width': '0'}}})
+
+
 # ==================== JAVASCRIPT GENERATOR TESTS ====================
 
 def test_js_api_handler_generation():
@@ -413,6 +709,671 @@ def test_js_data_binding_generation():
     assert 'username' in js
 
 
+def test_js_shared_runtime():
+    """Test page JS only carries its tables when the runtime is shared"""
+    test_ast = {
+        'type': 'Document',
+        'children': [
+            {
+                'type': 'Element',
+                'tag': 'div',
+                'id': None,
+                'classes': [],
+                'attributes': {
+                    '⚡-call': 'getData'
+                },
+                'children': []
+            }
+        ]
+    }
+    
+    gen = JSGenerator(test_ast, shared_runtime=True)
+    js = gen.generate()
+    runtime = gen.generate_runtime()
+    
+    assert 'getData' in js
+    assert 'htmlxifyPages' in js
+    assert 'animationUtils' not in js
+    assert 'animationUtils' in runtime
+    assert gen.runtime_filename().startswith('htmlxify-runtime.')
+    assert gen.runtime_filename() == JSGenerator(test_ast).runtime_filename()
+    
+    inline_js = JSGenerator(test_ast).generate()
+    assert inline_js.startswith(runtime)
+    assert len(js) < len(inline_js)
+
+
+def test_js_endpoint_table_size():
+    """Test page JS grows only by the endpoint table as endpoints are added"""
+    def page_js(count):
+        test_ast = {
+            'type': 'Document',
+            'children': [
+                {
+                    'type': 'Element',
+                    'tag': 'button',
+                    'id': None,
+                    'classes': [],
+                    'attributes': {
+                        '⚡-call': f'endpoint{i:04d}'
+                    },
+                    'children': []
+                }
+                for i in range(count)
+            ]
+        }
+        return JSGenerator(test_ast, shared_runtime=True).generate()
+    
+    one = page_js(1)
+    many = page_js(1000)
+    
+    assert 'async function' not in many
+    assert 'endpoint0999' in many
+    # Each extra endpoint costs its quoted name plus a few bytes of table
+    assert (len(many) - len(one)) / 999 < len('"endpoint0000":{},') + 1
+
+
+def test_js_batch_calls():
+    """Test batching is opt-in and recorded in the page tables"""
+    test_ast = {
+        'type': 'Document',
+        'children': [
+            {
+                'type': 'Element',
+                'tag': 'div',
+                'id': None,
+                'classes': [],
+                'attributes': {
+                    '⚡-call': 'getStats'
+                },
+                'children': []
+            }
+        ]
+    }
+    
+    assert '"batch":true' not in JSGenerator(test_ast, shared_runtime=True).generate()
+    
+    gen = JSGenerator(test_ast, shared_runtime=True, batch_calls=True)
+    js = gen.generate()
+    
+    assert '"batch":true' in js
+    assert '/_batch' in gen.generate_runtime()
+
+
+def test_js_cache_ttl_table():
+    """Test ⚡-cache TTLs land in the endpoint table, shortest first"""
+    def element(ttl):
+        return {
+            'type': 'Element',
+            'tag': 'div',
+            'id': None,
+            'classes': [],
+            'attributes': {
+                '⚡-call': 'getStats',
+                '⚡-cache': ttl
+            },
+            'children': []
+        }
+    
+    test_ast = {'type': 'Document', 'children': [element(60), element(30)]}
+    
+    js = JSGenerator(test_ast, shared_runtime=True).generate()
+    
+    assert '"getStats":{"ttl":30}' in js
+
+
+def test_js_minify_drops_unused_runtime():
+    """Test minified JS keeps only the runtime sections the page uses"""
+    test_ast = {
+        'type': 'Document',
+        'children': [
+            {
+                'type': 'Element',
+                'tag': 'span',
+                'id': None,
+                'classes': [],
+                'attributes': {'⚡-data': 'user'},
+                'children': []
+            }
+        ]
+    }
+    
+    full = JSGenerator(test_ast).generate()
+    generator = JSGenerator(test_ast, minify=True)
+    js = generator.generate()
+    
+    assert len(js.encode('utf-8')) < generator.unminified_bytes < len(full.encode('utf-8'))
+    assert JSGenerator(test_ast).unminified_bytes is None
+    assert 'updateBinding' in js
+    assert 'animationUtils' not in js
+    assert 'API_BASE_URL' not in js
+    assert 'console.log' not in js
+    assert '\n//' not in js and not js.startswith('//')
+    assert len(js) < len(full) / 2
+
+
+def test_js_minify_animation_runtime():
+    """Test animation utilities are kept when an animate attribute is used"""
+    test_ast = {
+        'type': 'Document',
+        'children': [
+            {
+                'type': 'Element',
+                'tag': 'div',
+                'id': None,
+                'classes': [],
+                'attributes': {'animate': 'fade'},
+                'children': []
+            }
+        ]
+    }
+    
+    js = JSGenerator(test_ast, minify=True).generate()
+    
+    assert 'animationUtils' in js
+    assert 'updateBinding' not in js
+
+
+def test_js_bindings_runtime_only_with_data():
+    """Test the bindings runtime section is emitted only for pages using ⚡-data"""
+    def page(attributes):
+        return {
+            'type': 'Document',
+            'children': [
+                {'type': 'Element', 'tag': 'span', 'id': None, 'classes': [], 'attributes': attributes, 'children': []}
+            ]
+        }
+    
+    bound = JSGenerator(page({'⚡-data': 'user'}), minify=True)
+    js = bound.generate()
+    assert bound.features == {'bindings'}
+    assert 'buildBindingIndex' in js and 'MutationObserver' in js
+    
+    unbound = JSGenerator(page({'animate': 'fade'}), minify=True)
+    js = unbound.generate()
+    assert 'bindings' not in unbound.features
+    assert 'buildBindingIndex' not in js and 'MutationObserver' not in js
+
+
+def test_js_update_binding_uses_index():
+    """Test binding updates look elements up in the index instead of querying the DOM"""
+    section = JSGenerator.RUNTIME_SECTIONS['bindings']
+    
+    def function_body(name):
+        start = section.index(f'function {name}(')
+        return section[start:section.index('\n  }\n', start)]
+    
+    for name in ('updateBinding', 'flushBindings'):
+        assert 'querySelectorAll' not in function_body(name)
+    assert 'bindingIndex.get(key)' in function_body('flushBindings')
+    
+    # The DOM is scanned once, when the index is built
+    assert section.count("document.querySelectorAll('[data-dynamic]')") == 1
+    assert "document.querySelectorAll('[data-dynamic]')" in function_body('buildBindingIndex')
+
+
+def test_html_runtime_script_injection():
+    """Test shared runtime script tag is injected into head"""
+    test_ast = {
+        'type': 'Document',
+        'children': [
+            {
+                'type': 'Element',
+                'tag': 'head',
+                'id': None,
+                'classes': [],
+                'attributes': {},
+                'children': []
+            }
+        ]
+    }
+    
+    gen = HTMLGenerator(test_ast, 'test.htmlxify', runtime_src='htmlxify-runtime.abc.js')
+    html, _ = gen.generate()
+    
+    assert html.count('<script src="htmlxify-runtime.abc.js" defer></script>') == 1
+    assert html.index('<head>') < html.index('<script')
+
+
+# ==================== COMPILE API TESTS ====================
+
+def test_compile_returns_artifacts():
+    """Test htmlxify.compile returns every artifact in memory"""
+    import htmlxify
+    
+    result = htmlxify.compile('div.box { Hello }', 'page.htmlxify')
+    
+    assert result.ok
+    assert result.diagnostics == []
+    assert 'Hello' in result.html and 'class="box"' in result.html
+    assert 'box-sizing' in result.css
+    assert result.js is not None
+    assert json.loads(result.source_map)
+    assert result.runtime is None
+
+
+def test_compile_reports_parse_error():
+    """Test parse errors become diagnostics instead of exceptions"""
+    import htmlxify
+    
+    result = htmlxify.compile('div {\n  ((( broken', 'broken.htmlxify')
+    
+    assert not result.ok
+    assert result.html is None
+    assert len(result.errors) == 1
+    assert result.errors[0].message.startswith('Parse error')
+    assert result.errors[0].line == 2
+    assert 'ERRORS in broken.htmlxify' in result.format_diagnostics()
+
+
+def test_compile_reports_validation_issues():
+    """Test validation errors and warnings are returned as diagnostics"""
+    import htmlxify
+    
+    warned = htmlxify.compile('div(⚡-call-when: "visible") { Stats }')
+    assert warned.ok
+    assert len(warned.warnings) == 1
+    
+    failed = htmlxify.compile('div(⚡-call: "getStats", ⚡-call-when: "never") { Stats }')
+    assert not failed.ok
+    assert "Invalid '⚡-call-when'" in failed.errors[0].message
+
+
+def test_compile_shared_runtime():
+    """Test shared_runtime returns the runtime and links it from the page"""
+    import htmlxify
+    
+    result = htmlxify.compile('div { Hello }', options={'shared_runtime': True})
+    
+    assert result.runtime and result.runtime_filename
+    assert f'src="{result.runtime_filename}"' in result.html
+    
+    linked = htmlxify.compile(
+        'div { Hello }', options={'shared_runtime': True, 'runtime_src': '../rt.js'}
+    )
+    assert 'src="../rt.js"' in linked.html
+
+
+def test_compile_rejects_unknown_option():
+    """Test unknown compile options raise ValueError"""
+    import htmlxify
+    
+    with pytest.raises(ValueError, match='minfy'):
+        htmlxify.compile('div { Hello }', options={'minfy': True})
+
+
+def test_compile_custom_keyframes():
+    """Test the keyframes option reaches the CSS, and bad tables raise before parsing"""
+    import htmlxify
+    
+    wobble = {'0%': {'transform': 'rotate(-3deg)'}, '100%': {'transform': 'rotate(3deg)'}}
+    result = htmlxify.compile('div(animate: "wobble 1s") { Hi }', options={'keyframes': {'wobble': wobble}})
+    
+    assert result.ok
+    assert result.css.count('@keyframes wobble') == 1
+    
+    with pytest.raises(ValueError, match='width'):
+        htmlxify.compile('div {{{', options={'keyframes': {'grow': {'0%': {'width': '0'}}}})
+    with pytest.raises(ValueError, match='offset'):
+        htmlxify.compile('div { Hi }', options={'keyframes': {'wobble': ['0%']}})
+
+
+def test_compile_prints_nothing(capsys):
+    """Test compile does no printing, even for broken input"""
+    import htmlxify
+    
+    htmlxify.compile('div { Hello }')
+    htmlxify.compile('div {\n  ((( broken')
+    htmlxify.compile('div(⚡-call-when: "visible") { Stats }')
+    
+    captured = capsys.readouterr()
+    assert captured.out == '' and captured.err == ''
+
+
+def test_compile_metrics():
+    """Test the compile counts nodes walked, escapes, cache use, CSS rules and JS handlers"""
+    import htmlxify
+    
+    source = (
+        'div.box(⚡-call: "getUser", ⚡-data: "user") {\n'
+        '  p.a(animate: "fade 1s", style: "color: red") { Hi <b> & co }\n'
+        '  p.b(animate: "fade 2s") { There }\n'
+        '}\n'
+    )
+    result = htmlxify.compile(source, 'page.htmlxify')
+    
+    assert result.ok
+    metrics = result.metrics.to_dict()
+    # 3 elements and 2 text nodes, walked by validate, html, css and js
+    assert metrics['elements_visited'] == 12
+    assert metrics['text_nodes_visited'] == 8
+    assert metrics['escape_calls'] >= 2 + 3  # Text nodes, plus class names
+    assert metrics['parser_cache_hits'] + metrics['parser_cache_misses'] == 1
+    # Style rule, two animation rules and one @keyframes fade, emitted once
+    assert metrics['css_rules_emitted'] == 4
+    assert metrics['css_rules_deduped'] == 1
+    assert metrics['js_handlers'] == 1
+    assert metrics['js_data_bindings'] == 1
+
+
+def test_compile_diagnostic_records():
+    """Test diagnostics carry file, line, column and rule, as JSON and SARIF"""
+    import htmlxify
+    from htmlxify import diagnostics
+    
+    source = 'div {\n  p { Hi }\n  span(⚡-call: "a", ⚡-cache: "soon") { Later }\n}\n'
+    result = htmlxify.compile(source, 'page.htmlxify')
+    
+    assert result.diagnostic_records() == [{
+        'file': 'page.htmlxify', 'line': 3, 'column': 3, 'rule': 'cache-ttl',
+        'severity': 'error', 'message': "Invalid '⚡-cache' value 'soon'. Use a number of seconds, e.g. ⚡-cache: 60.",
+    }]
+    assert 'Line: 3, column 3' in result.format_diagnostics()
+    assert json.loads(diagnostics.to_json(result.diagnostics)) == result.diagnostic_records()
+    
+    sarif = diagnostics.to_sarif(result.diagnostics, tool_version='1.0.0')
+    assert sarif['version'] == '2.1.0'
+    [run] = sarif['runs']
+    assert run['tool']['driver']['rules'] == [{'id': 'cache-ttl'}]
+    [finding] = run['results']
+    assert finding['level'] == 'error'
+    assert finding['locations'][0]['physicalLocation'] == {
+        'artifactLocation': {'uri': 'page.htmlxify'},
+        'region': {'startLine': 3, 'startColumn': 3},
+    }
+    
+    # Parse error messages are only formatted when read
+    broken = htmlxify.compile('div {\n  ((( broken', 'broken.htmlxify')
+    [issue] = broken.errors
+    assert callable(issue._message)
+    assert (issue.rule, issue.line, issue.column) == ('parse-error', 2, 3)
+    assert issue.message.startswith('Parse error') and not callable(issue._message)
+    
+    failed = htmlxify.compile('div {\n  ((( broken')
+    assert failed.metrics.parser_cache_hits == 1
+    assert failed.metrics.elements_visited == 0
+
+
+# ==================== PROFILER TESTS ====================
+
+def test_profiler_records_stages():
+    """Test a profiled compile records every stage with its counts"""
+    import htmlxify
+    from htmlxify.profiler import Profiler
+    
+    with Profiler() as profiler:
+        result = htmlxify.compile('div.box { p { Hello } }', 'page.htmlxify', profiler=profiler)
+    
+    stages = {stage.name: stage for stage in profiler.stages}
+    assert list(stages) == ['load', 'parse', 'indent', 'validate', 'html', 'css', 'js']
+    assert stages['parse'].nodes == 3
+    assert stages['validate'].nodes == 3
+    assert stages['html'].bytes >= len(result.html)
+    assert stages['css'].bytes == len(result.css.encode('utf-8'))
+    assert all(stage.wall >= 0 and stage.cpu >= 0 for stage in profiler.stages)
+    assert stages['parse'].peak_memory > 0
+
+
+def test_profiler_report_formats():
+    """Test the profile renders as a table and as JSON"""
+    import htmlxify
+    from htmlxify.profiler import Profiler
+    
+    with Profiler(memory=False) as profiler:
+        htmlxify.compile('div { Hello }', profiler=profiler)
+    
+    table = profiler.format_table()
+    assert table.splitlines()[0].split()[:3] == ['Stage', 'Wall', 'ms']
+    assert 'validate' in table and 'total' in table
+    
+    report = json.loads(profiler.to_json())
+    assert [stage['stage'] for stage in report['stages']][:2] == ['load', 'parse']
+    assert report['total']['peak_memory_bytes'] == 0
+    assert set(report['stages'][0]) == {'stage', 'wall_ms', 'cpu_ms', 'peak_memory_bytes', 'nodes', 'bytes'}
+    assert report['metrics']['elements_visited'] == 4
+    assert 'escape_calls' in table
+
+
+def test_profiler_stops_tracemalloc():
+    """Test profiling leaves tracemalloc as it found it, and plain compiles never start it"""
+    import tracemalloc
+    import htmlxify
+    from htmlxify.profiler import Profiler
+    
+    htmlxify.compile('div { Hello }')
+    assert not tracemalloc.is_tracing()
+    
+    with Profiler() as profiler:
+        htmlxify.compile('div { Hello }', profiler=profiler)
+        assert tracemalloc.is_tracing()
+    assert not tracemalloc.is_tracing()
+
+
+def test_profiler_stops_at_failed_stage():
+    """Test a parse error ends the profile after the parse stage"""
+    import htmlxify
+    from htmlxify.profiler import Profiler
+    
+    with Profiler(memory=False) as profiler:
+        result = htmlxify.compile('div {\n  ((( broken', profiler=profiler)
+    
+    assert not result.ok
+    assert [stage.name for stage in profiler.stages] == ['load', 'parse']
+
+
+# ==================== TRACING TESTS ====================
+
+def trace_compile(source, filename='page.htmlxify'):
+    """Compile with a JSONLinesTracer; returns the spans it wrote"""
+    import io
+    import htmlxify
+    from htmlxify import tracing
+    
+    stream = io.StringIO()
+    previous = tracing.set_tracer(tracing.JSONLinesTracer(stream))
+    try:
+        result = htmlxify.compile(source, filename)
+    finally:
+        tracing.set_tracer(previous)
+    return result, [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_tracing_spans_every_stage():
+    """Test each stage writes a span nested under the compile span"""
+    result, spans = trace_compile('div.box { p { Hello } }')
+    
+    names = [span['name'] for span in spans]
+    assert names == [
+        'htmlxify.parse', 'htmlxify.indent', 'htmlxify.validate',
+        'htmlxify.html', 'htmlxify.css', 'htmlxify.js', 'htmlxify.compile',
+    ]
+    root = spans[-1]
+    assert root['parent_id'] is None
+    assert root['attributes'] == {'filename': 'page.htmlxify', 'ok': True, 'errors': 0, 'warnings': 0}
+    assert all(span['parent_id'] == root['span_id'] for span in spans[:-1])
+    assert len({span['trace_id'] for span in spans}) == 1
+    
+    stages = {span['name']: span['attributes'] for span in spans}
+    assert stages['htmlxify.parse'] == {'filename': 'page.htmlxify', 'bytes': 23, 'nodes': 3}
+    assert stages['htmlxify.validate']['nodes'] == 3
+    assert stages['htmlxify.html']['bytes'] == len(result.html.encode('utf-8'))
+    assert stages['htmlxify.js']['bytes'] == len(result.js.encode('utf-8'))
+
+
+def test_tracing_marks_failed_span():
+    """Test a parse error ends its span with an error status"""
+    result, spans = trace_compile('div {\n  ((( broken')
+    
+    assert not result.ok
+    assert [span['name'] for span in spans] == ['htmlxify.parse', 'htmlxify.compile']
+    assert spans[0]['status'] == 'error'
+    assert 'line 2' in spans[0]['error']
+    assert spans[1]['status'] == 'ok'
+    assert spans[1]['attributes']['errors'] == 1
+
+
+def test_tracing_stage_outside_compile():
+    """Test a stage called on its own writes a root span, and the default tracer records nothing"""
+    import io
+    from htmlxify import tracing
+    
+    ast = ASTBuilder('div { Hello }', 'test.htmlxify').parse()
+    stream = io.StringIO()
+    previous = tracing.set_tracer(tracing.JSONLinesTracer(stream))
+    try:
+        SemanticValidator(ast, 'test.htmlxify').validate()
+    finally:
+        tracing.set_tracer(previous)
+    
+    span = json.loads(stream.getvalue())
+    assert span['name'] == 'htmlxify.validate'
+    assert span['parent_id'] is None
+    
+    assert isinstance(tracing.get_tracer(), tracing.NoOpTracer)
+    with tracing.span('htmlxify.test') as noop:
+        assert not noop.recording
+
+
+def test_tracing_opentelemetry_adapter():
+    """Test OpenTelemetryTracer hands spans and attributes to an OpenTelemetry tracer"""
+    import contextlib
+    import htmlxify
+    from htmlxify import tracing
+    
+    class RecordingSpan:
+        def __init__(self, name, attributes):
+            self.name = name
+            self.attributes = dict(attributes)
+        
+        def is_recording(self):
+            return True
+        
+        def set_attribute(self, key, value):
+            self.attributes[key] = value
+    
+    class RecordingTracer:
+        """Stands in for an opentelemetry.trace.Tracer"""
+        def __init__(self):
+            self.spans = []
+        
+        @contextlib.contextmanager
+        def start_as_current_span(self, name, attributes=None):
+            span = RecordingSpan(name, attributes or {})
+            self.spans.append(span)
+            yield span
+    
+    recorder = RecordingTracer()
+    previous = tracing.set_tracer(tracing.OpenTelemetryTracer(recorder))
+    try:
+        htmlxify.compile('div { Hello }', 'page.htmlxify')
+    finally:
+        tracing.set_tracer(previous)
+    
+    spans = {span.name: span.attributes for span in recorder.spans}
+    assert list(spans)[0] == 'htmlxify.compile'
+    assert spans['htmlxify.parse']['nodes'] == 2
+    assert spans['htmlxify.compile']['ok'] is True
+
+
+def test_tracing_opentelemetry_is_optional():
+    """Test OpenTelemetryTracer explains the missing package instead of failing on import"""
+    try:
+        import opentelemetry  # noqa: F401
+        pytest.skip('opentelemetry is installed')
+    except ImportError:
+        pass
+    from htmlxify import tracing
+    
+    with pytest.raises(ImportError, match='opentelemetry-api'):
+        tracing.OpenTelemetryTracer()
+
+
+# ==================== BENCHMARK TESTS ====================
+
+def test_benchmark_generator_is_seeded():
+    """Test the same seed and parameters give the same document"""
+    from benchmarks.generator import generate_document
+    
+    params = {'elements': 40, 'depth': 4, 'call_frequency': 0.3}
+    
+    assert generate_document(7, **params) == generate_document(7, **params)
+    assert generate_document(7, **params) != generate_document(8, **params)
+    with pytest.raises(ValueError):
+        generate_document(0, elements=10, nesting=3)
+
+
+def test_benchmark_generator_parameters():
+    """Test generated documents compile and follow their parameters"""
+    from benchmarks.generator import generate_document
+    
+    for seed in range(2):
+        source = generate_document(
+            seed, elements=30, depth=3, text_ratio=1.0, attribute_density=2.5,
+            call_frequency=1.0, data_frequency=1.0
+        )
+        ast = IndentationProcessor().process(ASTBuilder(source, 'bench.htmlxify').parse())
+        
+        elements, max_depth = [], 0
+        stack = [(child, 1) for child in ast['children']]
+        while stack:
+            node, depth = stack.pop()
+            if node['type'] == 'Element':
+                elements.append(node)
+                max_depth = max(max_depth, depth)
+                stack.extend((child, depth + 1) for child in node.get('children', []))
+        
+        assert len(elements) == 30
+        assert all(any(child['type'] == 'Text' for child in node['children']) for node in elements)
+        assert max_depth <= 3
+        assert all('⚡-call' in node['attributes'] and '⚡-data' in node['attributes'] for node in elements)
+        assert SemanticValidator(ast, 'bench.htmlxify').validate()
+
+
+def test_benchmark_generate_sized():
+    """Test sized documents come out near their target size"""
+    from benchmarks.generator import generate_sized
+    
+    source = generate_sized(20 * 1024, seed=3)
+    
+    assert 0.9 < len(source.encode('utf-8')) / (20 * 1024) < 1.1
+
+
+def test_benchmark_run_skips_projected_sizes():
+    """Test the runner measures each stage and skips sizes over budget"""
+    from benchmarks.run import parse_size, run
+    
+    assert parse_size('1.5KB') == 1536 and parse_size('2MB') == 2 * 1024 ** 2
+    
+    document = run(['512B', '500MB'], {}, repeat=1, max_seconds=60, log=lambda line: None)
+    small, huge = document['results']
+    
+    assert {'parse', 'indent', 'validate', 'html', 'css', 'js'} <= set(small['stages'])
+    assert small['nodes'] > 0 and small['total_ms'] > 0
+    assert 'projected' in huge['skipped']
+    assert json.loads(json.dumps(document))['meta']['seed'] == 0
+
+
+def test_benchmark_compare_flags_regressions():
+    """Test compare reports regressions past the threshold and ignores noise"""
+    from benchmarks.compare import compare_results
+    
+    def results(parse_ms, html_ms):
+        return {'results': [{
+            'size': '1KB',
+            'stages': {'parse': {'wall_ms': parse_ms}, 'html': {'wall_ms': html_ms}},
+            'total_ms': parse_ms + html_ms,
+        }, {'size': '1MB', 'skipped': 'projected'}]}
+    
+    rows = compare_results(results(100.0, 0.2), results(125.0, 0.4), threshold=10, min_ms=1.0)
+    status = {row['stage']: row['status'] for row in rows}
+    
+    # html doubled, but by less than min_ms
+    assert status == {'parse': 'regression', 'html': 'ok', 'total': 'regression'}
+    
+    rows = compare_results(results(100.0, 0.2), results(80.0, 0.2), threshold=10)
+    assert {row['stage']: row['status'] for row in rows}['parse'] == 'improvement'
+
+
 # ==================== FIXTURE-BASED TESTS ====================
 
 def test_fixture_simple():